@@ -1,9 +1,15 @@
 import requests
 import json
 import logging
+import os
+import sys
 from tvDatafeed import TvDatafeed, Interval
 from datetime import datetime
 
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from common.price_fetcher import PriceFetcher, split_symbol
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -17,8 +23,15 @@ logger = logging.getLogger(__name__)
 # Założenie: API działa lokalnie na porcie 8000 (dostosuj, jeśli inne)
 API_URL = "http://localhost:8000/api/stock"
 
-# Initialize TvDatafeed
-tv = TvDatafeed()
+# Pobieranie równoległe: FETCH_WORKERS wątków (każdy z własnym TvDatafeed, bez logowania),
+# łącznie najwyżej FETCH_RATE wywołań get_hist na sekundę, ponowienia z backoffem
+FETCH_WORKERS = 8
+FETCH_RATE = 4.0
+FETCH_RETRIES = 2
+FETCH_TIMEOUT = 5
+
+fetcher = PriceFetcher(Interval.in_1_minute, 1, workers=FETCH_WORKERS, rate=FETCH_RATE, retries=FETCH_RETRIES,
+                       timeout=FETCH_TIMEOUT, tv_factory=TvDatafeed)
 
 def fetch_enabled_symbols():
     """Fetch enabled symbols and their IDs from API."""
@@ -34,21 +47,6 @@ def fetch_enabled_symbols():
         logger.error(f"Error fetching symbols from API: {e}, Response: {response.text if 'response' in locals() else 'Brak odpowiedzi'}")
         return []
 
-def fetch_data(exchange, symbol):
-    """Fetch historical data for a given exchange and symbol."""
-    try:
-        data = tv.get_hist(
-            symbol=symbol,
-            exchange=exchange,
-            interval=Interval.in_1_minute,
-            n_bars=1
-        )
-        logger.info(f"Fetched historical data for {exchange}:{symbol}")
-        return data
-    except Exception as error:
-        logger.error(f"Error fetching historical data for {exchange}:{symbol}: {error}")
-        return None
-
 def main():
     # Fetch enabled symbols
     symbols = fetch_enabled_symbols()
@@ -56,59 +54,53 @@ def main():
         logger.error("No enabled symbols found or API error")
         return
 
-    # Process each symbol
-    for id_symbol, full_symbol in symbols:
+    # Pobieranie równoległe; wiersze zbierane w kolejności ukończenia pobrań i wysyłane jednym żądaniem
+    prices = []
+    for id_symbol, full_symbol, data in fetcher.fetch_many(symbols):
         try:
-            # Split symbol into exchange and symbol
-            if ':' not in full_symbol:
-                logger.error(f"Invalid symbol format: {full_symbol}")
-                continue
-            exchange, symbol = full_symbol.split(':')
+            exchange, symbol = split_symbol(full_symbol)
             logger.info(f"Processing {exchange}:{symbol} (idSymbol: {id_symbol})")
 
-            # Fetch historical data
-            data = fetch_data(exchange, symbol)
             if data is not None and not data.empty:
                 # Get the latest data point
                 latest_data = data.iloc[-1]
-                open_price = latest_data['open']
-                high_price = latest_data['high']
-                low_price = latest_data['low']
-                close_price = latest_data['close']
-                volume = latest_data['volume']
                 timestamp = latest_data.name.to_pydatetime().replace(tzinfo=None)
                 updated = datetime.now().replace(tzinfo=None)
 
                 # Prepare data for API
-                price_data = {
+                prices.append({
                     "idSymbol": id_symbol,
-                    "open": open_price,
-                    "high": high_price,
-                    "low": low_price,
-                    "close": close_price,
-                    "volume": volume,
+                    "open": latest_data['open'],
+                    "high": latest_data['high'],
+                    "low": latest_data['low'],
+                    "close": latest_data['close'],
+                    "volume": latest_data['volume'],
                     "timestamp": timestamp.isoformat(),
                     "updated": updated.isoformat()
-                }
-
-                # Send data to API
-                response = requests.post(
-                    f"{API_URL}/prices/real",
-                    headers={"Content-Type": "application/json"},
-                    data=json.dumps(price_data)
-                )
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"Updated/Inserted data for idSymbol: {id_symbol}, Status: {result['status']}")
+                })
             else:
                 logger.warning(f"No data fetched for {exchange}:{symbol}")
 
         except ValueError as ve:
             logger.error(f"Error processing symbol {full_symbol}: {ve}")
             continue
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error sending data to API for idSymbol {id_symbol}: {e}, Response: {response.text if 'response' in locals() else 'Brak odpowiedzi'}")
-            continue
+
+    if not prices:
+        logger.warning("No prices to send")
+        return
+
+    # Send data to API - wszystkie symbole w jednym upsercie /prices/real/batch
+    try:
+        response = requests.post(
+            f"{API_URL}/prices/real/batch",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps({"prices": prices})
+        )
+        response.raise_for_status()
+        result = response.json()
+        logger.info(f"Updated/Inserted data for {result['upserted']} symbols, Status: {result['status']}")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error sending data to API: {e}, Response: {response.text if 'response' in locals() else 'Brak odpowiedzi'}")
 
     logger.info("Operation completed")
 
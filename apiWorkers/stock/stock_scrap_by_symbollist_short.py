@@ -9,6 +9,13 @@ from selenium.common.exceptions import TimeoutException
 import requests
 import logging
 
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from common.dedup import MessageDedup
+from common.ws_capture import limit_capture_to_tv_socket, reset_captured_requests, load_symbol_rows, \
+    tv_socket_requests, iter_ws_payloads, ScrapeTimer
+from common.capture import open_capture
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -73,16 +80,28 @@ def insert_indicator_values(id_symbol, indicator_data):
 try:
     driver = webdriver.Chrome(service=service, options=options)
     driver.set_window_size(100, 100)
+    limit_capture_to_tv_socket(driver)
     logger.info("Przeglądarka Opera uruchomiona")
 except Exception as e:
     logger.error(f"Błąd uruchamiania: {e}")
     exit(1)
 
-seen_messages = set()
+# Skróty blake2b zamiast pełnych payloadów, ograniczone LRU
+seen_messages_cap = 256
+seen_messages = MessageDedup(max_entries=seen_messages_cap)
 iteration = 0
 previous_request_count = 0
 valid_indices = [5, 7, 22, 24]
 restart_after_iterations = 50
+# True - jedna przeglądarka przez cały przebieg, requesty selenium-wire czyszczone po każdym symbolu;
+# False - stary tryb z restartem przez os.execv co restart_after_iterations
+long_lived_mode = True
+# Czekanie na ramkę du ze study dla bieżącego symbolu (sekundy) i liczba przeładowań wykresu, gdy nie przyszła
+study_wait_timeout = 20
+study_wait_retries = 1
+timer = ScrapeTimer()
+# Zapis surowych payloadów WS każdego symbolu do .jsonl.gz (common.capture) do odtwarzania offline; brak zmiennej - wyłączone
+capture = open_capture(os.environ.get('TV_CAPTURE_PATH'))
 
 symbols = fetch_enabled_symbols()
 if not symbols:
@@ -91,7 +110,7 @@ if not symbols:
     exit(1)
 
 while True:
-    if iteration > 0 and iteration % restart_after_iterations == 0:
+    if not long_lived_mode and iteration > 0 and iteration % restart_after_iterations == 0:
         logger.info(f"Restarting after {iteration} iterations")
         try:
             driver.close()
@@ -102,9 +121,11 @@ while True:
             logger.info("WebDriver closed")
         except Exception as e:
             logger.error(f"Error closing WebDriver: {e}")
+        if capture is not None:
+            capture.close()
+        timer.persist()
         os.execv(sys.executable, ['python3'] + sys.argv)
 
-    found_study_loading = False
     current_symbol = symbols[iteration % len(symbols)]
     url = f'https://www.tradingview.com/chart/?symbol={current_symbol}'
 
@@ -126,9 +147,23 @@ while True:
         iteration += 1
         continue
 
+    if long_lived_mode:
+        # Zamiast restartu: usuń requesty poprzedniego symbolu, żeby driver.requests nie rósł
+        reset_captured_requests(driver)
+        previous_request_count = 0
+    timer.start_symbol()
+
+    rows = None
     try:
-        driver.get(url)
-        WebDriverWait(driver, 20)
+        # Wracamy, gdy tylko przyjdzie ramka du ze study (37 wartości) dla bieżącego symbolu;
+        # ten sam krok co w skryptach stock/ i common.replay
+        rows = load_symbol_rows(driver, current_symbol_id, current_symbol, valid_indices, 37, 'short',
+                                timeout=study_wait_timeout, retries=study_wait_retries,
+                                start_index=previous_request_count, seen_messages=seen_messages)
+        if rows is None:
+            logger.warning(f"No study du frame for {current_symbol} after {study_wait_retries + 1} attempts")
+            if not tv_socket_requests(driver.requests[previous_request_count:]):
+                logger.warning("No WebSocket requests from prodata.tradingview.com")
     except TimeoutException as e:
         logger.error(f"Timeout for {url}: {e}")
     except Exception as e:
@@ -136,77 +171,19 @@ while True:
 
     iteration += 1
 
-    new_requests = driver.requests[previous_request_count:]
-    ws_requests = [r for r in new_requests if r.url.lower().startswith('wss://prodata.tradingview.com/socket.io')]
-
-    for request in ws_requests:
-        if request.url.lower().startswith('wss://prodata.tradingview.com/socket.io'):
-            if hasattr(request, 'ws_messages'):
-                for msg in request.ws_messages:
-                    if found_study_loading:
-                        continue
-                    payload = msg.data if hasattr(msg, 'data') else str(msg)
-                    if payload and '"m":"du","p":["cs' in str(payload) and payload not in seen_messages:
-                        seen_messages.add(payload)
-                        parts = payload.split('~m~')
-                        i = 0
-                        while i < len(parts):
-                            if parts[i].isdigit():
-                                msg_len = int(parts[i])
-                                json_str = parts[i + 1]
-                                if len(json_str) >= msg_len:
-                                    json_part = json_str[:msg_len]
-                                    try:
-                                        data = json.loads(json_part)
-                                        if data.get('m') == 'du':
-                                            try:
-                                                st_data = data['p'][1].get(list(data['p'][1].keys())[0], {}).get('st', [])
-                                                has_valid_v = any(len(item.get('v', [])) == 37 for item in st_data)
-                                                if has_valid_v:
-                                                    filtered_st_data = [
-                                                        item for item in st_data
-                                                        if len(item.get('v', [])) == 37
-                                                           and isinstance(item.get('i'), (int, float))
-                                                           and 0 <= item.get('i') <= 299
-                                                    ]
-                                                    indicator_data = []
-                                                    for item in reversed(filtered_st_data):
-                                                        v_list = item.get('v', [])
-                                                        i_value = item.get('i')
-                                                        for idx, value in enumerate(v_list):
-                                                            if idx in valid_indices:
-                                                                try:
-                                                                    value_float = float(value)
-                                                                    value_float = round(value_float, 2)
-                                                                    if abs(value_float) > 1e10:
-                                                                        value_float = 1234.5678
-                                                                    indicator_data.append({
-                                                                        "idSymbol": current_symbol_id,
-                                                                        "TickerRelative": int(i_value - len(filtered_st_data) + 1),
-                                                                        "IndicatorIndex": idx,
-                                                                        "IndicatorValue": value_float
-                                                                    })
-                                                                except (ValueError, OverflowError):
-                                                                    logger.error(f"Conversion error for value {value} at i={i_value}, idx={idx}")
-                                                                    indicator_data.append({
-                                                                        "idSymbol": current_symbol_id,
-                                                                        "TickerRelative": int(i_value - len(filtered_st_data) + 1),
-                                                                        "IndicatorIndex": idx,
-                                                                        "IndicatorValue": None
-                                                                    })
-
-                                                    insert_indicator_values(current_symbol_id, indicator_data)
-                                                    found_study_loading = True
-                                                    break
-                                            except (KeyError, IndexError):
-                                                logger.error("Invalid data structure in 'p' or 'st'")
-                                    except json.JSONDecodeError:
-                                        logger.error(f"JSON parsing error: {json_str}")
-                                i += 2
-                            else:
-                                i += 1
-
-    if len(ws_requests) == 0:
-        logger.warning("No WebSocket requests from prodata.tradingview.com")
-
-    previous_request_count = len(driver.requests)
\ No newline at end of file
+    if rows is not None:
+        indicator_data = [
+            {"idSymbol": id_symbol, "TickerRelative": ticker, "IndicatorIndex": idx, "IndicatorValue": value}
+            for id_symbol, ticker, idx, value in rows
+        ]
+        insert_indicator_values(current_symbol_id, indicator_data)
+
+    logger.info(f"WS dedup cache: {seen_messages.stats()}")
+    # Każdy odczyt driver.requests przeładowuje magazyn selenium-wire - tylko dla capture i trybu z restartem
+    if capture is not None or not long_lived_mode:
+        captured = driver.requests
+        if capture is not None:
+            capture.write(current_symbol, iter_ws_payloads(captured[previous_request_count:]))
+        previous_request_count = len(captured)
+    timer.finish_symbol()
+    logger.info(f"Symbol {current_symbol}: {timer.summary()}")
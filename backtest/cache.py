@@ -0,0 +1,239 @@
+"""Local Arrow snapshot of backtest inputs, one partition per dataset, layout and UpdatedLongTerm date.
+
+    <cache_dir>/<dataset>/<layout>/updated=2025-10-01/bars.arrow      idSymbol, TickerRelative, COLUMNS
+                                                     /manifest.json   symbols and snapshot time
+
+bars.arrow is an uncompressed Arrow IPC file with a single record batch, so
+load() memory-maps it and the Universe columns are views of the mapped file:
+no DB, no copy. refresh() asks the DB only for the symbol list of the
+partition: symbols a scraper has since moved to a newer UpdatedLongTerm are
+dropped, new ones fetched with the bulk loader. A partition snapshotted on or
+before its own date may still be rewritten by that day's scrape and is
+fetched again in full.
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python3 -m backtest.cache --dataset stock --updated 2025-10-01
+    python3 -m backtest.cache --dataset crypto --updated 2025-10-01 --full
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+from backtest.data import COLUMNS, Universe, fetch_backtest_symbols, load_universe, symbol_offsets
+from common.indicator_tables import INDICATOR_LAYOUT, LAYOUTS
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get('BACKTEST_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache'))
+
+# Tabele źródłowe zestawów danych
+DATASETS = {
+    'stock': {'symbols_table': 'tStockSymbols', 'table': 'tStock_IndicatorValues_Pifagor_Long',
+              'prices_table': 'tStock_Prices'},
+    'crypto': {'symbols_table': 'tCryptoSymbols', 'table': 'tCrypto_IndicatorValues_Pifagor_Long',
+               'prices_table': 'tCrypto_Prices'},
+    'test': {'symbols_table': 'tTestSymbols', 'table': 'tTest_IndicatorValues_Pifagor_Long',
+             'prices_table': 'tTest_Prices'},
+}
+
+# Parametry połączenia z bazą danych PostgreSQL
+db_params = {
+    'dbname': 'TradingView',
+    'user': 'postgres',
+    'password': 'postgres',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+
+class UniverseCache:
+    """Arrow partitions of one dataset and indicator layout."""
+
+    def __init__(self, dataset='stock', layout=INDICATOR_LAYOUT, cache_dir=CACHE_DIR):
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset {dataset!r}, expected one of {', '.join(DATASETS)}")
+        self.dataset = dataset
+        self.layout = layout
+        self.tables = DATASETS[dataset]
+        self.root = os.path.join(cache_dir, dataset, layout)
+
+    def partition_dir(self, updated):
+        return os.path.join(self.root, f'updated={updated}')
+
+    def manifest(self, updated):
+        path = os.path.join(self.partition_dir(updated), 'manifest.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self, updated):
+        """Memory-mapped Universe of the partition, or None if it was never snapshotted."""
+        import pyarrow as pa
+
+        manifest = self.manifest(updated)
+        path = os.path.join(self.partition_dir(updated), 'bars.arrow')
+        if manifest is None or not os.path.exists(path):
+            return None
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        if table.num_rows == 0:
+            return Universe([], [], np.zeros(1, np.int64), np.empty(0), {name: np.empty(0) for name in COLUMNS})
+        arrays = {name: table.column(name).chunk(0).to_numpy(zero_copy_only=True) for name in table.column_names}
+        ids, offsets = symbol_offsets(arrays['idSymbol'])
+        symbols = manifest['symbols']
+        return Universe(ids, [symbols[str(id_symbol)] for id_symbol in ids], offsets, arrays['TickerRelative'],
+                        {name: arrays[name] for name in COLUMNS})
+
+    def load_frame(self, updated):
+        """The partition as one DataFrame (idSymbol, Symbol, TickerRelative, COLUMNS) for ML.py / ad-hoc analysis."""
+        import pandas as pd
+
+        universe = self.load(updated)
+        if universe is None:
+            return None
+        counts = np.diff(universe.offsets)
+        df = pd.DataFrame({name: universe[name] for name in COLUMNS})
+        df.insert(0, 'TickerRelative', universe.tr)
+        df.insert(0, 'Symbol', np.repeat(np.array(universe.symbols, dtype=object), counts))
+        df.insert(0, 'idSymbol', np.repeat(universe.ids, counts))
+        return df
+
+    def write(self, updated, universe):
+        """Replace the partition with universe (written to temporary files, then renamed)."""
+        import pyarrow as pa
+
+        directory = self.partition_dir(updated)
+        os.makedirs(directory, exist_ok=True)
+        columns = {'idSymbol': np.repeat(universe.ids, np.diff(universe.offsets)), 'TickerRelative': universe.tr}
+        columns.update((name, universe[name]) for name in COLUMNS)
+        table = pa.table(columns)
+        path = os.path.join(directory, 'bars.arrow')
+        with pa.OSFile(path + '.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+        manifest = {
+            'dataset': self.dataset,
+            'layout': self.layout,
+            'updated': str(updated),
+            'snapshot': datetime.now().isoformat(timespec='seconds'),
+            'bars': int(universe.n_bars),
+            'symbols': {str(int(id_symbol)): symbol for id_symbol, symbol in zip(universe.ids, universe.symbols)},
+        }
+        with open(os.path.join(directory, 'manifest.json.tmp'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(path + '.tmp', path)
+        os.replace(os.path.join(directory, 'manifest.json.tmp'), os.path.join(directory, 'manifest.json'))
+
+    def refresh(self, conn, updated, full=False):
+        """Bring the partition in line with the DB; returns (Universe, {'kept', 'added', 'dropped'})."""
+        current = dict(fetch_backtest_symbols(conn, updated, symbols_table=self.tables['symbols_table']))
+        manifest = None if full else self.manifest(updated)
+        load_kwargs = {'table': self.tables['table'], 'prices_table': self.tables['prices_table'],
+                       'layout': self.layout}
+        if manifest is None or date.fromisoformat(manifest['snapshot'][:10]) <= date.fromisoformat(str(updated)):
+            universe = load_universe(conn, current.items(), **load_kwargs)
+            self.write(updated, universe)
+            return self.load(updated), {'kept': 0, 'added': len(universe), 'dropped': 0}
+
+        cached = {int(id_symbol) for id_symbol in manifest['symbols']}
+        added = sorted(set(current) - cached)
+        dropped = cached - set(current)
+        stats = {'kept': len(cached) - len(dropped), 'added': len(added), 'dropped': len(dropped)}
+        if not added and not dropped:
+            return self.load(updated), stats
+
+        old = self.load(updated)
+        keep = np.repeat(~np.isin(old.ids, list(dropped)), np.diff(old.offsets))
+        new = load_universe(conn, [(id_symbol, current[id_symbol]) for id_symbol in added], **load_kwargs)
+        ids = np.concatenate([np.repeat(old.ids, np.diff(old.offsets))[keep], np.repeat(new.ids, np.diff(new.offsets))])
+        tr = np.concatenate([old.tr[keep], new.tr])
+        order = np.lexsort((tr, ids))
+        ids, tr = ids[order], tr[order]
+        columns = {name: np.concatenate([old[name][keep], new[name]])[order] for name in COLUMNS}
+        names = dict(zip(old.ids.tolist(), old.symbols))
+        names.update(zip(new.ids.tolist(), new.symbols))
+        symbol_ids, offsets = symbol_offsets(ids)
+        del old  # zwalnia mapowanie pliku przed jego podmianą
+        self.write(updated, Universe(symbol_ids, [names[int(i)] for i in symbol_ids], offsets, tr, columns))
+        return self.load(updated), stats
+
+
+def cached_universe(updated, dataset='stock', layout=INDICATOR_LAYOUT, refresh=False, connect=None):
+    """Universe from the cache; the DB (connect() -> connection) is only used to build or refresh the partition."""
+    cache = UniverseCache(dataset, layout)
+    universe = None if refresh else cache.load(updated)
+    if universe is None:
+        import psycopg2
+
+        conn = connect() if connect else psycopg2.connect(**db_params)
+        try:
+            universe, stats = cache.refresh(conn, updated)
+        finally:
+            conn.close()
+        logger.info(f"Cache {dataset}/{updated}: {stats['kept']} bez zmian, {stats['added']} pobranych, "
+                    f"{stats['dropped']} usuniętych")
+    return universe
+
+
+def add_universe_arguments(parser):
+    """Data options shared by backtest.run and backtest.sweep."""
+    parser.add_argument('--dataset', default='stock', choices=sorted(DATASETS))
+    parser.add_argument('--updated', default='2025-10-01', help='UpdatedLongTerm of the backtested symbols')
+    parser.add_argument('--limit', type=int, help='first N symbols (DB only, ignored with --cache)')
+    parser.add_argument('--layout', default=INDICATOR_LAYOUT, choices=LAYOUTS, help='indicator table layout')
+    parser.add_argument('--cache', action='store_true', help='read the local Arrow snapshot, build it if missing')
+    parser.add_argument('--refresh-cache', action='store_true', help='with --cache: sync changed symbols from the DB')
+
+
+def universe_from_args(args):
+    """Universe for add_universe_arguments() options, from the cache or straight from the DB."""
+    started = time.perf_counter()
+    if args.cache:
+        universe = cached_universe(args.updated, args.dataset, args.layout, refresh=args.refresh_cache)
+    else:
+        import psycopg2
+
+        tables = DATASETS[args.dataset]
+        conn = psycopg2.connect(**db_params)
+        try:
+            symbols = fetch_backtest_symbols(conn, args.updated, args.limit, tables['symbols_table'])
+            universe = load_universe(conn, symbols, tables['table'], tables['prices_table'], args.layout)
+        finally:
+            conn.close()
+    logger.info(f"Wczytano {len(universe)} symboli, {universe.n_bars} barów ({time.perf_counter() - started:.2f}s)")
+    return universe
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', default='stock', choices=sorted(DATASETS))
+    parser.add_argument('--updated', default='2025-10-01', help='UpdatedLongTerm of the partition')
+    parser.add_argument('--layout', default=INDICATOR_LAYOUT, choices=LAYOUTS, help='indicator table layout')
+    parser.add_argument('--full', action='store_true', help='fetch every symbol again')
+    args = parser.parse_args()
+
+    import psycopg2
+    cache = UniverseCache(args.dataset, args.layout)
+    conn = psycopg2.connect(**db_params)
+    try:
+        started = time.perf_counter()
+        universe, stats = cache.refresh(conn, args.updated, full=args.full)
+    finally:
+        conn.close()
+    logger.info(f"{cache.partition_dir(args.updated)}: {len(universe)} symboli, {universe.n_bars} barów, "
+                f"{stats['kept']} bez zmian, {stats['added']} pobranych, {stats['dropped']} usuniętych "
+                f"({time.perf_counter() - started:.1f}s)")
+    started = time.perf_counter()
+    cache.load(args.updated)
+    logger.info(f"Odczyt z cache: {time.perf_counter() - started:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Incremental backtest: every run resumes each symbol from its saved kernel state and simulates only the new bars.
+
+    <cache_dir>/checkpoints/<dataset>/<layout>/<strategy>-<spec digest>.npz
+
+A scrape renumbers TickerRelative (0 = newest bar), so a symbol's checkpoint
+is not keyed by it. Next to the state after the symbol's last processed bar
+it keeps a digest of the last VERIFY_BARS bars (all bars of a longer open
+position). The next run looks that run of bars up again among the symbol's
+newest MAX_NEW_BARS + 1 bars and resumes right after it. A symbol whose bars
+no longer match (the scraper rewrote its history, or more than MAX_NEW_BARS
+bars arrived) is replayed from its first bar, like a new one. Rewrites older
+than the compared bars go unnoticed; run with --replay after re-scraping
+deep history.
+
+The result holds the positions closed on the new bars and those still open;
+replayed symbols report all of theirs. A min_ticker_relative window keeps
+the start it had when the symbol's checkpoint was built instead of sliding
+with every scrape. Specs with a portfolio budget couple the symbols and
+always run in full (backtest.engine.run_backtest).
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python3 -m backtest.run --system 042 --cache --incremental
+    python3 -m backtest.run --system 042 --cache --incremental --replay   # nowy checkpoint od zera
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+
+import numpy as np
+
+from backtest.cache import CACHE_DIR
+from backtest.engine import BacktestResult, position_dicts
+from backtest.kernel import S_LAST_I, S_OPEN, S_OPEN_I, new_state, resume
+from backtest.strategy import Strategy
+from common.indicator_tables import INDICATOR_LAYOUT
+
+logger = logging.getLogger(__name__)
+
+# Minimalna liczba ostatnich barów porównywanych przy wznowieniu (ok. rok sesji); starszych zmian nie widać - --replay
+VERIFY_BARS = 250
+# Więcej nowych barów od ostatniego uruchomienia - symbol liczony od początku
+MAX_NEW_BARS = 30
+
+
+def spec_digest(spec):
+    return hashlib.blake2b(json.dumps(spec, sort_keys=True).encode(), digest_size=6).hexdigest()
+
+
+def bars_digest(universe, start, stop):
+    """Digest of bars start:stop (one symbol), independent of their TickerRelative numbering."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(universe.matrix[:, start:stop]).tobytes())
+    h.update((universe.tr[start:stop] - universe.tr[stop - 1]).tobytes())
+    return np.frombuffer(h.digest(), np.uint8)
+
+
+class Checkpoint:
+    """Saved per-symbol kernel state of one strategy over one dataset and layout."""
+
+    def __init__(self, strategy, dataset='stock', layout=INDICATOR_LAYOUT, cache_dir=CACHE_DIR):
+        self.strategy = strategy
+        name = re.sub(r'[^\w.-]', '_', strategy.name or 'spec')
+        self.path = os.path.join(cache_dir, 'checkpoints', dataset, layout, f'{name}-{spec_digest(strategy.spec)}.npz')
+
+    def load(self):
+        """{array name: array} of the last run, or None if there is none."""
+        if not os.path.exists(self.path):
+            return None
+        with np.load(self.path) as data:
+            return {name: data[name] for name in data.files}
+
+    def save(self, universe, fs, ss, ring, counters):
+        """Store the state of every symbol that processed a bar (written to a temporary file, then renamed)."""
+        keep = np.flatnonzero(ss[:, S_LAST_I] >= 0)
+        last_i = ss[keep, S_LAST_I]
+        open_back = np.where(ss[keep, S_OPEN] != 0, last_i - ss[keep, S_OPEN_I], -1)
+        first = universe.offsets[:-1][keep]
+        span = np.minimum(np.maximum(max(VERIFY_BARS, ring.shape[2]), open_back + 1), last_i - first + 1)
+        digest = np.zeros((len(keep), 16), np.uint8)
+        for n, (i, length) in enumerate(zip(last_i.tolist(), span.tolist())):
+            digest[n] = bars_digest(universe, i - length + 1, i + 1)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'wb') as f:
+            np.savez(f, ids=universe.ids[keep], last_tr=universe.tr[last_i], span=span, open_back=open_back,
+                     digest=digest, fs=fs[keep], ss=ss[keep], ring=ring[keep], counters=counters[keep])
+        os.replace(self.path + '.tmp', self.path)
+
+
+def _locate(universe, k, saved, n):
+    """Index of the bar saved as symbol k's last processed one (checkpoint row n), None if its bars changed."""
+    first, stop = int(universe.offsets[k]), int(universe.offsets[k + 1])
+    span = int(saved['span'][n])
+    last_tr = int(saved['last_tr'][n])
+    for last_i in range(stop - 1, max(first + span - 1, stop - 1 - MAX_NEW_BARS) - 1, -1):
+        if universe.tr[last_i] > last_tr:
+            continue  # po nowym scrapowaniu ten sam bar ma TickerRelative mniejszy o liczbę nowych barów
+        if np.array_equal(bars_digest(universe, last_i - span + 1, last_i + 1), saved['digest'][n]):
+            return last_i
+    return None
+
+
+def run_incremental(universe, strategy, dataset='stock', layout=INDICATOR_LAYOUT, cache_dir=CACHE_DIR, replay=False):
+    """run_backtest() resumed from the strategy's checkpoint, which is then replaced; returns (result, stats).
+
+    stats: {'resumed', 'replayed'} symbols and the number of 'bars' simulated.
+    replay=True ignores the checkpoint and simulates every symbol in full.
+    """
+    if not isinstance(strategy, Strategy):
+        strategy = Strategy(strategy)
+    if strategy.budget is not None:
+        raise ValueError(f"{strategy.name or 'spec'}: portfolio specs (shared budget) cannot run incrementally")
+    checkpoint = Checkpoint(strategy, dataset, layout, cache_dir)
+    exit_kind, _, _, exit_count, _, _ = strategy.exit
+    fs, ss, ring, counters = new_state(len(universe), len(exit_kind), exit_kind, exit_count)
+    start = universe.offsets[:-1].copy()
+    saved = None if replay else checkpoint.load()
+    resumed = 0
+    if saved is not None:
+        rows = {id_symbol: n for n, id_symbol in enumerate(saved['ids'].tolist())}
+        for k, id_symbol in enumerate(universe.ids.tolist()):
+            n = rows.get(id_symbol)
+            last_i = None if n is None else _locate(universe, k, saved, n)
+            if last_i is None:
+                continue
+            fs[k], ss[k], ring[k], counters[k] = saved['fs'][n], saved['ss'][n], saved['ring'][n], saved['counters'][n]
+            ss[k, S_LAST_I] = last_i
+            if ss[k, S_OPEN]:
+                ss[k, S_OPEN_I] = last_i - saved['open_back'][n]
+            start[k] = last_i + 1
+            resumed += 1
+
+    pi, pf, held = resume(universe.tr, universe.matrix, universe['avg_price'], universe.offsets, start,
+                          fs, ss, ring, counters, *strategy.kernel_args())
+    checkpoint.save(universe, fs, ss, ring, counters)
+    stats = {'resumed': resumed, 'replayed': len(universe) - resumed,
+             'bars': int((universe.offsets[1:] - start).sum())}
+    logger.info(f"{checkpoint.path}: {stats['resumed']} symboli wznowionych, {stats['replayed']} od początku, "
+                f"{stats['bars']} barów")
+    return BacktestResult(universe, strategy, position_dicts(universe, strategy, pi, pf), held), stats
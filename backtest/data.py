@@ -0,0 +1,176 @@
+"""Backtest input: aligned indicator and price bars of many symbols in contiguous NumPy arrays."""
+import numpy as np
+import pandas as pd
+
+from common.dated_tables import price_source
+from common.indicator_tables import INDICATOR_LAYOUT, read_indicator_frame, select_wide_many_sql, wide_columns
+
+INDICES = [5, 7, 22, 24]
+COLUMNS = ('ind_5', 'ind_7', 'ind_22', 'ind_24', 'avg_price')
+
+
+class Universe:
+    """Bars of many symbols, concatenated; symbol k owns rows offsets[k]:offsets[k + 1], TickerRelative ascending.
+
+    Same rows the system scripts iterate: the indicator pivot inner-joined
+    with avg_price = (high + low) / 2 on TickerRelative.
+    """
+
+    def __init__(self, ids, symbols, offsets, tr, columns):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.symbols = list(symbols)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.tr = np.ascontiguousarray(tr, dtype=np.int64)
+        self.columns = {name: np.ascontiguousarray(columns[name], dtype=np.float64) for name in COLUMNS}
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def n_bars(self):
+        return len(self.tr)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def matrix(self):
+        """COLUMNS stacked into one (columns, bars) array, as the kernel reads them."""
+        if self._matrix is None:
+            self._matrix = np.stack([self.columns[name] for name in COLUMNS])
+        return self._matrix
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Build from (idSymbol, Symbol, DataFrame with TickerRelative + COLUMNS) triples; empty frames are skipped."""
+        ids, symbols, parts = [], [], []
+        for id_symbol, symbol, df in frames:
+            if df is None or df.empty:
+                continue
+            ids.append(id_symbol)
+            symbols.append(symbol)
+            parts.append(df.sort_values('TickerRelative'))
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(df) for df in parts])
+        if not parts:
+            return cls(ids, symbols, offsets, np.empty(0), {name: np.empty(0) for name in COLUMNS})
+        tr = np.concatenate([df['TickerRelative'].to_numpy() for df in parts])
+        columns = {name: np.concatenate([df[name].to_numpy(dtype=np.float64) for df in parts]) for name in COLUMNS}
+        return cls(ids, symbols, offsets, tr, columns)
+
+    @classmethod
+    def from_matrix(cls, ids, symbols, offsets, tr, matrix):
+        """Wrap existing arrays (e.g. shared memory) without copying; matrix is (len(COLUMNS), bars) float64."""
+        universe = cls.__new__(cls)
+        universe.ids = ids
+        universe.symbols = list(symbols)
+        universe.offsets = offsets
+        universe.tr = tr
+        universe.columns = {name: matrix[n] for n, name in enumerate(COLUMNS)}
+        universe._matrix = matrix
+        return universe
+
+    def frame(self, k):
+        """DataFrame of symbol k, as the scripts build df_data."""
+        rows = slice(self.offsets[k], self.offsets[k + 1])
+        df = pd.DataFrame({name: values[rows] for name, values in self.columns.items()})
+        df.insert(0, 'TickerRelative', self.tr[rows])
+        return df
+
+
+def fetch_backtest_symbols(conn, updated_long_term='2025-10-01', limit=None, symbols_table='tStockSymbols'):
+    """(id, Symbol) the system scripts select: enabled symbols with the given UpdatedLongTerm."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT id, "Symbol"
+            FROM public."{symbols_table}"
+            WHERE "enabled" = TRUE AND "UpdatedLongTerm" = %s
+            {'LIMIT %s' if limit else ''}
+            """, (updated_long_term, limit) if limit else (updated_long_term,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def symbol_frame(conn, id_symbol, table='tStock_IndicatorValues_Pifagor_Long', prices_table='tStock_Prices',
+                 layout=INDICATOR_LAYOUT, min_ticker_relative=None, price_storage=None):
+    """df_data of one symbol: ind_5/7/22/24 merged with avg_price on TickerRelative.
+
+    layout and price_storage (None: common.dated_tables.PRICE_STORAGE) pick the
+    tables the loaders and scrapers write, e.g. the _Dated_Relative views.
+    """
+    df_ind = read_indicator_frame(conn, table, id_symbol, INDICES, layout, min_ticker_relative)
+    if df_ind.empty:
+        return None
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT "TickerRelative", ("high" + "low") / 2
+            FROM public."{price_source(prices_table, price_storage)}"
+            WHERE "idSymbol" = %s
+            ORDER BY "TickerRelative" ASC
+            """, (id_symbol,))
+        df_prices = pd.DataFrame(cursor.fetchall(), columns=['TickerRelative', 'avg_price'])
+    finally:
+        cursor.close()
+    return pd.merge(df_ind, df_prices, on='TickerRelative', how='inner')
+
+
+def bulk_universe_sql(table='tStock_IndicatorValues_Pifagor_Long', prices_table='tStock_Prices',
+                      layout=INDICATOR_LAYOUT, min_ticker_relative=None, price_storage=None):
+    """One query for the bars of many symbols (parameter: list of idSymbol): idSymbol, TickerRelative, COLUMNS.
+
+    The indicator pivot is inner-joined with avg_price on the server, rows
+    ordered by idSymbol, TickerRelative - the same rows symbol_frame() merges in pandas.
+    """
+    indicators = select_wide_many_sql(table, INDICES, layout, min_ticker_relative, ordered=False)
+    columns = ', '.join(f'ind."{col}"::float8' for col in wide_columns(INDICES))
+    return f"""
+SELECT ind."idSymbol", ind."TickerRelative", {columns}, ((p."high" + p."low") / 2)::float8
+FROM ({indicators}) ind
+JOIN public."{price_source(prices_table, price_storage)}" p ON p."idSymbol" = ind."idSymbol" AND p."TickerRelative" = ind."TickerRelative"
+ORDER BY ind."idSymbol", ind."TickerRelative"
+"""
+
+
+def load_universe(conn, symbols, table='tStock_IndicatorValues_Pifagor_Long', prices_table='tStock_Prices',
+                  layout=INDICATOR_LAYOUT, min_ticker_relative=None, itersize=100000, price_storage=None):
+    """Universe of (id, Symbol) pairs from one streamed query (server-side cursor, itersize rows per fetch)."""
+    names = {int(id_symbol): symbol for id_symbol, symbol in symbols}
+    chunks = []
+    cursor = conn.cursor(name='backtest_universe')
+    cursor.itersize = itersize
+    try:
+        cursor.execute(bulk_universe_sql(table, prices_table, layout, min_ticker_relative, price_storage),
+                       (list(names),))
+        while True:
+            rows = cursor.fetchmany(itersize)
+            if not rows:
+                break
+            # None (brak wartości wskaźnika) -> NaN
+            chunks.append(np.array(rows, dtype=np.float64))
+    finally:
+        cursor.close()
+    conn.commit()
+    return universe_from_rows(np.concatenate(chunks) if chunks else np.empty((0, 2 + len(COLUMNS))), names)
+
+
+def symbol_offsets(id_column):
+    """(ids, offsets) of an idSymbol column sorted by symbol."""
+    starts = np.flatnonzero(np.r_[True, id_column[1:] != id_column[:-1]]) if len(id_column) else np.empty(0, np.int64)
+    return id_column[starts], np.append(starts, len(id_column)).astype(np.int64)
+
+
+def universe_from_rows(data, names):
+    """Universe from a (bars, 2 + len(COLUMNS)) array of idSymbol, TickerRelative, COLUMNS sorted by idSymbol, TR."""
+    ids, offsets = symbol_offsets(data[:, 0].astype(np.int64))
+    return Universe.from_matrix(ids, [names[int(id_symbol)] for id_symbol in ids], offsets,
+                                data[:, 1].astype(np.int64), np.ascontiguousarray(data[:, 2:].T))
+
+
+def load_universe_per_symbol(conn, symbols, **frame_kwargs):
+    """Universe of (id, Symbol) pairs, one indicator and one price query per symbol (as the scripts load)."""
+    return Universe.from_frames((id_symbol, symbol, symbol_frame(conn, id_symbol, **frame_kwargs))
+                                for id_symbol, symbol in symbols)
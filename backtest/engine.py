@@ -0,0 +1,180 @@
+"""Run strategy specs on a Universe and summarise them like the system scripts.
+
+    universe = load_universe(conn, fetch_backtest_symbols(conn))
+    results = run_backtests(universe, {name: SYSTEMS[name] for name in ('031', '042')})
+    print_report(results['042'])
+"""
+import numpy as np
+
+from backtest.kernel import simulate, simulate_portfolio
+from backtest.strategy import Strategy
+
+
+class PortfolioState:
+    """Per TickerRelative step of a portfolio run: invested capital, market value of open positions, realized profit."""
+
+    def __init__(self, budget, compound, clock_tr, exposure, market_value, realized, skipped_buys):
+        self.budget = budget
+        self.compound = compound
+        self.clock_tr = clock_tr
+        self.exposure = exposure
+        self.market_value = market_value
+        self.realized = realized
+        self.skipped_buys = skipped_buys
+
+
+class BacktestResult:
+    """Positions (dicts with the keys the scripts print) and invested capital per bar.
+
+    portfolio is a PortfolioState for runs on the shared clock, None for
+    independent symbols.
+    """
+
+    def __init__(self, universe, strategy, positions, held, portfolio=None):
+        self.universe = universe
+        self.strategy = strategy
+        self.positions = positions
+        self.held = held
+        self.portfolio = portfolio
+
+    def invested_by_tr(self):
+        """Total invested capital of open positions per TickerRelative (the scripts' global_invested_data)."""
+        if self.portfolio is not None:
+            return self.portfolio.clock_tr, self.portfolio.exposure
+        mask = ~np.isnan(self.held)
+        if not mask.any():
+            return np.empty(0, np.int64), np.empty(0)
+        trs, inverse = np.unique(self.universe.tr[mask], return_inverse=True)
+        return trs, np.bincount(inverse, weights=self.held[mask])
+
+
+def position_dicts(universe, strategy, pi, pf):
+    """The kernel's position tables as the dicts the system scripts print."""
+    tr = universe.tr
+    reasons = strategy.reasons()
+    positions = []
+    for (symbol, open_i, close_i, num, reason, is_open), (zysk, invested, max_value) in zip(pi.tolist(),
+                                                                                            pf.tolist()):
+        position = {
+            'open_tr': int(tr[open_i]),
+            'close_tr': int(tr[close_i]),
+            'length': int(tr[close_i] - tr[open_i]),
+            'zysk': zysk,
+            'percent_zysk': zysk / invested * 100 if invested > 0 else 0,
+            'num_purchases': num,
+            'max_value': max_value,
+            'final_invested': invested,
+            'symbol': universe.symbols[symbol],
+        }
+        if is_open:
+            position['status'] = 'open'
+        else:
+            position['sell_reason'] = reasons.get(reason, '')
+        positions.append(position)
+    return positions
+
+
+def run_backtest(universe, strategy, budget=None, compound=None):
+    """One Strategy (or spec dict) over the universe.
+
+    With a budget (argument or the spec's portfolio.budget; 0 = unlimited)
+    all symbols run on one clock sharing that capital, otherwise each symbol
+    is simulated on its own as in the scripts.
+    """
+    if not isinstance(strategy, Strategy):
+        strategy = Strategy(strategy)
+    budget = strategy.budget if budget is None else budget
+    compound = strategy.compound if compound is None else compound
+    tr = universe.tr
+    args = (tr, universe.matrix, universe['avg_price'], universe.offsets) + strategy.kernel_args()
+    portfolio = None
+    if budget is None:
+        pi, pf, held = simulate(*args)
+    else:
+        pi, pf, held, clock_tr, exposure, market_value, realized, skipped = simulate_portfolio(
+            *args, float(budget), bool(compound))
+        portfolio = PortfolioState(float(budget), bool(compound), clock_tr, exposure, market_value, realized,
+                                   skipped)
+    return BacktestResult(universe, strategy, position_dicts(universe, strategy, pi, pf), held, portfolio)
+
+
+def run_backtests(universe, strategies, budget=None, compound=None):
+    """{name: BacktestResult} of many strategies over the same in-memory universe."""
+    return {name: run_backtest(universe, strategy, budget, compound) for name, strategy in strategies.items()}
+
+
+def summarize(result):
+    """The global figures the system scripts print, as a dict."""
+    positions = result.positions
+    closed = [p for p in positions if p.get('status') != 'open']
+    open_positions = [p for p in positions if p.get('status') == 'open']
+    realized = sum(p['zysk'] for p in closed)
+    unrealized = sum(p['zysk'] for p in open_positions)
+    total = realized + unrealized
+    invested_open = sum(p['final_invested'] for p in open_positions)
+    invested_all = sum(p['final_invested'] for p in positions)
+    trs, invested = result.invested_by_tr()
+    if len(invested):
+        peak = int(np.argmax(invested))
+        max_invested, max_invested_tr = float(invested[peak]), int(trs[peak])
+    else:
+        max_invested, max_invested_tr = 0.0, None
+    summary = {
+        'realized': realized,
+        'unrealized': unrealized,
+        'total': total,
+        'percent_unrealized': unrealized / invested_open * 100 if invested_open > 0 else 0,
+        'percent_total_invested': total / invested_all * 100 if invested_all > 0 else 0,
+        'percent_max_invested': total / max_invested * 100 if max_invested > 0 else 0,
+        'percent_realized_max_invested': realized / max_invested * 100 if max_invested > 0 else 0,
+        'max_invested': max_invested,
+        'max_invested_tr': max_invested_tr,
+        'closed': len(closed),
+        'open': len(open_positions),
+        'profitable': sum(1 for p in closed if p['zysk'] > 0),
+        'losing': sum(1 for p in closed if p['zysk'] < 0),
+    }
+    if result.portfolio is not None:
+        state = result.portfolio
+        summary['budget'] = state.budget
+        summary['skipped_buys'] = state.skipped_buys
+        summary['max_market_value'] = float(state.market_value.max()) if len(state.market_value) else 0.0
+    if closed:
+        summary['avg_length'] = sum(p['length'] for p in closed) / len(closed)
+        summary['max_length'] = max(p['length'] for p in closed)
+        max_value_position = max(closed, key=lambda p: p['max_value'])
+        summary['max_value'] = max_value_position['max_value']
+        summary['max_value_symbol'] = max_value_position['symbol']
+    return summary
+
+
+def print_report(result, details=False):
+    """Global summary in the wording of stock/systems/042.py."""
+    s = summarize(result)
+    if details:
+        for p in result.positions:
+            print(p)
+    print("\n=== Global Summary ===")
+    print(f"Sumaryczny zrealizowany zysk: {s['realized']:.2f} $")
+    print(f"Sumaryczny niezrealizowany zysk: {s['unrealized']:.2f} $")
+    print(f"Sumaryczny całkowity zysk: {s['total']:.2f} $")
+    print(f"Całkowity procentowy zysk/strata otwartych pozycji: {s['percent_unrealized']:.2f}%")
+    if s['closed']:
+        print(f"Sredni czas otwarcia pozycji: {s['avg_length']:.2f} days")
+        print(f"Najdluzszy czas otwarcia pozycji: {s['max_length']} days (symbol: {s['max_value_symbol']})")
+        print(f"Najwieksza wartosc pozycji: {s['max_value']:.2f} $ (symbol: {s['max_value_symbol']})")
+        print(f"Liczba pozycji zamknietych na zysku: {s['profitable']}")
+        print(f"Liczba pozycji zamknietych na stracie: {s['losing']}")
+    else:
+        print("No closed positions.")
+    print(f"Procentowy zysk (całkowity zysk / całkowity zainwestowany kapitał): {s['percent_total_invested']:.2f}%")
+    print(f"Procentowy zysk (całkowity zysk / max zainwestowany kapitał): {s['percent_max_invested']:.2f}%")
+    print(f"Procentowy zysk (całkowity zrealizowany zysk / max zainwestowany kapitał): "
+          f"{s['percent_realized_max_invested']:.2f}%")
+    print(f"Największy łączny koszt otwartych pozycji dla wszystkich symboli: {s['max_invested']:.2f} dla "
+          f"TickerRelative = {s['max_invested_tr'] if s['max_invested_tr'] is not None else 'N/A'}")
+    if result.portfolio is not None:
+        print(f"Budżet portfela: {s['budget']:.2f} $ ({'bez limitu' if s['budget'] <= 0 else 'limit'}"
+              f"{', z reinwestycją zysku' if result.portfolio.compound else ''}), pominięte zakupy: {s['skipped_buys']}")
+        print(f"Największa wartość rynkowa otwartych pozycji: {s['max_market_value']:.2f} $")
+    return s
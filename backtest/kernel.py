@@ -0,0 +1,584 @@
+"""Compiled entry/exit state machine driven by a compiled strategy spec (backtest/strategy.py).
+
+simulate() walks the concatenated bars symbol by symbol (symbols are
+independent), resume() does the same from saved per-symbol state (see
+backtest/checkpoint.py); simulate_portfolio() advances all symbols together
+on the TickerRelative clock and refuses buys that would exceed a shared
+capital budget. simulate_portfolio() steps the per-bar state machine _bar()
+symbol after symbol; resume() runs the same machine one symbol at a time on
+scalar locals, without the account bookkeeping. Numba compiles them when
+installed; without numba the same functions run as plain Python (slow, but
+identical results).
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba jest opcjonalna
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Operatory warunków (kolumna <op> wartość)
+OP_GT = 0
+OP_GE = 1
+OP_LT = 2
+OP_LE = 3
+OP_EQ = 4
+OP_NE = 5
+
+# Rodzaje reguł sprzedaży
+EXIT_BELOW = 0
+EXIT_CONSECUTIVE_BELOW = 1
+EXIT_WINDOW_BELOW = 2
+EXIT_TRAILING_STOP = 3
+
+# Kiedy reguła sprzedaży obowiązuje
+WHEN_ANY = 0
+WHEN_PROFIT = 1
+WHEN_LOSS = 2
+
+# Kod powodu sprzedaży: 0 - brak sygnału na barze zamknięcia, n - reguła exit[n - 1]
+REASON_NONE = 0
+
+# Stan symbolu: pola zmiennoprzecinkowe (fs) i całkowite (ss)
+F_SHARES, F_INVESTED, F_MAX_VALUE, F_MAX_AFTER, F_TRAIL_STOP, F_VALUE = range(6)
+S_OPEN, S_NUM, S_OPEN_I, S_TRIGGERED, S_TRAIL_ACTIVE, S_LAST_I = range(6)
+# Konto wspólne wszystkich symboli
+A_EXPOSURE, A_REALIZED, A_VALUE, A_SKIPPED = range(4)
+# Kolumny pozycji: całkowite (pi) i zmiennoprzecinkowe (pf)
+P_SYMBOL, P_OPEN, P_CLOSE, P_NUM, P_REASON, P_IS_OPEN = range(6)
+P_ZYSK, P_INVESTED, P_MAX_VALUE = range(3)
+
+
+@njit(cache=True, nogil=True, inline='always')
+def _compare(x, op, value):
+    if op == OP_GT:
+        return x > value
+    if op == OP_GE:
+        return x >= value
+    if op == OP_LT:
+        return x < value
+    if op == OP_LE:
+        return x <= value
+    if op == OP_EQ:
+        return x == value
+    return x != value
+
+
+@njit(cache=True, nogil=True)
+def new_state(n_symbols, n_exit, exit_kind, exit_count):
+    """Flat state of n_symbols symbols: (fs, ss, ring, counters), as resume() takes and updates it."""
+    max_window = 1
+    for e in range(n_exit):
+        if exit_kind[e] == EXIT_WINDOW_BELOW:
+            max_window = max(max_window, exit_count[e])
+    fs = np.zeros((n_symbols, 6), np.float64)
+    ss = np.zeros((n_symbols, 6), np.int64)
+    ss[:, S_OPEN_I] = -1
+    ss[:, S_LAST_I] = -1
+    # Kolejki ostatnich wartości wskaźnika reguł okienkowych i liczniki kolejnych barów
+    ring = np.empty((n_symbols, n_exit, max_window), np.float64)
+    counters = np.zeros((n_symbols, n_exit, 3), np.int64)  # długość kolejki, pozycja w kolejce, licznik kolejnych
+    return fs, ss, ring, counters
+
+
+@njit(cache=True, nogil=True)
+def _close(k, i, reason, is_open, fs, ss, counters, pi, pf, count, acct):
+    """Record the position of symbol k closed at bar i (or still open at the end) and reset its state."""
+    c = count[0]
+    value = fs[k, F_VALUE]
+    invested = fs[k, F_INVESTED]
+    pi[c, P_SYMBOL] = k
+    pi[c, P_OPEN] = ss[k, S_OPEN_I]
+    pi[c, P_CLOSE] = i
+    pi[c, P_NUM] = ss[k, S_NUM]
+    pi[c, P_REASON] = reason
+    pi[c, P_IS_OPEN] = is_open
+    pf[c, P_ZYSK] = value - invested
+    pf[c, P_INVESTED] = invested
+    pf[c, P_MAX_VALUE] = fs[k, F_MAX_VALUE]
+    count[0] = c + 1
+    if is_open:
+        return
+    acct[A_EXPOSURE] -= invested
+    acct[A_REALIZED] += value - invested
+    acct[A_VALUE] -= value
+    last_i = ss[k, S_LAST_I]
+    fs[k, :] = 0.0
+    ss[k, :] = 0
+    ss[k, S_OPEN_I] = -1
+    ss[k, S_LAST_I] = last_i
+    counters[k, :, :] = 0
+
+
+@njit(cache=True, nogil=True)
+def _bar(k, i, ind, price,
+         gate_col, gate_op, gate_val, buy_col, buy_op, buy_val, buy_amount, buy_sum,
+         exit_kind, exit_col, exit_val, exit_count, exit_param, exit_when,
+         confirm_drop, max_value_daily, budget, compound,
+         fs, ss, ring, counters, pi, pf, count, acct, held):
+    """One bar of symbol k: exits of the open position, then buys - the loop body of the system scripts."""
+    n_exit = len(exit_kind)
+    ss[k, S_LAST_I] = i
+    p = price[i]
+    for e in range(n_exit):
+        if exit_kind[e] == EXIT_WINDOW_BELOW:
+            window = exit_count[e]
+            ring[k, e, counters[k, e, 1]] = ind[exit_col[e], i]
+            counters[k, e, 1] = (counters[k, e, 1] + 1) % window
+            if counters[k, e, 0] < window:
+                counters[k, e, 0] += 1
+
+    if ss[k, S_OPEN]:
+        shares = fs[k, F_SHARES]
+        invested = fs[k, F_INVESTED]
+        value = shares * p
+        acct[A_VALUE] += value - fs[k, F_VALUE]
+        fs[k, F_VALUE] = value
+        pnl = value - invested
+        if max_value_daily:
+            fs[k, F_MAX_VALUE] = max(fs[k, F_MAX_VALUE], value)
+        signal = False
+        reason = REASON_NONE
+
+        for e in range(n_exit):
+            kind = exit_kind[e]
+            when = exit_when[e]
+            allowed = not (when == WHEN_PROFIT and pnl < 0 or when == WHEN_LOSS and pnl >= 0)
+            fired = False
+            if kind == EXIT_BELOW:
+                fired = allowed and ind[exit_col[e], i] < exit_val[e]
+            elif kind == EXIT_CONSECUTIVE_BELOW:
+                # Licznik liczy się zawsze, także gdy reguła nie obowiązuje
+                x = ind[exit_col[e], i]
+                if x == x and x < exit_val[e]:
+                    counters[k, e, 2] += 1
+                else:
+                    counters[k, e, 2] = 0
+                fired = allowed and counters[k, e, 2] >= exit_count[e]
+            elif kind == EXIT_WINDOW_BELOW:
+                window = exit_count[e]
+                if allowed and counters[k, e, 0] >= window:
+                    valid = 0
+                    below = 0
+                    for j in range(window):
+                        x = ring[k, e, j]
+                        if x == x:
+                            valid += 1
+                            if x < exit_val[e]:
+                                below += 1
+                    fired = valid >= window and below >= exit_param[e]
+            else:
+                if not ss[k, S_TRAIL_ACTIVE] and invested > 0 and value / invested - 1 >= exit_val[e]:
+                    ss[k, S_TRAIL_ACTIVE] = 1
+                    fs[k, F_TRAIL_STOP] = invested / shares
+                if ss[k, S_TRAIL_ACTIVE]:
+                    fs[k, F_TRAIL_STOP] = max(fs[k, F_TRAIL_STOP], p * exit_param[e])
+                    fired = allowed and p < fs[k, F_TRAIL_STOP]
+            if fired and not signal:
+                signal = True
+                reason = e + 1
+
+        close = False
+        if confirm_drop <= 0.0:
+            close = signal
+        else:
+            if signal and not ss[k, S_TRIGGERED]:
+                ss[k, S_TRIGGERED] = 1
+                fs[k, F_MAX_AFTER] = value
+                return
+            if ss[k, S_TRIGGERED]:
+                fs[k, F_MAX_AFTER] = max(fs[k, F_MAX_AFTER], value)
+                close = value <= fs[k, F_MAX_AFTER] * confirm_drop
+
+        if close:
+            _close(k, i, reason, False, fs, ss, counters, pi, pf, count, acct)
+            return
+
+    rule = -1
+    amount = 0.0
+    for b in range(len(buy_col)):
+        if _compare(ind[buy_col[b], i], buy_op[b], buy_val[b]):
+            rule = b
+            amount += buy_amount[b]
+            if not buy_sum:
+                break
+    gate = len(gate_col) == 0 and rule >= 0
+    for g in range(len(gate_col)):
+        if _compare(ind[gate_col[g], i], gate_op[g], gate_val[g]):
+            gate = True
+            break
+    if gate:
+        if rule < 0:
+            return
+        available = budget - acct[A_EXPOSURE] + (acct[A_REALIZED] if compound else 0.0)
+        if budget > 0 and amount > available + 1e-9:
+            acct[A_SKIPPED] += 1
+        else:
+            fs[k, F_SHARES] += amount / p
+            fs[k, F_INVESTED] += amount
+            acct[A_EXPOSURE] += amount
+            if not ss[k, S_OPEN]:
+                ss[k, S_OPEN] = 1
+                ss[k, S_NUM] = 1
+                ss[k, S_OPEN_I] = i
+                ss[k, S_TRIGGERED] = 0
+                fs[k, F_MAX_AFTER] = 0.0
+                ss[k, S_TRAIL_ACTIVE] = 0
+                fs[k, F_TRAIL_STOP] = 0.0
+                counters[k, :, 2] = 0
+            else:
+                ss[k, S_NUM] += 1
+            shares = fs[k, F_SHARES]
+            invested = fs[k, F_INVESTED]
+            value = shares * p
+            acct[A_VALUE] += value - fs[k, F_VALUE]
+            fs[k, F_VALUE] = value
+            fs[k, F_MAX_VALUE] = max(fs[k, F_MAX_VALUE], value)
+
+            # Trailing stop sprawdzany ponownie po dokupieniu (001-002)
+            for e in range(n_exit):
+                if exit_kind[e] != EXIT_TRAILING_STOP:
+                    continue
+                if not ss[k, S_TRAIL_ACTIVE] and value / invested - 1 >= exit_val[e]:
+                    ss[k, S_TRAIL_ACTIVE] = 1
+                    fs[k, F_TRAIL_STOP] = invested / shares
+                if ss[k, S_TRAIL_ACTIVE]:
+                    fs[k, F_TRAIL_STOP] = max(fs[k, F_TRAIL_STOP], p * exit_param[e])
+                if ss[k, S_TRAIL_ACTIVE] and p < fs[k, F_TRAIL_STOP]:
+                    _close(k, i, e + 1, False, fs, ss, counters, pi, pf, count, acct)
+                break
+
+    if ss[k, S_OPEN]:
+        held[i] = fs[k, F_INVESTED]
+
+
+@njit(cache=True, nogil=True)
+def _finish(k, price, fs, ss, counters, pi, pf, count, acct):
+    """Position still open after the symbol's last bar, valued at that bar."""
+    if ss[k, S_OPEN]:
+        last_i = ss[k, S_LAST_I]
+        value = fs[k, F_SHARES] * price[last_i]
+        acct[A_VALUE] += value - fs[k, F_VALUE]
+        fs[k, F_VALUE] = value
+        _close(k, last_i, REASON_NONE, True, fs, ss, counters, pi, pf, count, acct)
+
+
+@njit(cache=True, nogil=True)
+def simulate(tr, ind, price, offsets, min_tr,
+             gate_col, gate_op, gate_val,
+             buy_col, buy_op, buy_val, buy_amount, buy_sum,
+             exit_kind, exit_col, exit_val, exit_count, exit_param, exit_when,
+             confirm_drop, max_value_daily):
+    """Positions of every symbol simulated independently, plus invested capital per bar (NaN where not recorded).
+
+    ind is (columns, bars). A bar buys when any gate condition holds (or, with
+    no gate, when a buy rule matches); the first matching buy rule sets the
+    amount, with buy_sum the amounts of all matching rules add up. Exit rules
+    are all evaluated every open bar, the first one that fires names the
+    reason. confirm_drop <= 0 sells on the signal bar;
+    otherwise the signal only arms the exit and the position is sold once its
+    value falls to confirm_drop * the highest value seen since. Bars with
+    TickerRelative <= min_tr are skipped.
+    Returns the position tables pi (symbol, open/close bar index, purchases,
+    reason code, still-open flag) and pf (profit, invested, max value), and held.
+    """
+    fs, ss, ring, counters = new_state(len(offsets) - 1, len(exit_kind), exit_kind, exit_count)
+    return resume(tr, ind, price, offsets, offsets[:-1], fs, ss, ring, counters, min_tr,
+                  gate_col, gate_op, gate_val, buy_col, buy_op, buy_val, buy_amount, buy_sum,
+                  exit_kind, exit_col, exit_val, exit_count, exit_param, exit_when,
+                  confirm_drop, max_value_daily)
+
+
+@njit(cache=True, nogil=True)
+def resume(tr, ind, price, offsets, start, fs, ss, ring, counters, min_tr,
+           gate_col, gate_op, gate_val,
+           buy_col, buy_op, buy_val, buy_amount, buy_sum,
+           exit_kind, exit_col, exit_val, exit_count, exit_param, exit_when,
+           confirm_drop, max_value_daily):
+    """simulate() continuing from saved state: symbol k runs bars start[k]:offsets[k + 1] from fs/ss/ring/counters.
+
+    The state arrays are updated in place, so after the call they describe
+    every symbol at its last bar and can be saved for the next run. Positions
+    closed on the processed bars and those still open are returned as by
+    simulate(); S_OPEN_I / S_LAST_I of the state must be indices into these
+    bars. The state machine is _bar() without the shared account, on scalar
+    locals loaded once per symbol (simulate_portfolio() needs _bar() to
+    interleave symbols; here each symbol runs to its end in one go).
+    """
+    n = len(tr)
+    n_symbols = len(offsets) - 1
+    n_gate = len(gate_col)
+    n_buy = len(buy_col)
+    n_exit = len(exit_kind)
+    has_trailing = False
+    for e in range(n_exit):
+        if exit_kind[e] == EXIT_TRAILING_STOP:
+            has_trailing = True
+    pi = np.empty((n + n_symbols, 6), np.int64)
+    pf = np.empty((n + n_symbols, 3), np.float64)
+    held = np.full(n, np.nan)
+    count = 0
+
+    for k in range(n_symbols):
+        ring_k = ring[k]
+        cnt = counters[k]
+        is_open = ss[k, S_OPEN] != 0
+        num = ss[k, S_NUM]
+        open_i = ss[k, S_OPEN_I]
+        triggered = ss[k, S_TRIGGERED] != 0
+        trailing_active = ss[k, S_TRAIL_ACTIVE] != 0
+        last_i = ss[k, S_LAST_I]
+        shares = fs[k, F_SHARES]
+        invested = fs[k, F_INVESTED]
+        max_value = fs[k, F_MAX_VALUE]
+        max_after = fs[k, F_MAX_AFTER]
+        trailing_stop = fs[k, F_TRAIL_STOP]
+        value_now = fs[k, F_VALUE]
+
+        for i in range(start[k], offsets[k + 1]):
+            if tr[i] <= min_tr:
+                continue
+            last_i = i
+            p = price[i]
+            for e in range(n_exit):
+                if exit_kind[e] == EXIT_WINDOW_BELOW:
+                    window = exit_count[e]
+                    ring_k[e, cnt[e, 1]] = ind[exit_col[e], i]
+                    cnt[e, 1] = (cnt[e, 1] + 1) % window
+                    if cnt[e, 0] < window:
+                        cnt[e, 0] += 1
+
+            if is_open:
+                value = shares * p
+                value_now = value
+                pnl = value - invested
+                if max_value_daily:
+                    max_value = max(max_value, value)
+                signal = False
+                reason = REASON_NONE
+
+                for e in range(n_exit):
+                    kind = exit_kind[e]
+                    when = exit_when[e]
+                    allowed = not (when == WHEN_PROFIT and pnl < 0 or when == WHEN_LOSS and pnl >= 0)
+                    fired = False
+                    if kind == EXIT_BELOW:
+                        fired = allowed and ind[exit_col[e], i] < exit_val[e]
+                    elif kind == EXIT_CONSECUTIVE_BELOW:
+                        # Licznik liczy się zawsze, także gdy reguła nie obowiązuje
+                        x = ind[exit_col[e], i]
+                        if x == x and x < exit_val[e]:
+                            cnt[e, 2] += 1
+                        else:
+                            cnt[e, 2] = 0
+                        fired = allowed and cnt[e, 2] >= exit_count[e]
+                    elif kind == EXIT_WINDOW_BELOW:
+                        window = exit_count[e]
+                        if allowed and cnt[e, 0] >= window:
+                            valid = 0
+                            below = 0
+                            for j in range(window):
+                                x = ring_k[e, j]
+                                if x == x:
+                                    valid += 1
+                                    if x < exit_val[e]:
+                                        below += 1
+                            fired = valid >= window and below >= exit_param[e]
+                    else:
+                        if not trailing_active and invested > 0 and value / invested - 1 >= exit_val[e]:
+                            trailing_active = True
+                            trailing_stop = invested / shares
+                        if trailing_active:
+                            trailing_stop = max(trailing_stop, p * exit_param[e])
+                            fired = allowed and p < trailing_stop
+                    if fired and not signal:
+                        signal = True
+                        reason = e + 1
+
+                close = False
+                if confirm_drop <= 0.0:
+                    close = signal
+                else:
+                    if signal and not triggered:
+                        triggered = True
+                        max_after = value
+                        continue
+                    if triggered:
+                        max_after = max(max_after, value)
+                        close = value <= max_after * confirm_drop
+
+                if close:
+                    pi[count, P_SYMBOL] = k
+                    pi[count, P_OPEN] = open_i
+                    pi[count, P_CLOSE] = i
+                    pi[count, P_NUM] = num
+                    pi[count, P_REASON] = reason
+                    pi[count, P_IS_OPEN] = 0
+                    pf[count, P_ZYSK] = value - invested
+                    pf[count, P_INVESTED] = invested
+                    pf[count, P_MAX_VALUE] = max_value
+                    count += 1
+                    is_open = False
+                    shares = invested = max_value = max_after = trailing_stop = value_now = 0.0
+                    num = 0
+                    open_i = -1
+                    triggered = False
+                    trailing_active = False
+                    cnt[:, :] = 0
+                    continue
+
+            rule = -1
+            amount = 0.0
+            for b in range(n_buy):
+                if _compare(ind[buy_col[b], i], buy_op[b], buy_val[b]):
+                    rule = b
+                    amount += buy_amount[b]
+                    if not buy_sum:
+                        break
+            gate = n_gate == 0 and rule >= 0
+            for g in range(n_gate):
+                if _compare(ind[gate_col[g], i], gate_op[g], gate_val[g]):
+                    gate = True
+                    break
+            if gate:
+                if rule < 0:
+                    continue
+                shares += amount / p
+                invested += amount
+                if not is_open:
+                    is_open = True
+                    num = 1
+                    open_i = i
+                    triggered = False
+                    max_after = 0.0
+                    trailing_active = False
+                    trailing_stop = 0.0
+                    cnt[:, 2] = 0
+                else:
+                    num += 1
+                value = shares * p
+                value_now = value
+                max_value = max(max_value, value)
+
+                # Trailing stop sprawdzany ponownie po dokupieniu (001-002)
+                if has_trailing:
+                    for e in range(n_exit):
+                        if exit_kind[e] != EXIT_TRAILING_STOP:
+                            continue
+                        if not trailing_active and value / invested - 1 >= exit_val[e]:
+                            trailing_active = True
+                            trailing_stop = invested / shares
+                        if trailing_active:
+                            trailing_stop = max(trailing_stop, p * exit_param[e])
+                        if trailing_active and p < trailing_stop:
+                            pi[count, P_SYMBOL] = k
+                            pi[count, P_OPEN] = open_i
+                            pi[count, P_CLOSE] = i
+                            pi[count, P_NUM] = num
+                            pi[count, P_REASON] = e + 1
+                            pi[count, P_IS_OPEN] = 0
+                            pf[count, P_ZYSK] = value - invested
+                            pf[count, P_INVESTED] = invested
+                            pf[count, P_MAX_VALUE] = max_value
+                            count += 1
+                            is_open = False
+                            shares = invested = max_value = max_after = trailing_stop = value_now = 0.0
+                            num = 0
+                            open_i = -1
+                            triggered = False
+                            trailing_active = False
+                            cnt[:, :] = 0
+                        break
+
+            if is_open:
+                held[i] = invested
+
+        # Pozycja otwarta po ostatnim barze symbolu - wyceniona na tym barze, stan zostaje do wznowienia
+        if is_open:
+            value_now = shares * price[last_i]
+            pi[count, P_SYMBOL] = k
+            pi[count, P_OPEN] = open_i
+            pi[count, P_CLOSE] = last_i
+            pi[count, P_NUM] = num
+            pi[count, P_REASON] = REASON_NONE
+            pi[count, P_IS_OPEN] = 1
+            pf[count, P_ZYSK] = value_now - invested
+            pf[count, P_INVESTED] = invested
+            pf[count, P_MAX_VALUE] = max_value
+            count += 1
+
+        ss[k, S_OPEN] = is_open
+        ss[k, S_NUM] = num
+        ss[k, S_OPEN_I] = open_i
+        ss[k, S_TRIGGERED] = triggered
+        ss[k, S_TRAIL_ACTIVE] = trailing_active
+        ss[k, S_LAST_I] = last_i
+        fs[k, F_SHARES] = shares
+        fs[k, F_INVESTED] = invested
+        fs[k, F_MAX_VALUE] = max_value
+        fs[k, F_MAX_AFTER] = max_after
+        fs[k, F_TRAIL_STOP] = trailing_stop
+        fs[k, F_VALUE] = value_now
+    return pi[:count], pf[:count], held
+
+
+@njit(cache=True, nogil=True)
+def simulate_portfolio(tr, ind, price, offsets, min_tr,
+                       gate_col, gate_op, gate_val,
+                       buy_col, buy_op, buy_val, buy_amount, buy_sum,
+                       exit_kind, exit_col, exit_val, exit_count, exit_param, exit_when,
+                       confirm_drop, max_value_daily, budget, compound):
+    """simulate() with all symbols on one TickerRelative clock sharing a capital budget.
+
+    At every TickerRelative step the symbols having a bar there are processed
+    in universe order; a buy is skipped when it would lift the invested
+    capital of open positions above budget (plus realized profit when
+    compound). budget <= 0 means unlimited. Besides the position tables,
+    returns per clock step (clock_tr): invested capital, market value of open
+    positions and realized profit, and the number of skipped buys.
+    """
+    n = len(tr)
+    n_symbols = len(offsets) - 1
+    fs, ss, ring, counters = new_state(n_symbols, len(exit_kind), exit_kind, exit_count)
+    pi = np.empty((n, 6), np.int64)
+    pf = np.empty((n, 3), np.float64)
+    count = np.zeros(1, np.int64)
+    acct = np.zeros(4, np.float64)
+    held = np.full(n, np.nan)
+    ptr = offsets[:-1].copy()
+
+    first = np.iinfo(np.int64).max
+    last = np.iinfo(np.int64).min
+    for k in range(n_symbols):
+        # Pominięcie barów sprzed okna TickerRelative
+        while ptr[k] < offsets[k + 1] and tr[ptr[k]] <= min_tr:
+            ptr[k] += 1
+        if ptr[k] < offsets[k + 1]:
+            first = min(first, tr[ptr[k]])
+            last = max(last, tr[offsets[k + 1] - 1])
+    steps = max(last - first + 1, 0)
+    clock_tr = np.arange(first, first + steps)
+    exposure = np.zeros(steps, np.float64)
+    market_value = np.zeros(steps, np.float64)
+    realized = np.zeros(steps, np.float64)
+
+    for t in range(steps):
+        now = first + t
+        for k in range(n_symbols):
+            i = ptr[k]
+            if i < offsets[k + 1] and tr[i] == now:
+                _bar(k, i, ind, price, gate_col, gate_op, gate_val, buy_col, buy_op, buy_val, buy_amount, buy_sum,
+                     exit_kind, exit_col, exit_val, exit_count, exit_param, exit_when,
+                     confirm_drop, max_value_daily, budget, compound,
+                     fs, ss, ring, counters, pi, pf, count, acct, held)
+                ptr[k] = i + 1
+        exposure[t] = acct[A_EXPOSURE]
+        market_value[t] = acct[A_VALUE]
+        realized[t] = acct[A_REALIZED]
+    for k in range(n_symbols):
+        _finish(k, price, fs, ss, counters, pi, pf, count, acct)
+    return (pi[:count[0]], pf[:count[0]], held, clock_tr, exposure, market_value, realized,
+            int(acct[A_SKIPPED]))
@@ -0,0 +1,58 @@
+"""Backtest stock/systems strategies (or spec files) over the whole universe, data loaded once.
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python3 -m backtest.run --system 042
+    python3 -m backtest.run --system 031 037 042 --updated 2025-10-01 --limit 50
+    python3 -m backtest.run --spec warianty.yaml --details
+    python3 -m backtest.run --system 042 --cache          # dane z lokalnego cache (backtest.cache)
+    python3 -m backtest.run --system 042 --budget 5000    # portfel: wspólny kapitał wszystkich symboli
+    python3 -m backtest.run --system 042 --cache --incremental   # tylko nowe bary od ostatniego uruchomienia
+"""
+import argparse
+import logging
+import time
+
+from backtest.cache import add_universe_arguments, universe_from_args
+from backtest.checkpoint import run_incremental
+from backtest.engine import print_report, run_backtests
+from backtest.strategy import SYSTEMS, Strategy
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--system', nargs='*', default=[], choices=sorted(SYSTEMS))
+    parser.add_argument('--spec', action='append', default=[], help='.yaml/.json file with one spec or {name: spec}')
+    add_universe_arguments(parser)
+    parser.add_argument('--budget', type=float, help='run all symbols on one clock sharing this capital (0 = no limit)')
+    parser.add_argument('--compound', action='store_true', help='with --budget: realized profit adds to the budget')
+    parser.add_argument('--incremental', action='store_true',
+                        help='resume from the checkpoint of the last run, simulate only new bars (backtest.checkpoint)')
+    parser.add_argument('--replay', action='store_true', help='with --incremental: rebuild the checkpoints in full')
+    parser.add_argument('--details', action='store_true', help='print every position')
+    args = parser.parse_args()
+    if args.incremental and args.budget is not None:
+        parser.error('--incremental runs symbols independently, it cannot be combined with --budget')
+    strategies = {name: SYSTEMS[name] for name in args.system}
+    for path in args.spec:
+        strategies.update(Strategy.from_file(path))
+    if not strategies:
+        strategies = {'042': SYSTEMS['042']}
+
+    universe = universe_from_args(args)
+    loaded = time.perf_counter()
+    if args.incremental:
+        results = {name: run_incremental(universe, strategy, args.dataset, args.layout, replay=args.replay)[0]
+                   for name, strategy in strategies.items()}
+    else:
+        results = run_backtests(universe, strategies, args.budget, args.compound if args.budget is not None else None)
+    logger.info(f"{len(results)} strategii policzonych w {time.perf_counter() - loaded:.2f}s")
+    for name, result in results.items():
+        print(f"\n##### {name}: {len(result.positions)} pozycji")
+        print_report(result, details=args.details)
+
+
+if __name__ == "__main__":
+    main()
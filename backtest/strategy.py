@@ -0,0 +1,223 @@
+"""Declarative strategy specs (dict / YAML / JSON) compiled to the arrays backtest.kernel.simulate runs.
+
+A spec describes what the stock/systems scripts hard-code:
+
+    entry:
+      when: ['ind_22 > 3', 'ind_7 > 0']        # buy on a bar where any holds (optional)
+      buy_mode: first                          # first matching rule sets the amount; sum - all matching add up
+      buy:
+        - {if: 'ind_22 == 6', amount: 10}
+        - {if: 'ind_22 == 9', amount: 10}
+        - {if: 'ind_7 == 1', amount: 10}
+    exit:                                      # all evaluated, the first that fires names the reason
+      - {rule: below, ind: ind_5, value: -7, when: profit}
+      - {rule: consecutive_below, ind: ind_5, value: -5, count: 3, when: profit}
+      - {rule: below, ind: ind_5, value: -10, when: loss}
+      - {rule: window_below, ind: ind_5, value: 0, window: 10, count: 6, when: profit}
+      - {rule: trailing_stop, activate: 0.05, trail: 0.95}
+    confirm_drop: 0.915                        # sell once value <= 0.915 * max after the signal
+    max_value_daily: true                      # max_value tracked every bar, not only on buys
+    min_ticker_relative: -250                  # only bars with TickerRelative > -250
+    portfolio: {budget: 5000, compound: false} # all symbols on one clock sharing the capital (optional)
+
+`when` of an exit rule is profit (pnl >= 0), loss (pnl < 0) or any (default).
+"""
+import json
+
+import numpy as np
+
+from backtest.data import COLUMNS
+from backtest.kernel import (EXIT_BELOW, EXIT_CONSECUTIVE_BELOW, EXIT_TRAILING_STOP, EXIT_WINDOW_BELOW, OP_EQ,
+                             OP_GE, OP_GT, OP_LE, OP_LT, OP_NE, WHEN_ANY, WHEN_LOSS, WHEN_PROFIT)
+
+OPS = {'>': OP_GT, '>=': OP_GE, '<': OP_LT, '<=': OP_LE, '==': OP_EQ, '!=': OP_NE}
+EXIT_RULES = {'below': EXIT_BELOW, 'consecutive_below': EXIT_CONSECUTIVE_BELOW,
+              'window_below': EXIT_WINDOW_BELOW, 'trailing_stop': EXIT_TRAILING_STOP}
+WHEN = {'any': WHEN_ANY, 'profit': WHEN_PROFIT, 'loss': WHEN_LOSS}
+BUY_MODES = ('first', 'sum')
+_NUMBERS = {2: 'two', 3: 'three', 4: 'four', 5: 'five'}
+
+
+def _column(name):
+    if name not in COLUMNS:
+        raise ValueError(f"Unknown column {name!r}, expected one of {', '.join(COLUMNS)}")
+    return COLUMNS.index(name)
+
+
+def parse_condition(text):
+    """'ind_22 == 6' -> (column index, op code, value)."""
+    parts = str(text).split()
+    if len(parts) != 3 or parts[1] not in OPS:
+        raise ValueError(f"Bad condition {text!r}, expected '<column> <op> <number>'")
+    return _column(parts[0]), OPS[parts[1]], float(parts[2])
+
+
+def _conditions(conditions):
+    parsed = [parse_condition(c) for c in conditions]
+    return (np.array([c[0] for c in parsed], dtype=np.int64), np.array([c[1] for c in parsed], dtype=np.int64),
+            np.array([c[2] for c in parsed], dtype=np.float64))
+
+
+class Strategy:
+    """A validated spec with its kernel arrays; build with Strategy(spec) or Strategy.from_file(path)."""
+
+    def __init__(self, spec, name=None):
+        self.spec = spec
+        self.name = name or spec.get('name')
+        unknown = set(spec) - {'name', 'entry', 'exit', 'confirm_drop', 'max_value_daily', 'min_ticker_relative',
+                               'portfolio'}
+        if unknown:
+            raise ValueError(f"Unknown spec keys: {', '.join(sorted(unknown))}")
+        entry = spec.get('entry') or {}
+        buys = entry.get('buy') or []
+        if not buys:
+            raise ValueError("Spec needs at least one entry.buy rule")
+        buy_mode = entry.get('buy_mode', 'first')
+        if buy_mode not in BUY_MODES:
+            raise ValueError(f"Unknown entry.buy_mode {buy_mode!r}, expected one of {', '.join(BUY_MODES)}")
+        self.gate = _conditions(entry.get('when') or [])
+        buy_col, buy_op, buy_val = _conditions([b['if'] for b in buys])
+        self.buy = (buy_col, buy_op, buy_val, np.array([float(b['amount']) for b in buys], dtype=np.float64),
+                    buy_mode == 'sum')
+
+        self.exits = list(spec.get('exit') or [])
+        kind, col, val, count, param, when = [], [], [], [], [], []
+        for rule in self.exits:
+            if rule.get('rule') not in EXIT_RULES:
+                raise ValueError(f"Unknown exit rule {rule.get('rule')!r}, expected one of {', '.join(EXIT_RULES)}")
+            kind.append(EXIT_RULES[rule['rule']])
+            when.append(WHEN[rule.get('when', 'any')])
+            if rule['rule'] == 'trailing_stop':
+                col.append(0)
+                val.append(float(rule.get('activate', 0.0)))
+                param.append(float(rule['trail']))
+                count.append(0)
+                continue
+            col.append(_column(rule.get('ind', 'ind_5')))
+            val.append(float(rule['value']))
+            if rule['rule'] == 'window_below':
+                # Okno w exit_count, wymagana liczba barów pod progiem w exit_param
+                count.append(int(rule['window']))
+                param.append(float(rule['count']))
+            else:
+                count.append(int(rule.get('count', 0)))
+                param.append(0.0)
+        self.exit = (np.array(kind, dtype=np.int64), np.array(col, dtype=np.int64), np.array(val, dtype=np.float64),
+                     np.array(count, dtype=np.int64), np.array(param, dtype=np.float64),
+                     np.array(when, dtype=np.int64))
+        self.confirm_drop = spec.get('confirm_drop')
+        self.max_value_daily = bool(spec.get('max_value_daily', self.confirm_drop is not None))
+        self.min_ticker_relative = spec.get('min_ticker_relative')
+        portfolio = spec.get('portfolio')
+        self.budget = None if portfolio is None else float(portfolio.get('budget', 0))
+        self.compound = bool((portfolio or {}).get('compound', False))
+
+    @classmethod
+    def from_file(cls, path):
+        """One spec, or a {name: spec} mapping, from a .json or .yaml file; returns {name: Strategy}."""
+        with open(path, encoding='utf-8') as f:
+            if path.endswith('.json'):
+                data = json.load(f)
+            else:
+                import yaml  # PyYAML potrzebny tylko dla plików .yaml
+                data = yaml.safe_load(f)
+        if 'entry' in data:
+            return {data.get('name', path): cls(data)}
+        return {name: cls(spec, name) for name, spec in data.items()}
+
+    def kernel_args(self):
+        min_tr = np.iinfo(np.int64).min if self.min_ticker_relative is None else int(self.min_ticker_relative)
+        return ((min_tr,) + self.gate + self.buy + self.exit
+                + (float(self.confirm_drop or 0.0), self.max_value_daily))
+
+    def reasons(self):
+        """Sell reason texts by kernel code, worded like the scripts."""
+        texts = {}
+        for n, rule in enumerate(self.exits, 1):
+            if rule['rule'] == 'trailing_stop':
+                text = "trailing stop"
+            elif rule['rule'] == 'window_below':
+                text = f"{rule.get('ind', 'ind_5')} < {rule['value']:g} in at least {rule['count']} of last " \
+                       f"{rule['window']} TR"
+            elif rule['rule'] == 'consecutive_below':
+                text = f"{rule.get('ind', 'ind_5')} < {rule['value']:g} for " \
+                       f"{_NUMBERS.get(rule['count'], rule['count'])} consecutive rows"
+            else:
+                text = f"{rule.get('ind', 'ind_5')} < {rule['value']:g}"
+            if rule['rule'] != 'window_below' and rule.get('when') == 'loss':
+                text += " (at a loss)"
+            texts[n] = text
+        return texts
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name or self.spec!r})"
+
+
+def signal_exit_spec(amount_22_9, confirm_drop=None, buy_mode='first'):
+    """Spec of stock/systems/031-044: buys on ind_22 == 6 / 9 or ind_7 == 1, exits on ind_5 signals.
+
+    032 adds up the amounts of all matching buy conditions (buy_mode 'sum'), the others take the first.
+    """
+    spec = {
+        'entry': {
+            'when': ['ind_22 > 3', 'ind_7 > 0'],
+            'buy': [{'if': 'ind_22 == 6', 'amount': 10}, {'if': 'ind_22 == 9', 'amount': amount_22_9},
+                    {'if': 'ind_7 == 1', 'amount': 10}],
+        },
+        'exit': [
+            {'rule': 'below', 'ind': 'ind_5', 'value': -7, 'when': 'profit'},
+            {'rule': 'consecutive_below', 'ind': 'ind_5', 'value': -5, 'count': 3, 'when': 'profit'},
+            {'rule': 'below', 'ind': 'ind_5', 'value': -10, 'when': 'loss'},
+            {'rule': 'window_below', 'ind': 'ind_5', 'value': 0, 'window': 10, 'count': 6, 'when': 'profit'},
+        ],
+    }
+    if buy_mode != 'first':
+        spec['entry']['buy_mode'] = buy_mode
+    if confirm_drop is not None:
+        spec['confirm_drop'] = confirm_drop
+    return spec
+
+
+def trailing_stop_spec(buy, when=None, lookback=None):
+    """Spec of stock/systems/001-002: trailing stop at break-even after +5%, then 5% under the price."""
+    spec = {
+        'entry': {'when': when or [], 'buy': buy},
+        'exit': [{'rule': 'trailing_stop', 'activate': 0.05, 'trail': 0.95}],
+    }
+    if lookback is not None:
+        spec['min_ticker_relative'] = lookback
+    return spec
+
+
+# Systemy ze stock/systems opisane specyfikacją (005-024 sprzedają częściami z koszyków - zostają skryptami)
+SPECS = {
+    '001': trailing_stop_spec([{'if': 'ind_22 > 3', 'amount': 1}], lookback=-250),
+    '002': trailing_stop_spec([{'if': 'ind_22 == 6', 'amount': 1}, {'if': 'ind_22 == 9', 'amount': 3}],
+                              when=['ind_22 > 3']),
+    '003': {
+        'entry': {'when': ['ind_22 > 3'],
+                  'buy': [{'if': 'ind_22 == 6', 'amount': 10}, {'if': 'ind_22 == 9', 'amount': 30}]},
+        'exit': [{'rule': 'below', 'ind': 'ind_5', 'value': -5}],
+        'min_ticker_relative': -250,
+    },
+    '025': {
+        'entry': {'when': ['ind_22 > 3', 'ind_7 > 0'],
+                  'buy': [{'if': 'ind_22 == 6', 'amount': 10}, {'if': 'ind_22 == 9', 'amount': 30},
+                          {'if': 'ind_7 == 1', 'amount': 10}]},
+        'exit': [{'rule': 'below', 'ind': 'ind_5', 'value': -7},
+                 {'rule': 'consecutive_below', 'ind': 'ind_5', 'value': -5, 'count': 3}],
+    },
+    '031': signal_exit_spec(30),
+    '032': signal_exit_spec(30, buy_mode='sum'),
+    '034': signal_exit_spec(50),
+    '035': signal_exit_spec(10),
+    '037': signal_exit_spec(30, 0.95),
+    '038': signal_exit_spec(20, 0.95),
+    '039': signal_exit_spec(10, 0.95),
+    '040': signal_exit_spec(30, 0.945),
+    '041': signal_exit_spec(10, 0.945),
+    '042': signal_exit_spec(10, 0.915),
+    '043': signal_exit_spec(10, 0.915),
+    '044': signal_exit_spec(10, 0.915),
+}
+SYSTEMS = {name: Strategy(spec, name) for name, spec in SPECS.items()}
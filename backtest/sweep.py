@@ -0,0 +1,233 @@
+"""Parameter sweep of a strategy spec: every combination of the given values, fanned out over processes.
+
+The universe is loaded once and placed in shared memory; worker processes
+attach to it instead of receiving a copy, then each runs batches of
+combinations through the kernel and returns the summary figures the system
+scripts print. Rows are appended to the CSV as batches finish, so a long run
+can be watched (and survives a crash up to the last batch).
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python3 -m backtest.sweep --system 043 --set confirm_drop=0.9,0.915,0.935,0.955 \
+        --range exit.0.value=-9:-5:1 --set entry.buy.1.amount=10,20,30 --out sweep_043.csv
+    python3 -m backtest.sweep --system 042 --grid grid.yaml --workers 16 --cache
+"""
+import argparse
+import copy
+import csv
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest.cache import add_universe_arguments, universe_from_args
+from backtest.data import Universe
+from backtest.engine import run_backtest, summarize
+from backtest.strategy import SYSTEMS, Strategy
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Kolumny wyniku z summarize() zapisywane dla każdej kombinacji
+METRICS = ('realized', 'unrealized', 'total', 'percent_unrealized', 'percent_total_invested',
+           'percent_max_invested', 'percent_realized_max_invested', 'max_invested', 'max_invested_tr',
+           'closed', 'open', 'profitable', 'losing', 'avg_length', 'max_length', 'skipped_buys', 'max_market_value')
+
+
+def set_path(spec, path, value):
+    """Set a dotted path ('exit.0.value', 'entry.buy.1.amount', 'confirm_drop') in a nested spec."""
+    keys = path.split('.')
+    node = spec
+    for key in keys[:-1]:
+        node = node[int(key)] if isinstance(node, list) else node.setdefault(key, {})
+    if isinstance(node, list):
+        node[int(keys[-1])] = value
+    else:
+        node[keys[-1]] = value
+
+
+def combinations(grid):
+    """Dicts {path: value} of the cartesian product of grid {path: [values]}."""
+    paths = list(grid)
+    for values in itertools.product(*(grid[path] for path in paths)):
+        yield dict(zip(paths, values))
+
+
+def apply_params(base_spec, params):
+    spec = copy.deepcopy(base_spec)
+    for path, value in params.items():
+        set_path(spec, path, value)
+    return spec
+
+
+class SharedUniverse:
+    """A Universe's arrays copied once into named shared memory blocks; workers attach by name."""
+
+    _ARRAYS = ('ids', 'offsets', 'tr', 'matrix')
+
+    def __init__(self, universe):
+        self.symbols = universe.symbols
+        self._blocks = []
+        self.descriptor = {}
+        for name in self._ARRAYS:
+            array = universe.matrix if name == 'matrix' else getattr(universe, name)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self.descriptor[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    @staticmethod
+    def attach(descriptor, symbols):
+        """(Universe over the shared blocks, blocks to keep referenced) in a worker process."""
+        blocks, arrays = [], {}
+        for name, (block_name, shape, dtype) in descriptor.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        universe = Universe.from_matrix(arrays['ids'], symbols, arrays['offsets'], arrays['tr'], arrays['matrix'])
+        return universe, blocks
+
+
+# Stan procesu roboczego ustawiany w initializerze
+_worker = {}
+
+
+def _init_worker(descriptor, symbols, base_spec):
+    universe, blocks = SharedUniverse.attach(descriptor, symbols)
+    _worker.update(universe=universe, blocks=blocks, base_spec=base_spec)
+
+
+def evaluate(universe, base_spec, params):
+    """Summary row of one parameter combination."""
+    result = run_backtest(universe, Strategy(apply_params(base_spec, params)))
+    summary = summarize(result)
+    row = dict(params)
+    row.update({metric: summary.get(metric) for metric in METRICS})
+    return row
+
+
+def _evaluate_batch(batch):
+    rows = []
+    for combo, params in batch:
+        try:
+            row = evaluate(_worker['universe'], _worker['base_spec'], params)
+        except Exception as e:
+            row = dict(params, error=str(e))
+        row['combo'] = combo
+        rows.append(row)
+    return rows
+
+
+def _batches(grid, batch_size):
+    batch = []
+    for combo, params in enumerate(combinations(grid)):
+        batch.append((combo, params))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def sweep(universe, base_spec, grid, out_path, workers=None, batch_size=8):
+    """Evaluate every combination of grid over universe; rows go to out_path (CSV) as batches finish.
+
+    Returns the number of combinations written. At most 2 * workers batches
+    are in flight, so huge grids are never materialised at once.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = int(np.prod([len(values) for values in grid.values()])) if grid else 1
+    Strategy(apply_params(base_spec, next(combinations(grid))))  # błędna specyfikacja - błąd przed startem
+    fields = ['combo'] + list(grid) + list(METRICS) + ['error']
+    shared = SharedUniverse(universe)
+    written = 0
+    started = time.perf_counter()
+    try:
+        with open(out_path, 'w', newline='', encoding='utf-8') as f, ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=(shared.descriptor, universe.symbols, base_spec)) as pool:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            pending = set()
+            batches = _batches(grid, batch_size)
+            for batch in itertools.islice(batches, 2 * workers):
+                pending.add(pool.submit(_evaluate_batch, batch))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rows = future.result()
+                    writer.writerows(rows)
+                    written += len(rows)
+                    batch = next(batches, None)
+                    if batch is not None:
+                        pending.add(pool.submit(_evaluate_batch, batch))
+                f.flush()
+                elapsed = time.perf_counter() - started
+                logger.info(f"{written}/{total} kombinacji ({written / elapsed:.1f}/s)")
+    finally:
+        shared.close()
+    return written
+
+
+def parse_values(text):
+    """'0.9,0.915' -> [0.9, 0.915]; 'start:stop:step' ranges include stop."""
+    if ':' in text:
+        start, stop, step = (float(x) for x in text.split(':'))
+        return [round(float(v), 10) for v in np.arange(start, stop + step / 2, step)]
+    values = []
+    for item in text.split(','):
+        try:
+            number = float(item)
+            values.append(int(number) if number.is_integer() and '.' not in item else number)
+        except ValueError:
+            values.append(item)
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--system', default='043', choices=sorted(SYSTEMS), help='base spec')
+    parser.add_argument('--spec', help='.yaml/.json file with the base spec instead of --system')
+    parser.add_argument('--grid', help='.yaml/.json file {path: [values]}')
+    parser.add_argument('--set', action='append', default=[], metavar='PATH=V1,V2',
+                        help="values of one spec path, e.g. confirm_drop=0.9,0.915")
+    parser.add_argument('--range', action='append', default=[], metavar='PATH=START:STOP:STEP')
+    parser.add_argument('--out', default='sweep.csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=8)
+    add_universe_arguments(parser)
+    args = parser.parse_args()
+
+    base_spec = next(iter(Strategy.from_file(args.spec).values())).spec if args.spec else SYSTEMS[args.system].spec
+    grid = {}
+    if args.grid:
+        if args.grid.endswith('.json'):
+            import json
+            with open(args.grid, encoding='utf-8') as f:
+                grid.update(json.load(f))
+        else:
+            import yaml  # PyYAML potrzebny tylko dla plików .yaml
+            with open(args.grid, encoding='utf-8') as f:
+                grid.update(yaml.safe_load(f))
+    for option in args.set + args.range:
+        path, _, values = option.partition('=')
+        grid[path] = parse_values(values)
+    if not grid:
+        parser.error('no parameters to sweep: give --grid, --set or --range')
+
+    universe = universe_from_args(args)
+    written = sweep(universe, base_spec, grid, args.out, args.workers, args.batch_size)
+    logger.info(f"Zapisano {written} kombinacji do {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""Backtest engine vs the per-row loops of stock/systems/001 and 031-044: identical positions, bars/s.
+
+Pętle referencyjne to przepisane 1:1 pętle `for _, row in df_data.iterrows()`
+skryptów (bez zapytań do bazy i printów), uruchamiane na tych samych
+syntetycznych danych co kernel. Na końcu wszystkie specyfikacje z SYSTEMS
+liczone są na jednym wczytanym zestawie danych, a jeden system także jako
+portfel ze wspólnym budżetem (bez limitu = te same pozycje co osobno).
+
+Uruchomienie:
+    python3 bench/bench_backtest.py                         # 200 symboli x 3000 barów, systemy 001, 031, 032 i 042
+    python3 bench/bench_backtest.py --symbols 2000 --reference-symbols 50
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest.data import Universe
+from backtest.engine import run_backtest, run_backtests, summarize
+from backtest.strategy import SYSTEMS
+
+
+def synthetic_frame(bars, seed):
+    rng = np.random.default_rng(seed)
+    ind_5 = np.clip(np.cumsum(rng.normal(0, 2.5, bars)), -15, 15)
+    ind_5[rng.random(bars) < 0.01] = np.nan
+    return pd.DataFrame({
+        'TickerRelative': np.arange(-bars + 1, 1),
+        'ind_5': ind_5,
+        'ind_7': rng.choice([0.0, 1.0, -1.0], bars, p=[0.9, 0.05, 0.05]),
+        'ind_22': rng.choice([0.0, 3.0, 4.0, 6.0, 9.0], bars, p=[0.9, 0.03, 0.02, 0.03, 0.02]),
+        'ind_24': rng.uniform(0, 120, bars),
+        'avg_price': 50 * np.exp(np.cumsum(rng.normal(0, 0.02, bars))),
+    })
+
+
+def reference_signal_exit(df_data, symbol, amount_22_9, confirm_drop=None, sum_amounts=False):
+    """The loop of 031-035 (confirm_drop None) and 037-044; sum_amounts - 032, which adds the amounts up."""
+    positions = []
+    invested_data = []
+    position_open = False
+    total_shares = total_invested_symbol = max_value = 0
+    num_purchases = 0
+    open_tr = None
+    ind_5_below_minus_5_count = 0
+    ind_5_last_values = deque(maxlen=10)
+    sell_condition_triggered = False
+    max_value_after_trigger = 0.0
+
+    for _, row in df_data.iterrows():
+        tr, ind_22, ind_5, ind_7 = row['TickerRelative'], row['ind_22'], row['ind_5'], row['ind_7']
+        current_price = row['avg_price']
+        ind_5_last_values.append(ind_5 if pd.notna(ind_5) else None)
+
+        if position_open:
+            current_value = total_shares * current_price
+            zysk_strata = current_value - total_invested_symbol
+            if confirm_drop is not None:
+                max_value = max(max_value, current_value)
+            should_sell = False
+            sell_reason = ""
+            valid_vals = [v for v in ind_5_last_values if v is not None]
+            if len(valid_vals) >= 10:
+                below_zero_count = sum(1 for v in valid_vals if v < 0)
+                if below_zero_count >= 6 and zysk_strata >= 0:
+                    should_sell, sell_reason = True, "ind_5 < 0 in at least 6 of last 10 TR"
+            if pd.notna(ind_5):
+                ind_5_below_minus_5_count = ind_5_below_minus_5_count + 1 if ind_5 < -5 else 0
+            else:
+                ind_5_below_minus_5_count = 0
+            if pd.notna(ind_5):
+                if zysk_strata >= 0:
+                    if ind_5 < -7:
+                        should_sell, sell_reason = True, "ind_5 < -7"
+                    elif ind_5_below_minus_5_count >= 3:
+                        should_sell, sell_reason = True, "ind_5 < -5 for three consecutive rows"
+                elif ind_5 < -10:
+                    should_sell, sell_reason = True, "ind_5 < -10 (at a loss)"
+
+            close = should_sell
+            if confirm_drop is not None:
+                if should_sell and not sell_condition_triggered:
+                    sell_condition_triggered = True
+                    max_value_after_trigger = current_value
+                    continue
+                close = False
+                if sell_condition_triggered:
+                    max_value_after_trigger = max(max_value_after_trigger, current_value)
+                    close = current_value <= max_value_after_trigger * confirm_drop
+            if close:
+                zysk = current_value - total_invested_symbol
+                positions.append({
+                    'open_tr': open_tr, 'close_tr': tr, 'length': tr - open_tr, 'zysk': zysk,
+                    'percent_zysk': (zysk / total_invested_symbol) * 100 if total_invested_symbol > 0 else 0,
+                    'num_purchases': num_purchases, 'max_value': max_value,
+                    'final_invested': total_invested_symbol, 'symbol': symbol, 'sell_reason': sell_reason,
+                })
+                position_open = False
+                total_shares = total_invested_symbol = max_value = 0
+                num_purchases = 0
+                open_tr = None
+                ind_5_below_minus_5_count = 0
+                ind_5_last_values.clear()
+                sell_condition_triggered = False
+                max_value_after_trigger = 0.0
+                continue
+
+        if ind_22 > 3 or ind_7 > 0:
+            if sum_amounts:
+                amount = 0.0
+                if ind_22 == 6:
+                    amount += 10.0
+                if ind_22 == 9:
+                    amount += amount_22_9
+                if ind_7 == 1:
+                    amount += 10.0
+                if amount == 0:
+                    continue
+            elif ind_22 == 6:
+                amount = 10.0
+            elif ind_22 == 9:
+                amount = amount_22_9
+            elif ind_7 == 1:
+                amount = 10.0
+            else:
+                continue
+            total_shares += amount / current_price
+            total_invested_symbol += amount
+            if not position_open:
+                position_open = True
+                num_purchases = 1
+                open_tr = tr
+                ind_5_below_minus_5_count = 0
+                sell_condition_triggered = False
+                max_value_after_trigger = 0.0
+            else:
+                num_purchases += 1
+            max_value = max(max_value, total_shares * current_price)
+
+        if position_open:
+            invested_data.append({'tr': tr, 'invested': total_invested_symbol})
+
+    if position_open:
+        last_tr = df_data['TickerRelative'].max()
+        last_price = df_data[df_data['TickerRelative'] == last_tr]['avg_price'].iloc[0]
+        zysk_strata = total_shares * last_price - total_invested_symbol
+        positions.append({
+            'open_tr': open_tr, 'close_tr': last_tr, 'length': last_tr - open_tr, 'zysk': zysk_strata,
+            'percent_zysk': (zysk_strata / total_invested_symbol) * 100 if total_invested_symbol > 0 else 0,
+            'num_purchases': num_purchases, 'max_value': max_value,
+            'final_invested': total_invested_symbol, 'symbol': symbol, 'status': 'open',
+        })
+    return positions, invested_data
+
+
+def reference_trailing_stop(df_data, symbol):
+    """The loop of 001: $1 per ind_22 > 3, trailing stop also re-checked after a buy."""
+    df_data = df_data[df_data['TickerRelative'] > -250]
+    positions = []
+    invested_data = []
+    position_open = False
+    total_shares = total_invested_symbol = max_value = 0
+    num_purchases = 0
+    open_tr = None
+    trailing_stop = 0.0
+    trailing_active = False
+
+    def close(tr, current_value):
+        zysk = current_value - total_invested_symbol
+        positions.append({
+            'open_tr': open_tr, 'close_tr': tr, 'length': tr - open_tr, 'zysk': zysk,
+            'percent_zysk': (zysk / total_invested_symbol) * 100 if total_invested_symbol > 0 else 0,
+            'num_purchases': num_purchases, 'max_value': max_value,
+            'final_invested': total_invested_symbol, 'symbol': symbol, 'sell_reason': 'trailing stop',
+        })
+
+    for _, row in df_data.iterrows():
+        tr, ind_22, current_price = row['TickerRelative'], row['ind_22'], row['avg_price']
+        if position_open:
+            current_value = total_shares * current_price
+            avg_buy_price = total_invested_symbol / total_shares if total_shares > 0 else 0
+            current_profit = (current_value / total_invested_symbol) - 1 if total_invested_symbol > 0 else 0
+            if not trailing_active and current_profit >= 0.05:
+                trailing_active = True
+                trailing_stop = avg_buy_price
+            if trailing_active:
+                trailing_stop = max(trailing_stop, current_price * 0.95)
+            if trailing_active and current_price < trailing_stop:
+                close(tr, current_value)
+                position_open = False
+                total_shares = total_invested_symbol = max_value = 0
+                num_purchases = 0
+                open_tr = None
+                trailing_stop = 0.0
+                trailing_active = False
+                continue
+
+        if ind_22 > 3:
+            amount = 1.0
+            total_shares += amount / current_price
+            total_invested_symbol += amount
+            if not position_open:
+                position_open = True
+                num_purchases = 1
+                open_tr = tr
+                trailing_stop = 0.0
+                trailing_active = False
+            else:
+                num_purchases += 1
+            current_value = total_shares * current_price
+            max_value = max(max_value, current_value)
+            avg_buy_price = total_invested_symbol / total_shares if total_shares > 0 else 0
+            current_profit = (current_value / total_invested_symbol) - 1 if total_invested_symbol > 0 else 0
+            if not trailing_active and current_profit >= 0.05:
+                trailing_active = True
+                trailing_stop = avg_buy_price
+            if trailing_active:
+                trailing_stop = max(trailing_stop, current_price * 0.95)
+            if trailing_active and current_price < trailing_stop:
+                close(tr, current_value)
+                position_open = False
+                total_shares = total_invested_symbol = max_value = 0
+                num_purchases = 0
+                open_tr = None
+                trailing_stop = 0.0
+                trailing_active = False
+
+        if position_open:
+            invested_data.append({'tr': tr, 'invested': total_invested_symbol})
+
+    if position_open:
+        last_tr = df_data['TickerRelative'].max()
+        last_price = df_data[df_data['TickerRelative'] == last_tr]['avg_price'].iloc[0]
+        zysk_strata = total_shares * last_price - total_invested_symbol
+        positions.append({
+            'open_tr': open_tr, 'close_tr': last_tr, 'length': last_tr - open_tr, 'zysk': zysk_strata,
+            'percent_zysk': (zysk_strata / total_invested_symbol) * 100 if total_invested_symbol > 0 else 0,
+            'num_purchases': num_purchases, 'max_value': max_value,
+            'final_invested': total_invested_symbol, 'symbol': symbol, 'status': 'open',
+        })
+    return positions, invested_data
+
+
+# Systemy z przepisaną pętlą referencyjną
+REFERENCES = {
+    '001': reference_trailing_stop,
+    '031': lambda df, symbol: reference_signal_exit(df, symbol, 30.0),
+    '032': lambda df, symbol: reference_signal_exit(df, symbol, 30.0, sum_amounts=True),
+    '042': lambda df, symbol: reference_signal_exit(df, symbol, 10.0, 0.915),
+}
+
+
+def same_positions(expected, actual):
+    if len(expected) != len(actual):
+        return False
+    for e, a in zip(expected, actual):
+        if set(e) != set(a):
+            return False
+        for key, value in e.items():
+            if isinstance(value, float) and not math.isclose(value, a[key], rel_tol=1e-9, abs_tol=1e-9):
+                return False
+            if not isinstance(value, float) and value != a[key]:
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--bars', type=int, default=3000)
+    parser.add_argument('--reference-symbols', type=int, default=20, help='symbols checked against the row loop')
+    parser.add_argument('--systems', nargs='*', default=sorted(REFERENCES), choices=sorted(REFERENCES))
+    parser.add_argument('--portfolio-system', default='042', choices=sorted(SYSTEMS))
+    parser.add_argument('--budget', type=float, default=2000.0, help='capital shared by all symbols')
+    args = parser.parse_args()
+
+    frames = [(n, f'SYN:S{n}', synthetic_frame(args.bars, n)) for n in range(args.symbols)]
+    universe = Universe.from_frames(frames)
+    print(f"{len(universe)} symboli x {args.bars} barów = {universe.n_bars} barów")
+    ok = True
+    for system in args.systems:
+        strategy = SYSTEMS[system]
+        run_backtest(Universe.from_frames(frames[:1]), strategy)  # kompilacja numby poza pomiarem
+        started = time.perf_counter()
+        result = run_backtest(universe, strategy)
+        elapsed = time.perf_counter() - started
+
+        checked = frames[:args.reference_symbols]
+        started = time.perf_counter()
+        expected = [p for _, symbol, df in checked for p in REFERENCES[system](df, symbol)[0]]
+        reference_elapsed = time.perf_counter() - started
+        checked_symbols = {symbol for _, symbol, _ in checked}
+        actual = [p for p in result.positions if p['symbol'] in checked_symbols]
+        same = same_positions(expected, actual)
+        ok = ok and same
+        min_tr = strategy.min_ticker_relative
+        reference_bars = sum(len(df) if min_tr is None else int((df['TickerRelative'] > min_tr).sum())
+                             for _, _, df in checked)
+        reference_rate = reference_bars / reference_elapsed
+        s = summarize(result)
+        print(f"System {system}: {len(result.positions)} pozycji, zysk {s['total']:.2f} $, "
+              f"max zainwestowany {s['max_invested']:.2f} $")
+        print(f"  silnik:           {universe.n_bars / elapsed:14,.0f} barów/s ({elapsed:.3f}s)")
+        print(f"  pętla iterrows:   {reference_rate:14,.0f} barów/s (szacunkowo {universe.n_bars / reference_rate:.1f}s)")
+        print(f"  pozycje zgodne z pętlą ({len(checked)} symboli): {'TAK' if same else 'NIE'}")
+
+    started = time.perf_counter()
+    results = run_backtests(universe, SYSTEMS)
+    elapsed = time.perf_counter() - started
+    print(f"Wszystkie {len(results)} specyfikacje na jednym zestawie danych: {elapsed:.2f}s "
+          f"({elapsed / len(results) * 1000:.0f} ms na wariant)")
+
+    # Portfel na wspólnym zegarze TR: bez limitu musi dać te same pozycje co symbole liczone osobno
+    strategy = SYSTEMS[args.portfolio_system]
+    key = lambda p: (p['symbol'], p['open_tr'])
+    independent = sorted(results[args.portfolio_system].positions, key=key)
+    unlimited = sorted(run_backtest(universe, strategy, budget=0).positions, key=key)
+    same = same_positions(independent, unlimited)
+    ok = ok and same
+    print(f"Portfel {args.portfolio_system} bez limitu = symbole osobno: {'TAK' if same else 'NIE'}")
+    for compound in (False, True):
+        started = time.perf_counter()
+        result = run_backtest(universe, strategy, budget=args.budget, compound=compound)
+        elapsed = time.perf_counter() - started
+        s = summarize(result)
+        print(f"  budżet {args.budget:.0f} $ {'z reinwestycją' if compound else 'stały'}: "
+              f"max zainwestowany {s['max_invested']:.2f} $, pominięte zakupy {s['skipped_buys']}, "
+              f"zysk {s['total']:.2f} $, {universe.n_bars / elapsed:,.0f} barów/s ({elapsed:.3f}s)")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
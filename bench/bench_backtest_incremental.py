@@ -0,0 +1,75 @@
+"""Incremental backtest (backtest.checkpoint) vs a full replay after new bars arrive: identical positions, time.
+
+"Wczoraj" to syntetyczne dane bez ostatnich --new-bars barów (TickerRelative
+przenumerowany tak, by najnowszy bar miał 0, jak po scrapowaniu), "dziś" to
+pełne dane; w --rewritten symbolach zmieniony jest jeden stary bar, więc muszą
+zostać policzone od początku. Checkpointy trafiają do katalogu tymczasowego.
+
+Uruchomienie:
+    python3 bench/bench_backtest_incremental.py                       # 200 symboli x 3000 barów, 1 nowy bar
+    python3 bench/bench_backtest_incremental.py --symbols 2000 --new-bars 5 --system 031
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest.checkpoint import run_incremental
+from backtest.data import Universe
+from backtest.engine import run_backtest
+from backtest.strategy import SYSTEMS
+from bench_backtest import same_positions, synthetic_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--bars', type=int, default=3000)
+    parser.add_argument('--new-bars', type=int, default=1)
+    parser.add_argument('--rewritten', type=int, default=5, help='symbols with a changed old bar')
+    # Bez min_ticker_relative - przy wznowieniu okno nie przesuwa się, pełne przeliczenie tak
+    parser.add_argument('--system', default='042',
+                        choices=sorted(name for name, s in SYSTEMS.items() if s.min_ticker_relative is None))
+    args = parser.parse_args()
+
+    strategy = SYSTEMS[args.system]
+    today = [(n, f'SYN:S{n}', synthetic_frame(args.bars, n)) for n in range(args.symbols)]
+    yesterday = []
+    for n, symbol, df in today:
+        df = df.iloc[:-args.new_bars].copy()
+        df['TickerRelative'] += args.new_bars
+        yesterday.append((n, symbol, df))
+    for n, _, df in today[:args.rewritten]:
+        df.loc[df.index[-50], 'ind_5'] += 1.0
+    yesterday_universe = Universe.from_frames(yesterday)
+    today_universe = Universe.from_frames(today)
+    rewritten = {symbol for _, symbol, _ in today[:args.rewritten]}
+
+    run_backtest(Universe.from_frames(today[:1]), strategy)  # kompilacja numby poza pomiarem
+    with tempfile.TemporaryDirectory() as tmp:
+        run_incremental(yesterday_universe, strategy, cache_dir=tmp)
+        started = time.perf_counter()
+        result, stats = run_incremental(today_universe, strategy, cache_dir=tmp)
+        incremental_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    full = run_backtest(today_universe, strategy)
+    full_elapsed = time.perf_counter() - started
+
+    # Symbole wznowione raportują pozycje zamknięte na nowych barach i otwarte
+    key = lambda p: (p['symbol'], p['open_tr'], p['close_tr'])
+    expected = sorted((p for p in full.positions if p['symbol'] in rewritten or p.get('status') == 'open'
+                       or p['close_tr'] > -args.new_bars), key=key)
+    same = same_positions(expected, sorted(result.positions, key=key))
+    print(f"{len(today_universe)} symboli x {args.bars} barów, {args.new_bars} nowych barów, system {args.system}")
+    print(f"pełne przeliczenie:  {full_elapsed:.3f}s ({today_universe.n_bars} barów)")
+    print(f"przyrostowo:         {incremental_elapsed:.3f}s ({stats['bars']} barów, {stats['resumed']} symboli "
+          f"wznowionych, {stats['replayed']} od początku)")
+    print(f"pozycje zgodne z pełnym przeliczeniem: {'TAK' if same else 'NIE'}")
+    if not same or stats['replayed'] != args.rewritten:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Backtest input load time against a real PostgreSQL: two queries per symbol vs one streamed bulk query.
+
+Tylko odczyt tabel produkcyjnych (tStockSymbols, tabela wskaźników, tStock_Prices).
+Sprawdza też, że oba sposoby dają identyczny Universe.
+
+Uruchomienie:
+    python3 bench/bench_backtest_loader.py --limit 200
+    python3 bench/bench_backtest_loader.py --layout wide
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import psycopg2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest.data import fetch_backtest_symbols, load_universe, load_universe_per_symbol
+
+db_params = {
+    'dbname': os.environ.get('PGDATABASE', 'TradingView'),
+    'user': os.environ.get('PGUSER', 'postgres'),
+    'password': os.environ.get('PGPASSWORD', 'postgres'),
+    'host': os.environ.get('PGHOST', 'localhost'),
+    'port': os.environ.get('PGPORT', '5432'),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updated', default='2025-10-01')
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--layout', default='long')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**db_params)
+    try:
+        symbols = sorted(fetch_backtest_symbols(conn, args.updated, args.limit))
+        started = time.perf_counter()
+        per_symbol = load_universe_per_symbol(conn, symbols, layout=args.layout)
+        per_symbol_time = time.perf_counter() - started
+        started = time.perf_counter()
+        bulk = load_universe(conn, symbols, layout=args.layout)
+        bulk_time = time.perf_counter() - started
+    finally:
+        conn.close()
+    same = (per_symbol.symbols == bulk.symbols and np.array_equal(per_symbol.offsets, bulk.offsets)
+            and np.array_equal(per_symbol.tr, bulk.tr)
+            and np.allclose(per_symbol.matrix, bulk.matrix, equal_nan=True))
+    print(f"{len(bulk)} symboli, {bulk.n_bars} barów")
+    print(f"2 zapytania na symbol + merge: {per_symbol_time:8.2f}s ({per_symbol.n_bars / per_symbol_time:12,.0f} barów/s)")
+    print(f"1 zapytanie, kursor serwerowy: {bulk_time:8.2f}s ({bulk.n_bars / bulk_time:12,.0f} barów/s)")
+    print(f"identyczne dane: {'TAK' if same else 'NIE'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Rows/s of the indicator write paths against a real PostgreSQL, on scratch tables.
+
+Porównuje: stary zapis (DELETE + commit, execute_values + commit na każdy bar),
+BatchedIndicatorWriter (execute_values, jedna transakcja) i CopyIndicatorWriter
+(COPY do tabeli tymczasowej + podmiana, jedna transakcja). Tabele bench_* są
+tworzone i usuwane przez skrypt, dane produkcyjne nie są dotykane.
+
+Uruchomienie:
+    python3 bench/bench_indicator_writer.py --symbols 5 --bars 3000 --indices 23
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.indicator_writer import BatchedIndicatorWriter, CopyIndicatorWriter
+
+db_params = {
+    'dbname': os.environ.get('PGDATABASE', 'TradingView'),
+    'user': os.environ.get('PGUSER', 'postgres'),
+    'password': os.environ.get('PGPASSWORD', 'postgres'),
+    'host': os.environ.get('PGHOST', 'localhost'),
+    'port': os.environ.get('PGPORT', '5432'),
+}
+VALUES_TABLE = 'bench_IndicatorValues'
+SYMBOLS_TABLE = 'bench_Symbols'
+
+
+def synthetic_rows(id_symbol, bars, indices, seed):
+    rng = random.Random(seed)
+    return [(id_symbol, tr, idx, round(rng.uniform(-50, 50), 2)) for tr in range(0, -bars, -1) for idx in indices]
+
+
+def create_tables(conn, symbols):
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS public."{VALUES_TABLE}", public."{SYMBOLS_TABLE}"')
+        cursor.execute(f'CREATE TABLE public."{SYMBOLS_TABLE}" (id integer PRIMARY KEY, "Updated" date)')
+        cursor.execute(f"""
+            CREATE TABLE public."{VALUES_TABLE}" (
+                "idSymbol" integer, "TickerRelative" integer, "IndicatorIndex" integer, "IndicatorValue" double precision
+            )""")
+        cursor.execute(f'CREATE INDEX ON public."{VALUES_TABLE}" ("idSymbol")')
+        execute_values(cursor, f'INSERT INTO public."{SYMBOLS_TABLE}" (id) VALUES %s', [(n,) for n in symbols])
+    conn.commit()
+
+
+def drop_tables(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS public."{VALUES_TABLE}", public."{SYMBOLS_TABLE}"')
+    conn.commit()
+
+
+def legacy_write(conn, id_symbol, rows, per_bar):
+    """The scrapers' loop before CopyIndicatorWriter: delete + commit, then one commit per bar."""
+    with conn.cursor() as cursor:
+        cursor.execute(f'DELETE FROM public."{VALUES_TABLE}" WHERE "idSymbol" = %s', (id_symbol,))
+        conn.commit()
+        for start in range(0, len(rows), per_bar):
+            execute_values(cursor, f"""
+                INSERT INTO public."{VALUES_TABLE}"
+                ("idSymbol", "TickerRelative", "IndicatorIndex", "IndicatorValue")
+                VALUES %s""", rows[start:start + per_bar])
+            conn.commit()
+        cursor.execute(f'UPDATE public."{SYMBOLS_TABLE}" SET "Updated" = CURRENT_DATE WHERE id = %s', (id_symbol,))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=5)
+    parser.add_argument('--bars', type=int, default=3000)
+    parser.add_argument('--indices', type=int, default=4)
+    args = parser.parse_args()
+
+    indices = list(range(args.indices))
+    data = {n: synthetic_rows(n, args.bars, indices, n) for n in range(1, args.symbols + 1)}
+    total_rows = sum(len(rows) for rows in data.values())
+    conn = psycopg2.connect(**db_params)
+    try:
+        create_tables(conn, data)
+        started = time.perf_counter()
+        for id_symbol, rows in data.items():
+            legacy_write(conn, id_symbol, rows, per_bar=len(indices))
+        elapsed = time.perf_counter() - started
+        print(f"per-bar commit:          {total_rows / elapsed:12,.0f} wierszy/s  ({elapsed:.2f}s)")
+
+        for name, writer_class in (('execute_values, 1 tx:', BatchedIndicatorWriter),
+                                   ('COPY + podmiana, 1 tx:', CopyIndicatorWriter)):
+            writer = writer_class(conn, VALUES_TABLE, SYMBOLS_TABLE, 'Updated', batch_size=1)
+            for id_symbol, rows in data.items():
+                writer.replace_symbol(id_symbol, rows)
+            print(f"{name:<24} {writer.rows_per_second():12,.0f} wierszy/s  ({writer.write_time:.2f}s)")
+    finally:
+        drop_tables(conn)
+        conn.close()
+    print(f"{args.symbols} symboli x {args.bars} barów x {args.indices} indeksów = {total_rows} wierszy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Live decision (common.live_decision) vs the per-symbol pandas code of stock/stock_main.py: same states, symbols/s.
+
+Pętla referencyjna to przepisana 1:1 część decyzyjna stock_main.py (pivot
+wskaźników, ostatnie 10/3 ind_5, zysk_strata, spadek 0.915) uruchamiana na
+tych samych losowych wskaźnikach i stanach co wersja tablicowa.
+
+Uruchomienie:
+    python3 bench/bench_live_decision.py                  # 5000 symboli
+    python3 bench/bench_live_decision.py --symbols 20000
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.live_decision import decide, indicator_arrays
+
+
+def synthetic(n_symbols, seed=0):
+    """Long indicator rows (idSymbol, TickerRelative, IndicatorIndex, IndicatorValue), states and prices."""
+    rng = np.random.default_rng(seed)
+    rows, states, prices = [], {}, {}
+    for id_symbol in range(1, n_symbols + 1):
+        n_bars = int(rng.choice([2, 5, 12, 19]))
+        ind_5 = np.cumsum(rng.normal(-0.5, 4, n_bars))
+        for n, tr in enumerate(range(-n_bars + 1, 1)):
+            values = {5: None if rng.random() < 0.03 else round(float(ind_5[n]), 2),
+                      7: float(rng.choice([0, 1, -1], p=[0.9, 0.05, 0.05])),
+                      22: float(rng.choice([0, 3, 4, 6, 9], p=[0.9, 0.03, 0.02, 0.03, 0.02])),
+                      24: round(float(rng.uniform(0, 120)), 2)}
+            rows.extend((id_symbol, tr, idx, value) for idx, value in values.items())
+        is_open = rng.random() < 0.6
+        shares = float(rng.uniform(0.5, 5)) if is_open else 0.0
+        invested = float(rng.uniform(20, 80)) if is_open else 0.0
+        states[id_symbol] = {'status': 'open' if is_open else 'close', 'shouldSell': bool(rng.random() < 0.2),
+                             'maxValue': float(rng.uniform(0, 200)) if is_open else 0.0,
+                             'invested': invested, 'shares': shares, 'amountBuySell': 0.0}
+        prices[id_symbol] = float(rng.uniform(5, 40))
+    return rows, states, prices
+
+
+def reference(df_ind_pivot, state, current_price):
+    """The decision part of the stock_main.py loop for one symbol."""
+    position = state['status']
+    buy = False
+    should_sell = state['shouldSell']
+    sell = False
+    total_invested_symbol = state['invested']
+    total_shares = state['shares']
+    recorded_max_value = state['maxValue']
+    amount_buysell = state['amountBuySell']
+
+    df_ind_sorted = df_ind_pivot.sort_values(by='TickerRelative', ascending=False)
+    latest_ind = df_ind_sorted.iloc[0]
+    ind_5 = float(latest_ind['ind_5']) if pd.notna(latest_ind['ind_5']) else 0
+    ind_7 = float(latest_ind['ind_7']) if pd.notna(latest_ind['ind_7']) else 0
+    ind_22 = float(latest_ind['ind_22']) if pd.notna(latest_ind['ind_22']) else 0
+    last_10_ind_5 = df_ind_sorted.head(10)['ind_5'].tolist()
+    last_3_ind_5 = df_ind_sorted.head(3)['ind_5'].tolist()
+    if position == 'open':
+        current_value = total_shares * current_price
+        zysk_strata = current_value - total_invested_symbol
+        if not should_sell:
+            should_sell_trigger = False
+            if zysk_strata >= 0:
+                valid_vals_for_minus3 = [v for v in last_10_ind_5 if v is not None]
+                if len(valid_vals_for_minus3) == 10:
+                    below_zero_count = sum(1 for v in valid_vals_for_minus3 if v < 0)
+                    if below_zero_count >= 6:
+                        should_sell_trigger = True
+                valid_vals_for_minus5 = [v for v in last_3_ind_5 if v is not None]
+                if len(valid_vals_for_minus5) == 3:
+                    below_minus5_count = sum(1 for v in valid_vals_for_minus5 if v < -5)
+                    if below_minus5_count == 3:
+                        should_sell_trigger = True
+                if ind_5 < -7:
+                    should_sell_trigger = True
+            if ind_5 < -10:
+                should_sell_trigger = True
+            if should_sell_trigger:
+                recorded_max_value = max(recorded_max_value, current_value)
+                should_sell = True
+        if should_sell:
+            recorded_max_value = max(recorded_max_value, current_value)
+            if current_value <= recorded_max_value * 0.915:
+                sell = True
+                buy = False
+                amount_buysell = -current_value
+    if ind_22 > 3 or ind_7 > 0:
+        buy = True
+        amount_buysell = 10.0
+    return bool(buy), bool(should_sell), bool(sell), recorded_max_value, amount_buysell
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--reference-symbols', type=int, default=1000, help='symbols checked against pandas code')
+    args = parser.parse_args()
+
+    long_rows, states, prices = synthetic(args.symbols)
+    ids = sorted(states)
+    started = time.perf_counter()
+    wide = {}
+    for id_symbol, tr, idx, value in long_rows:
+        wide.setdefault((id_symbol, tr), {})[idx] = value
+    rows = [(id_symbol, tr, v.get(5), v.get(7), v.get(22), v.get(24)) for (id_symbol, tr), v in wide.items()]
+    latest, window, bars = indicator_arrays(ids, rows)
+    column = lambda name: np.array([float(states[i][name]) for i in ids])
+    decided = decide(latest, window, bars, np.array([prices[i] for i in ids]),
+                     np.array([states[i]['status'] == 'open' for i in ids]),
+                     np.array([states[i]['shouldSell'] for i in ids]), column('maxValue'), column('invested'),
+                     column('shares'), column('amountBuySell'))
+    elapsed = time.perf_counter() - started
+
+    checked = ids[:args.reference_symbols]
+    df_all = pd.DataFrame(long_rows, columns=['idSymbol', 'TickerRelative', 'indicatorIndex', 'indicatorValue'])
+    started = time.perf_counter()
+    expected = []
+    for id_symbol, df_ind in df_all[df_all['idSymbol'].isin(checked)].groupby('idSymbol'):
+        df_ind_pivot = df_ind.pivot(index='TickerRelative', columns='indicatorIndex',
+                                    values='indicatorValue').reset_index()
+        df_ind_pivot.columns = ['TickerRelative', 'ind_5', 'ind_7', 'ind_22', 'ind_24']
+        expected.append(reference(df_ind_pivot, states[id_symbol], prices[id_symbol]))
+    reference_elapsed = time.perf_counter() - started
+
+    same = True
+    for k, exp in enumerate(expected):
+        actual = tuple(array[k] for array in decided)
+        same = same and exp[:3] == tuple(bool(x) for x in actual[:3]) and all(
+            math.isclose(e, float(a), rel_tol=1e-12, abs_tol=1e-12) for e, a in zip(exp[3:], actual[3:]))
+    buy, should_sell, sell = decided[:3]
+    print(f"{len(ids)} symboli: {int(buy.sum())} zakupów, {int(sell.sum())} sprzedaży, "
+          f"{int(should_sell.sum())} z uzbrojoną sprzedażą")
+    print(f"  tablice (indicator_arrays + decide): {len(ids) / elapsed:12,.0f} symboli/s ({elapsed:.3f}s)")
+    print(f"  pandas per symbol:                   {len(checked) / reference_elapsed:12,.0f} symboli/s")
+    print(f"  decyzje zgodne ({len(checked)} symboli): {'TAK' if same else 'NIE'}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark suite of the scraper hot path (capture -> decode -> filter -> insert tuples), offline.
+
+Każdy przypadek działa w osobnym procesie (spawn), więc peak RSS dotyczy tylko jego.
+Raportuje frames/s, rows/s i peak RSS; --save zapisuje wynik jako baseline,
+--compare porównuje z baseline i kończy się kodem 1 przy regresji.
+
+Uruchomienie:
+    python3 bench/bench_pipeline.py                                  # przypadki syntetyczne long/short
+    python3 bench/bench_pipeline.py --capture capture.jsonl.gz       # nagranie ze scrapera (TV_CAPTURE_PATH)
+    python3 bench/bench_pipeline.py --save bench/baseline.json
+    python3 bench/bench_pipeline.py --compare bench/baseline.json --tolerance 0.15
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_tv_frames import frame, synthetic_payload
+from common.capture import CaptureWriter, load_capture
+from common.dedup import MessageDedup
+from common.replay import replay
+
+# name: (bars, symbols, term, valid_indices)
+CASES = {
+    'long': (3000, 20, 'long', list(range(23))),
+    'short': (300, 200, 'short', [5, 7, 22, 24]),
+}
+
+
+def write_synthetic_capture(path, bars, symbols):
+    with CaptureWriter(path) as writer:
+        for n in range(symbols):
+            symbol = f'NYSE:S{n}'
+            resolved = frame(json.dumps({'m': 'symbol_resolved', 'p': ['cs_bench', 'sds_sym_1', {'pro_name': symbol}]},
+                                        separators=(',', ':')))
+            writer.write(symbol, [resolved, synthetic_payload(bars, seed=n), frame('~h~1')])
+
+
+def run_case(capture_path, term, valid_indices, repeat):
+    """Executed in a child process; returns the best of `repeat` runs plus the process peak RSS."""
+    load_started = time.perf_counter()
+    recordings = load_capture(capture_path)
+    load_time = time.perf_counter() - load_started
+    best = None
+    for _ in range(repeat):
+        stats = replay(recordings, MessageDedup(max_entries=256), valid_indices, term=term)
+        if best is None or stats['elapsed'] < best['elapsed']:
+            best = stats
+    best['load_time'] = load_time
+    # ru_maxrss w KB na Linuksie
+    best['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return best
+
+
+def measure(name, capture_path, term, valid_indices, repeat):
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        stats = pool.apply(run_case, (capture_path, term, valid_indices, repeat))
+    stats['frames_per_s'] = stats['frames'] / stats['elapsed']
+    stats['rows_per_s'] = stats['rows'] / stats['elapsed']
+    print(f"{name}: {stats['symbols']} symboli, {stats['frames']} ramek, {stats['rows']} wierszy")
+    print(f"  {stats['elapsed'] * 1000:.1f} ms   {stats['frames_per_s']:,.0f} frames/s   "
+          f"{stats['rows_per_s']:,.0f} rows/s   peak RSS {stats['peak_rss_mb']:.0f} MB   "
+          f"(odczyt gzip {stats['load_time'] * 1000:.0f} ms)")
+    return stats
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path, 'r') as file:
+        baseline = json.load(file)
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        for metric, higher_is_better in (('rows_per_s', True), ('frames_per_s', True), ('peak_rss_mb', False)):
+            old, new = baseline[name][metric], stats[metric]
+            change = (new - old) / old if old else 0.0
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            print(f"  {name:>6} {metric:<13} {old:14,.1f} -> {new:14,.1f}  {change:+.1%}{'  REGRESJA' if worse else ''}")
+            if worse:
+                regressions.append((name, metric))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--capture', help='replay a real capture instead of the synthetic cases')
+    parser.add_argument('--term', choices=['long', 'short'], default='long', help='term of --capture')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='write results as a JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = {}
+    if args.capture:
+        results[args.term] = measure(os.path.basename(args.capture), args.capture, args.term,
+                                     CASES[args.term][3], args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, (bars, symbols, term, valid_indices) in CASES.items():
+                path = os.path.join(tmp, f'{name}.jsonl.gz')
+                write_synthetic_capture(path, bars, symbols)
+                results[name] = measure(f'{name} ({bars} barów x {len(valid_indices)} indeksów)', path, term,
+                                        valid_indices, args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Parameter sweep over a synthetic universe in shared memory: combinations/s for 1..N worker processes.
+
+Uruchomienie:
+    python3 bench/bench_sweep.py                          # 200 symboli x 3000 barów, 48 kombinacji 043
+    python3 bench/bench_sweep.py --symbols 1000 --workers 1 4 8
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest.data import Universe
+from backtest.strategy import SYSTEMS
+from backtest.sweep import sweep
+from bench_backtest import synthetic_frame
+
+GRID = {
+    'confirm_drop': [0.9, 0.915, 0.935, 0.955],
+    'exit.0.value': [-9, -8, -7, -6],
+    'entry.buy.1.amount': [10, 20, 30],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--bars', type=int, default=3000)
+    parser.add_argument('--workers', type=int, nargs='*', default=sorted({1, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    universe = Universe.from_frames((n, f'SYN:S{n}', synthetic_frame(args.bars, n)) for n in range(args.symbols))
+    combos = 1
+    for values in GRID.values():
+        combos *= len(values)
+    print(f"{len(universe)} symboli, {universe.n_bars} barów, {combos} kombinacji")
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in args.workers:
+            out = os.path.join(tmp, f'sweep_{workers}.csv')
+            started = time.perf_counter()
+            written = sweep(universe, SYSTEMS['043'].spec, GRID, out, workers=workers, batch_size=4)
+            elapsed = time.perf_counter() - started
+            with open(out, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            errors = sum(1 for row in rows if row['error'])
+            best = max(rows, key=lambda row: float(row['percent_max_invested'] or 0))
+            print(f"{workers:3d} procesów: {written / elapsed:8.1f} kombinacji/s ({elapsed:.1f}s), błędów {errors}, "
+                  f"najlepsza: confirm_drop={best['confirm_drop']} exit.0.value={best['exit.0.value']} "
+                  f"amount={best['entry.buy.1.amount']} -> {float(best['percent_max_invested']):.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Offline run of common.tv_client against common.tv_stub_server: correctness, sessions/s and memory.
+
+Uruchomienie:
+    python3 bench/bench_tv_client.py                       # 200 syntetycznych symboli
+    python3 bench/bench_tv_client.py capture.jsonl.gz      # nagranie scrapera (TV_CAPTURE_PATH)
+    python3 bench/bench_tv_client.py --connections 8 --sessions 16 --delay 0.2
+"""
+import argparse
+import asyncio
+import functools
+import os
+import resource
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.indicators import I_RANGE, indicator_rows, series_study_rows
+from common.tv_client import TradingViewClient, fetch_symbols_concurrently
+from common.tv_frames import find_study_rows
+from common.tv_stub_server import StubTradingViewServer, load_recordings, synthetic_payloads
+
+
+def expected_rows(payloads, width):
+    """What the selenium-wire scrapers would have extracted from the same payloads."""
+    for payload in payloads:
+        st_data = find_study_rows(payload, width)
+        if st_data:
+            return st_data
+    return None
+
+
+def ticker_relatives_ok(st_data, width):
+    """Long-term rows of a series: newest bar TickerRelative 0, at most the I_RANGE window, one row per bar."""
+    rows = indicator_rows(0, series_study_rows(st_data, width), [5], width, 'long')
+    i_min, i_max = I_RANGE['long']
+    bars = min(sum(1 for item in st_data if len(item.get('v', [])) == width), i_max - i_min + 1)
+    return bool(rows) and rows[0][1] == 0 and [row[1] for row in rows] == list(range(0, -bars, -1))
+
+
+async def run(recordings, args):
+    expected = {symbol: expected_rows(payloads, args.width) for symbol, payloads in recordings.items()}
+    symbols = list(enumerate(recordings))
+    async with StubTradingViewServer(recordings, port=0, delay=args.delay) as server:
+        client_factory = functools.partial(TradingViewClient, url=server.url)
+        started = time.perf_counter()
+        ok = mismatched = missing = bad_relative = 0
+        async for _, symbol, st_data, error in fetch_symbols_concurrently(
+                symbols, {}, connections=args.connections, sessions_per_connection=args.sessions,
+                client_factory=client_factory, width=args.width, timeout=10):
+            if error or st_data is None:
+                missing += 1
+            elif st_data != expected[symbol]:
+                mismatched += 1
+            elif not ticker_relatives_ok(st_data, args.width):
+                bad_relative += 1
+            else:
+                ok += 1
+        elapsed = time.perf_counter() - started
+    print(f"{len(symbols)} symboli, {args.connections} połączeń x {args.sessions} sesji, opóźnienie {args.delay}s")
+    print(f"  OK {ok}, różne od find_study_rows {mismatched}, zły TickerRelative {bad_relative}, "
+          f"brak danych {missing}")
+    print(f"  {elapsed:.2f}s, {len(symbols) / elapsed:.1f} sesji/s")
+    # ru_maxrss w KB na Linuksie - serwer stub działa w tym samym procesie, więc to górne oszacowanie klienta
+    print(f"  peak RSS procesu: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    return mismatched == 0 and missing == 0 and bad_relative == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recordings', nargs='?')
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=0.05)
+    parser.add_argument('--width', type=int, default=37)
+    parser.add_argument('--bars', type=int, default=600,
+                        help='bars of the synthetic series; above 300 checks the renumbering (long term asks 3300)')
+    args = parser.parse_args()
+
+    if args.recordings:
+        recordings = load_recordings(args.recordings)
+    else:
+        recordings = {f'NYSE:S{n}': synthetic_payloads(f'NYSE:S{n}', bars=args.bars) for n in range(args.symbols)}
+    if not asyncio.run(run(recordings, args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Micro-benchmark: legacy `payload.split('~m~')` loop vs common.tv_frames decoder.
+
+Uruchomienie:
+    python3 bench/bench_tv_frames.py                 # syntetyczne payloady (3000 i 300 barów)
+    python3 bench/bench_tv_frames.py payload1.txt    # nagrane payloady (surowy tekst WS, jeden na plik)
+"""
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.tv_frames import find_study_rows
+
+
+def frame(body):
+    return f'~m~{len(body)}~m~{body}'
+
+
+def synthetic_payload(bars, width=37, seed=1):
+    """Build a payload shaped like a captured chart-session message with one `du` study frame."""
+    rng = random.Random(seed)
+    rows = [{'i': i - bars + 300, 'v': [round(rng.uniform(-50, 50), 4) for _ in range(width)]} for i in range(bars)]
+    du = {'m': 'du', 'p': ['cs_bench', {'st1': {'st': rows, 'ns': {'d': '', 'indexes': 'nochange'}}}]}
+    qsd = {'m': 'qsd', 'p': ['qs_bench', {'n': 'NYSE:A', 's': 'ok', 'v': {'lp': 123.45}}]}
+    parts = [frame('~h~17'), frame(json.dumps(qsd, separators=(',', ':'))),
+             frame(json.dumps(du, separators=(',', ':'))), frame('~h~18')]
+    return ''.join(parts)
+
+
+def legacy_rows(payload, width=37):
+    """The loop copy-pasted across scrapers, without the DB part."""
+    if not (payload and '"m":"du","p":["cs' in str(payload)):
+        return None
+    parts = payload.split('~m~')
+    i = 0
+    while i < len(parts):
+        if parts[i].isdigit():
+            msg_len = int(parts[i])
+            json_str = parts[i + 1]
+            if len(json_str) >= msg_len:
+                json_part = json_str[:msg_len]
+                try:
+                    data = json.loads(json_part)
+                    if data.get('m') == 'du':
+                        st_data = data['p'][1].get(list(data['p'][1].keys())[0], {}).get('st', [])
+                        if any(len(item.get('v', [])) == width for item in st_data):
+                            return st_data
+                except json.JSONDecodeError:
+                    pass
+            i += 2
+        else:
+            i += 1
+    return None
+
+
+def run(name, payload, number=20):
+    legacy = legacy_rows(payload)
+    decoded = find_study_rows(payload, 37)
+    assert legacy == decoded, f"{name}: decoder output differs from legacy loop"
+    t_legacy = min(timeit.repeat(lambda: legacy_rows(payload), number=number, repeat=3)) / number
+    t_new = min(timeit.repeat(lambda: find_study_rows(payload, 37), number=number, repeat=3)) / number
+    # Ramki bez "du" - tu dekoder nie robi json.loads w ogóle
+    noise = payload.replace('"m":"du"', '"m":"dx"')
+    t_legacy_noise = min(timeit.repeat(lambda: legacy_rows(noise), number=number, repeat=3)) / number
+    t_new_noise = min(timeit.repeat(lambda: find_study_rows(noise, 37), number=number, repeat=3)) / number
+    print(f"{name}: {len(payload) / 1e6:.2f} MB")
+    print(f"  du payload:     legacy {t_legacy * 1000:8.2f} ms   decoder {t_new * 1000:8.2f} ms   x{t_legacy / t_new:.2f}")
+    print(f"  non-du payload: legacy {t_legacy_noise * 1000:8.2f} ms   decoder {t_new_noise * 1000:8.2f} ms   x{t_legacy_noise / max(t_new_noise, 1e-9):.2f}")
+
+
+def main():
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            with open(path, 'r') as file:
+                run(os.path.basename(path), file.read())
+    else:
+        run('long (3000 bars x 37)', synthetic_payload(3000))
+        run('short (300 bars x 37)', synthetic_payload(300))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Capture files of raw TradingView websocket payloads: gzip'd JSONL, one payload per line.
+
+Każda linia: {"symbol": "NYSE:A", "ts": 1718000000.0, "payload": "~m~..~m~{...}"}.
+Files are opened in append mode, so one file can collect a whole scrape run
+and several runs can be concatenated (gzip members are read back in order).
+"""
+import gzip
+import json
+import time
+from collections import OrderedDict
+
+from common.tv_frames import _as_text
+
+
+class CaptureWriter:
+    """Append payloads of a symbol to a .jsonl.gz capture file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self.payloads_written = 0
+
+    def write(self, symbol, payloads):
+        ts = time.time()
+        for payload in payloads:
+            self._file.write(json.dumps({'symbol': symbol, 'ts': ts, 'payload': _as_text(payload)},
+                                        separators=(',', ':')))
+            self._file.write('\n')
+            self.payloads_written += 1
+        # Sync flush - przerwany scraper (Ctrl+C) zostawia plik czytelny do ostatniego symbolu
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_capture(path):
+    """CaptureWriter for `path`, or None when capturing is switched off (empty path)."""
+    return CaptureWriter(path) if path else None
+
+
+def iter_capture(path):
+    """Yield (symbol, payload) in the order they were captured; a file cut off mid-write ends early."""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        try:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Niedokończona ostatnia linia
+                    return
+                yield record['symbol'], record['payload']
+        except EOFError:
+            # Brak końcówki gzip - scraper nie zamknął pliku
+            return
+
+
+def load_capture(path):
+    """{symbol: [payload, ...]} keeping the capture order of symbols and payloads."""
+    recordings = OrderedDict()
+    for symbol, payload in iter_capture(path):
+        recordings.setdefault(symbol, []).append(payload)
+    return recordings
@@ -0,0 +1,169 @@
+"""Price and indicator tables keyed by the bar date instead of a stored TickerRelative.
+
+<table>_Dated holds one row per ("idSymbol", "BarDate"); daily loads upsert the
+newest bars and never touch the rest. TickerRelative is derived on read by the
+<table>_Dated_Relative view, numbered from the newest stored bar of each symbol
+exactly like the loaders and scrapers used to store it.
+"""
+from datetime import datetime, timezone
+
+from common.indicators import convert_value, filter_study_rows, PIFAGOR_WIDTH
+from common.indicator_tables import wide_columns
+
+DATED_SUFFIX = '_Dated'
+RELATIVE_SUFFIX = '_Relative'
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+# Przechowywanie dziennych cen (tStock_Prices, tCrypto_Prices): 'relative' - tabela z TickerRelative,
+# 'dated' - <tabela>_Dated; loadery zapisują, a czytelnicy (backtest) czytają zgodnie z tym ustawieniem
+PRICE_STORAGE = 'relative'
+# TickerRelative najnowszego baru: tStock_Prices numeruje od +1, tCrypto_Prices i tabele wskaźników od 0
+NEWEST_TICKER_RELATIVE = {
+    'tStock_Prices': 1,
+    'tCrypto_Prices': 0,
+    # tabele API (api/main.py) - pierwszy przesłany bar, czyli najnowszy, dostaje 0
+    '1DtStock_PricesHist': 0,
+    '1DtCrypto_PricesHist': 0,
+}
+
+
+def dated_table_name(table):
+    return f'{table}{DATED_SUFFIX}'
+
+
+def relative_view_name(table):
+    return f'{dated_table_name(table)}{RELATIVE_SUFFIX}'
+
+
+def price_source(table, storage=None):
+    """Table or view with "idSymbol", "TickerRelative", open..volume of the price table under storage."""
+    return relative_view_name(table) if (storage or PRICE_STORAGE) == 'dated' else table
+
+
+def create_dated_prices_sql(table):
+    columns = ',\n    '.join(f'"{col}" double precision' for col in PRICE_COLUMNS)
+    return f"""
+CREATE TABLE IF NOT EXISTS public."{dated_table_name(table)}" (
+    "idSymbol" integer NOT NULL,
+    "BarDate" date NOT NULL,
+    {columns},
+    PRIMARY KEY ("idSymbol", "BarDate")
+)"""
+
+
+def create_dated_indicators_sql(table, valid_indices):
+    columns = ',\n    '.join(f'"{col}" double precision' for col in wide_columns(valid_indices))
+    return f"""
+CREATE TABLE IF NOT EXISTS public."{dated_table_name(table)}" (
+    "idSymbol" integer NOT NULL,
+    "BarDate" date NOT NULL,
+    {columns},
+    PRIMARY KEY ("idSymbol", "BarDate")
+)"""
+
+
+def relative_view_sql(table, columns, newest_ticker_relative=0):
+    """View adding "TickerRelative" (newest bar = newest_ticker_relative, -1 per older bar) to a dated table.
+
+    Filters on "idSymbol" are pushed below the window function, so reading one
+    symbol only numbers that symbol's bars.
+    """
+    value_columns = ', '.join(f'"{col}"' for col in columns)
+    return f"""
+CREATE OR REPLACE VIEW public."{relative_view_name(table)}" AS
+SELECT "idSymbol", "BarDate",
+    ({int(newest_ticker_relative) + 1} - ROW_NUMBER() OVER (PARTITION BY "idSymbol" ORDER BY "BarDate" DESC))::integer
+        AS "TickerRelative",
+    {value_columns}
+FROM public."{dated_table_name(table)}"
+"""
+
+
+def price_bar_rows(id_symbol, data):
+    """(idSymbol, BarDate, open, high, low, close, volume) tuples from a tvDatafeed DataFrame (DatetimeIndex)."""
+    if data is None or data.empty:
+        return []
+    columns = [data[col].astype(float).tolist() for col in PRICE_COLUMNS]
+    return [(id_symbol, bar_date, *values) for bar_date, *values in zip(data.index.date, *columns)]
+
+
+def on_conflict_update_sql(value_columns, target='t'):
+    """ON CONFLICT clause updating value_columns only when one of them changed (target = table alias)."""
+    assignments = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in value_columns)
+    changed = ' OR '.join(f'{target}."{col}" IS DISTINCT FROM EXCLUDED."{col}"' for col in value_columns)
+    return f"""ON CONFLICT ("idSymbol", "BarDate") DO UPDATE
+SET {assignments}
+WHERE {changed}"""
+
+
+def upsert_sql(table, value_columns, values='%s'):
+    """INSERT ... ON CONFLICT, by default for execute_values; unchanged bars are not rewritten."""
+    columns = ', '.join(f'"{col}"' for col in value_columns)
+    return f"""
+INSERT INTO public."{dated_table_name(table)}" AS t ("idSymbol", "BarDate", {columns})
+VALUES {values}
+{on_conflict_update_sql(value_columns)}
+"""
+
+
+def named_upsert_sql(table, value_columns):
+    """upsert_sql() with named parameters (:idSymbol, :BarDate, :<column>) for SQLAlchemy text()."""
+    names = ', '.join(f':{col}' for col in ('idSymbol', 'BarDate', *value_columns))
+    return upsert_sql(table, value_columns, f'({names})')
+
+
+def upsert_price_bars(cursor, table, rows):
+    """Upsert price bars into <table>_Dated; returns the number of inserted or changed rows."""
+    from psycopg2.extras import execute_values
+
+    if not rows:
+        return 0
+    # Jedna instrukcja na całą paczkę - rowcount obejmuje wtedy wszystkie wiersze
+    execute_values(cursor, upsert_sql(table, PRICE_COLUMNS), rows, page_size=len(rows))
+    return cursor.rowcount
+
+
+def latest_bar_date(cursor, table, id_symbol):
+    """Newest stored BarDate of a symbol in <table>_Dated, None if it has no bars yet."""
+    cursor.execute(f'SELECT MAX("BarDate") FROM public."{dated_table_name(table)}" WHERE "idSymbol" = %s',
+                   (id_symbol,))
+    return cursor.fetchone()[0]
+
+
+def latest_bar_dates(cursor, table):
+    """{idSymbol: newest stored BarDate} of every symbol in <table>_Dated, in one query."""
+    cursor.execute(f'SELECT "idSymbol", MAX("BarDate") FROM public."{dated_table_name(table)}" GROUP BY "idSymbol"')
+    return dict(cursor.fetchall())
+
+
+def missing_bars(latest, today, full_bars, overlap=5, weekdays_only=True):
+    """n_bars to request so the fetch reaches back to `latest` plus `overlap` stored bars.
+
+    latest=None (nothing stored yet) means a full load. Holidays only make the
+    count larger than needed, never smaller.
+    """
+    if latest is None:
+        return full_bars
+    if weekdays_only:
+        import numpy as np
+        gap = int(np.busday_count(latest, today)) + 1
+    else:
+        gap = (today - latest).days + 1
+    return max(1, min(full_bars, gap + overlap))
+
+
+def bar_date(timestamp):
+    """Bar date (UTC) of a study row time stamp - v[0] of every `st` row."""
+    return datetime.fromtimestamp(float(timestamp), tz=timezone.utc).date()
+
+
+def dated_indicator_rows(id_symbol, st_data, valid_indices, width=PIFAGOR_WIDTH, term='long'):
+    """(idSymbol, BarDate, ind_<n>...) tuples of study rows, newest bar first; rows without a time are skipped."""
+    rows = []
+    for item in reversed(filter_study_rows(st_data, width, term)):
+        values = item['v']
+        try:
+            day = bar_date(values[0])
+        except (TypeError, ValueError, OverflowError, OSError):
+            continue
+        rows.append((id_symbol, day, *(convert_value(values[idx]) for idx in valid_indices)))
+    return rows
@@ -0,0 +1,88 @@
+"""Bounded dedup cache for websocket payloads keyed by a fixed-size digest."""
+import hashlib
+import time
+from collections import OrderedDict
+
+
+def payload_digest(payload, digest_size=16):
+    """blake2b digest of a payload (str or bytes)."""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8', errors='replace')
+    return hashlib.blake2b(payload, digest_size=digest_size).digest()
+
+
+class MessageDedup:
+    """LRU/TTL set of payload digests - a drop-in replacement for `seen_messages = set()`.
+
+    Stores 16-byte digests instead of multi-megabyte payloads, evicts the least
+    recently used entry above max_entries and optionally expires entries older
+    than ttl seconds. `payload in dedup` counts a hit or a miss.
+    """
+
+    def __init__(self, max_entries=1024, ttl=None, digest_size=16):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.digest_size = digest_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Ostatnio zhashowany payload - `in` i add() na tym samym obiekcie liczą skrót raz
+        self._last_payload = None
+        self._last_key = None
+
+    def _key(self, payload):
+        if payload is not self._last_payload:
+            self._last_key = payload_digest(payload, self.digest_size)
+            self._last_payload = payload
+        return self._last_key
+
+    def _expired(self, stamp, now):
+        return self.ttl is not None and now - stamp > self.ttl
+
+    def __contains__(self, payload):
+        key = self._key(payload)
+        stamp = self._entries.get(key)
+        if stamp is not None and not self._expired(stamp, time.monotonic()):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+        if stamp is not None:
+            del self._entries[key]
+        self.misses += 1
+        return False
+
+    def add(self, payload):
+        key = self._key(payload)
+        self._entries[key] = time.monotonic()
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def check_and_add(self, payload):
+        """Return True if the payload was already seen, otherwise remember it and return False."""
+        if payload in self:
+            return True
+        self.add(payload)
+        return False
+
+    def clear(self):
+        self._entries.clear()
+        self._last_payload = None
+        self._last_key = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __repr__(self):
+        s = self.stats()
+        return f"MessageDedup(entries={s['entries']}, hits={s['hits']}, misses={s['misses']}, evictions={s['evictions']})"
@@ -0,0 +1,182 @@
+"""Long and wide layouts of the Pifagor indicator tables.
+
+long: one row per ("idSymbol", "TickerRelative", "IndicatorIndex") - the original tables.
+wide: one row per ("idSymbol", "TickerRelative") with a double precision column
+      "ind_<n>" per valid index, the same names the consumers pivot to. The
+      wide table is called like the long one with the `_Wide` suffix.
+dated: wide rows keyed by the bar date in <table>_Dated, read through the
+      <table>_Dated_Relative view that adds TickerRelative (common.dated_tables).
+
+INDICATOR_LAYOUT is the layout of the t*_IndicatorValues_Pifagor_* tables:
+the scrapers write it and every reader (live loop, backtest) defaults to it.
+"""
+
+LAYOUTS = ('long', 'wide', 'dated')
+WIDE_SUFFIX = '_Wide'
+# Układ tabel wskaźników scraperów - zmiana tutaj przełącza zapis i odczyt jednocześnie
+INDICATOR_LAYOUT = 'long'
+
+
+def wide_table_name(table):
+    return f'{table}{WIDE_SUFFIX}'
+
+
+def wide_source(table, layout):
+    """Table or view with one row per bar and "ind_<n>" columns for the 'wide' and 'dated' layouts."""
+    if layout == 'dated':
+        from common.dated_tables import relative_view_name
+        return relative_view_name(table)
+    return wide_table_name(table)
+
+
+def wide_column(index):
+    return f'ind_{index}'
+
+
+def wide_columns(valid_indices):
+    return [wide_column(idx) for idx in valid_indices]
+
+
+def wide_rows(rows, valid_indices):
+    """Fold long (idSymbol, TickerRelative, IndicatorIndex, IndicatorValue) tuples into wide tuples.
+
+    Bar order of the input is kept; indices outside valid_indices are dropped,
+    missing ones become None.
+    """
+    position = {idx: n for n, idx in enumerate(valid_indices)}
+    width = len(valid_indices)
+    bars = {}
+    for id_symbol, tr, idx, value in rows:
+        n = position.get(idx)
+        if n is None:
+            continue
+        key = (id_symbol, tr)
+        values = bars.get(key)
+        if values is None:
+            values = bars[key] = [None] * width
+        values[n] = value
+    return [(id_symbol, tr, *values) for (id_symbol, tr), values in bars.items()]
+
+
+def long_rows(rows, valid_indices):
+    """Inverse of wide_rows() - unfold wide tuples into long ones, skipping NULL columns."""
+    result = []
+    for id_symbol, tr, *values in rows:
+        for idx, value in zip(valid_indices, values):
+            if value is not None:
+                result.append((id_symbol, tr, idx, value))
+    return result
+
+
+def create_wide_table_sql(table, valid_indices):
+    columns = ',\n    '.join(f'"{col}" double precision' for col in wide_columns(valid_indices))
+    wide = wide_table_name(table)
+    return f"""
+CREATE TABLE IF NOT EXISTS public."{wide}" (
+    "idSymbol" integer NOT NULL,
+    "TickerRelative" integer NOT NULL,
+    {columns},
+    PRIMARY KEY ("idSymbol", "TickerRelative")
+)"""
+
+
+def copy_from_long_sql(table, valid_indices, id_symbols=False):
+    """INSERT ... SELECT folding the long table into the wide one (conditional aggregation, no tablefunc).
+
+    With id_symbols=True the statement takes one parameter: an array of idSymbol to copy.
+    """
+    aggregates = ',\n    '.join(
+        f'MAX("IndicatorValue") FILTER (WHERE "IndicatorIndex" = {idx}) AS "{wide_column(idx)}"'
+        for idx in valid_indices)
+    columns = ', '.join(f'"{col}"' for col in wide_columns(valid_indices))
+    where = 'WHERE "idSymbol" = ANY(%s)' if id_symbols else ''
+    return f"""
+INSERT INTO public."{wide_table_name(table)}" ("idSymbol", "TickerRelative", {columns})
+SELECT "idSymbol", "TickerRelative",
+    {aggregates}
+FROM public."{table}"
+{where}
+GROUP BY "idSymbol", "TickerRelative"
+"""
+
+
+def long_view_sql(table, valid_indices, view=None):
+    """View with the long-table columns on top of the wide table, for readers still using the long form."""
+    view = view or f'{wide_table_name(table)}_AsLong'
+    pairs = ', '.join(f'({idx}, w."{wide_column(idx)}")' for idx in valid_indices)
+    return f"""
+CREATE OR REPLACE VIEW public."{view}" AS
+SELECT w."idSymbol", w."TickerRelative", v."IndicatorIndex", v."IndicatorValue"
+FROM public."{wide_table_name(table)}" w
+CROSS JOIN LATERAL (VALUES {pairs}) AS v("IndicatorIndex", "IndicatorValue")
+WHERE v."IndicatorValue" IS NOT NULL
+"""
+
+
+def select_wide_sql(table, indices, layout='long', min_ticker_relative=None, placeholder='%s'):
+    """SELECT "TickerRelative", "ind_<n>"... for one symbol (parameter: idSymbol), from either layout.
+
+    Both variants return the same columns ordered by TickerRelative ascending,
+    i.e. exactly what `df.pivot(...)` produced from the long table. `placeholder`
+    is the idSymbol parameter (':symbol_id' for SQLAlchemy text()).
+    """
+    tr_filter = f'AND "TickerRelative" > {int(min_ticker_relative)}' if min_ticker_relative is not None else ''
+    if layout in ('wide', 'dated'):
+        columns = ', '.join(f'"{col}"' for col in wide_columns(indices))
+        return f"""
+SELECT "TickerRelative", {columns}
+FROM public."{wide_source(table, layout)}"
+WHERE "idSymbol" = {placeholder} {tr_filter}
+ORDER BY "TickerRelative" ASC
+"""
+    aggregates = ', '.join(
+        f'MAX("IndicatorValue") FILTER (WHERE "IndicatorIndex" = {idx}) AS "{wide_column(idx)}"' for idx in indices)
+    index_list = ', '.join(str(idx) for idx in indices)
+    return f"""
+SELECT "TickerRelative", {aggregates}
+FROM public."{table}"
+WHERE "idSymbol" = {placeholder} AND "IndicatorIndex" IN ({index_list}) {tr_filter}
+GROUP BY "TickerRelative"
+ORDER BY "TickerRelative" ASC
+"""
+
+
+def select_wide_many_sql(table, indices, layout='long', min_ticker_relative=None, placeholder='%s', ordered=True):
+    """select_wide_sql for many symbols at once (parameter: list of idSymbol), with "idSymbol" as the first column.
+
+    Rows are ordered by idSymbol, then TickerRelative ascending; ordered=False
+    leaves the ORDER BY out, for use as a subquery.
+    """
+    tr_filter = f'AND "TickerRelative" > {int(min_ticker_relative)}' if min_ticker_relative is not None else ''
+    order_by = 'ORDER BY "idSymbol", "TickerRelative" ASC' if ordered else ''
+    if layout in ('wide', 'dated'):
+        columns = ', '.join(f'"{col}"' for col in wide_columns(indices))
+        return f"""
+SELECT "idSymbol", "TickerRelative", {columns}
+FROM public."{wide_source(table, layout)}"
+WHERE "idSymbol" = ANY({placeholder}) {tr_filter}
+{order_by}
+"""
+    aggregates = ', '.join(
+        f'MAX("IndicatorValue") FILTER (WHERE "IndicatorIndex" = {idx}) AS "{wide_column(idx)}"' for idx in indices)
+    index_list = ', '.join(str(idx) for idx in indices)
+    return f"""
+SELECT "idSymbol", "TickerRelative", {aggregates}
+FROM public."{table}"
+WHERE "idSymbol" = ANY({placeholder}) AND "IndicatorIndex" IN ({index_list}) {tr_filter}
+GROUP BY "idSymbol", "TickerRelative"
+{order_by}
+"""
+
+
+def read_indicator_frame(conn, table, id_symbol, indices, layout='long', min_ticker_relative=None):
+    """DataFrame with columns TickerRelative, ind_<n>... for one symbol, whichever layout is in use."""
+    import pandas as pd
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(select_wide_sql(table, indices, layout, min_ticker_relative), (id_symbol,))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return pd.DataFrame(rows, columns=['TickerRelative'] + wide_columns(indices))
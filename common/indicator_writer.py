@@ -0,0 +1,212 @@
+"""Writers replacing indicator rows of whole symbols in the Pifagor/div tables."""
+import csv
+import io
+import logging
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from common.dated_tables import dated_table_name, on_conflict_update_sql
+from common.indicator_tables import LAYOUTS, wide_columns, wide_rows, wide_table_name
+
+logger = logging.getLogger(__name__)
+
+
+class BatchedIndicatorWriter:
+    """Collects rows of several symbols and replaces them in one transaction per batch.
+
+    One connection, one commit per `batch_size` symbols instead of one commit per bar.
+    With updated_column None the symbols table is left alone and the caller marks
+    the symbol itself (the Pifagor + div scraper does it once both tables are written).
+    """
+
+    def __init__(self, conn, table, symbols_table, updated_column, batch_size=10):
+        self.conn = conn
+        self.table = table
+        self.symbols_table = symbols_table
+        self.updated_column = updated_column
+        self.batch_size = batch_size
+        self._pending = {}
+        self.symbols_written = 0
+        self.rows_written = 0
+        self.write_time = 0.0
+        self.last_rows_per_second = 0.0
+
+    def add(self, id_symbol, rows):
+        self._pending[id_symbol] = self._prepare(rows)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def replace_symbol(self, id_symbol, rows):
+        """Write the rows of one symbol (together with anything pending) right away; see flush()."""
+        self._pending[id_symbol] = self._prepare(rows)
+        return self.flush()
+
+    def flush(self):
+        """Write pending symbols in one transaction; returns the number of rows written, None on error."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        cursor = self.conn.cursor()
+        try:
+            ids = list(pending)
+            rows = [row for symbol_rows in pending.values() for row in symbol_rows]
+            started = time.perf_counter()
+            self._replace(cursor, ids, rows)
+            if self.updated_column is not None:
+                cursor.execute(f"""
+                    UPDATE public."{self.symbols_table}"
+                    SET "{self.updated_column}" = CURRENT_DATE
+                    WHERE id = ANY(%s)
+                    """, (ids,))
+            self.conn.commit()
+            elapsed = time.perf_counter() - started
+            self.write_time += elapsed
+            self.last_rows_per_second = len(rows) / elapsed if elapsed > 0 else 0.0
+            self.symbols_written += len(ids)
+            self.rows_written += len(rows)
+            logger.info(f"Zapisano {len(rows)} wierszy dla {len(ids)} symboli do {self.table} "
+                        f"({self.last_rows_per_second:,.0f} wierszy/s)")
+            return len(rows)
+        except (Exception, psycopg2.Error) as error:
+            self.conn.rollback()
+            logger.error(f"Błąd zapisu paczki {list(pending)} do {self.table}: {error}")
+            return None
+        finally:
+            cursor.close()
+
+    def _prepare(self, rows):
+        """Rows as they are stored; the long tuples of indicator_rows() by default."""
+        return rows
+
+    def _replace(self, cursor, ids, rows):
+        cursor.execute(f'DELETE FROM public."{self.table}" WHERE "idSymbol" = ANY(%s)', (ids,))
+        execute_values(cursor, f"""
+            INSERT INTO public."{self.table}"
+            ("idSymbol", "TickerRelative", "IndicatorIndex", "IndicatorValue")
+            VALUES %s
+            """, rows, page_size=5000)
+
+    def rows_per_second(self):
+        """Average write throughput since the writer was created (DB time only)."""
+        return self.rows_written / self.write_time if self.write_time > 0 else 0.0
+
+
+class CopyIndicatorWriter(BatchedIndicatorWriter):
+    """Same contract, rows staged with COPY FROM STDIN into a temp table and swapped in one transaction.
+
+    DELETE of the old rows and INSERT ... SELECT from the stage table commit
+    together, so readers see either the previous or the new set of a symbol,
+    never a half-written one.
+    """
+
+    def __init__(self, conn, table, symbols_table, updated_column, batch_size=1):
+        super().__init__(conn, table, symbols_table, updated_column, batch_size)
+        self.stage_table = f'stage_{table}'
+
+    def _replace(self, cursor, ids, rows):
+        # Tabela tymczasowa żyje do końca sesji, ON COMMIT DELETE ROWS czyści ją po każdej transakcji
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS "{self.stage_table}" (
+                "idSymbol" integer,
+                "TickerRelative" integer,
+                "IndicatorIndex" integer,
+                "IndicatorValue" double precision
+            ) ON COMMIT DELETE ROWS
+            """)
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(f"""
+            COPY "{self.stage_table}" ("idSymbol", "TickerRelative", "IndicatorIndex", "IndicatorValue")
+            FROM STDIN WITH (FORMAT csv)
+            """, buffer)
+        cursor.execute(f'DELETE FROM public."{self.table}" WHERE "idSymbol" = ANY(%s)', (ids,))
+        cursor.execute(f"""
+            INSERT INTO public."{self.table}"
+            ("idSymbol", "TickerRelative", "IndicatorIndex", "IndicatorValue")
+            SELECT "idSymbol", "TickerRelative", "IndicatorIndex", "IndicatorValue"
+            FROM "{self.stage_table}"
+            """)
+
+
+class WideCopyIndicatorWriter(CopyIndicatorWriter):
+    """CopyIndicatorWriter for the wide layout: one row per bar with an "ind_<n>" column per valid index.
+
+    Takes the same long tuples as the other writers (indicator_rows()) and folds
+    them with wide_rows(); rows_written counts wide rows, i.e. bars.
+    """
+
+    def __init__(self, conn, table, symbols_table, updated_column, valid_indices, batch_size=1):
+        super().__init__(conn, wide_table_name(table), symbols_table, updated_column, batch_size)
+        self.valid_indices = list(valid_indices)
+
+    def _prepare(self, rows):
+        return wide_rows(rows, self.valid_indices)
+
+    def _replace(self, cursor, ids, rows):
+        columns = ', '.join(['"idSymbol"', '"TickerRelative"'] +
+                            [f'"{col}"' for col in wide_columns(self.valid_indices)])
+        column_types = ',\n                '.join(f'"{col}" double precision'
+                                                   for col in wide_columns(self.valid_indices))
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS "{self.stage_table}" (
+                "idSymbol" integer,
+                "TickerRelative" integer,
+                {column_types}
+            ) ON COMMIT DELETE ROWS
+            """)
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(f'COPY "{self.stage_table}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        cursor.execute(f'DELETE FROM public."{self.table}" WHERE "idSymbol" = ANY(%s)', (ids,))
+        cursor.execute(f"""
+            INSERT INTO public."{self.table}" ({columns})
+            SELECT {columns} FROM "{self.stage_table}"
+            """)
+
+
+class DatedIndicatorWriter(CopyIndicatorWriter):
+    """Upserts (idSymbol, BarDate, ind_<n>...) rows of dated_indicator_rows() into <table>_Dated.
+
+    Nothing is deleted: bars are keyed by date, so a daily scrape only inserts
+    the new bar and rewrites the bars whose values changed.
+    """
+
+    def __init__(self, conn, table, symbols_table, updated_column, valid_indices, batch_size=1):
+        super().__init__(conn, dated_table_name(table), symbols_table, updated_column, batch_size)
+        self.valid_indices = list(valid_indices)
+
+    def _replace(self, cursor, ids, rows):
+        value_columns = wide_columns(self.valid_indices)
+        columns = ', '.join(['"idSymbol"', '"BarDate"'] + [f'"{col}"' for col in value_columns])
+        column_types = ',\n                '.join(f'"{col}" double precision' for col in value_columns)
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS "{self.stage_table}" (
+                "idSymbol" integer,
+                "BarDate" date,
+                {column_types}
+            ) ON COMMIT DELETE ROWS
+            """)
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(f'COPY "{self.stage_table}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        cursor.execute(f"""
+            INSERT INTO public."{self.table}" AS t ({columns})
+            SELECT {columns} FROM "{self.stage_table}"
+            {on_conflict_update_sql(value_columns)}
+            """)
+
+
+def make_indicator_writer(conn, table, symbols_table, updated_column, valid_indices, layout='long', batch_size=1):
+    """COPY writer for the chosen layout of `table` (see common.indicator_tables and common.dated_tables)."""
+    if layout == 'dated':
+        return DatedIndicatorWriter(conn, table, symbols_table, updated_column, valid_indices, batch_size)
+    if layout == 'wide':
+        return WideCopyIndicatorWriter(conn, table, symbols_table, updated_column, valid_indices, batch_size)
+    if layout == 'long':
+        return CopyIndicatorWriter(conn, table, symbols_table, updated_column, batch_size)
+    raise ValueError(f"Unknown indicator layout: {layout!r} (expected one of {LAYOUTS})")
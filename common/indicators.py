@@ -0,0 +1,67 @@
+"""Conversion of study `st` rows into (idSymbol, TickerRelative, IndicatorIndex, IndicatorValue) tuples."""
+
+PIFAGOR_WIDTH = 37
+DIV_WIDTH = 9
+# Zakres 'i' akceptowany przez scrapery dla danego horyzontu
+I_RANGE = {
+    'long': (-3000, 299),
+    'short': (0, 299),
+}
+OUT_OF_RANGE_VALUE = 1234.5678
+
+
+def convert_value(value):
+    """Round to 2 places and replace values outside double precision range, None if not numeric."""
+    try:
+        value_float = round(float(value), 2)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if abs(value_float) > 1e10:
+        value_float = OUT_OF_RANGE_VALUE
+    return value_float
+
+
+def filter_study_rows(st_data, width=PIFAGOR_WIDTH, term='long'):
+    i_min, i_max = I_RANGE[term]
+    return [
+        item for item in st_data
+        if len(item.get('v', [])) == width
+        and isinstance(item.get('i'), (int, float))
+        and i_min <= item.get('i') <= i_max
+    ]
+
+
+def series_study_rows(st_data, width=PIFAGOR_WIDTH):
+    """Study rows of a direct create_series session renumbered like the chart page (newest bar i=299).
+
+    A websocket series is numbered from its first bar (0 .. bars-1), the chart
+    page from its newest 300 bars; I_RANGE and ticker_relative() assume the
+    latter, so after this TickerRelative is `i - max_i` of the returned rows.
+    """
+    rows = [item for item in st_data
+            if len(item.get('v', [])) == width and isinstance(item.get('i'), (int, float))]
+    if not rows:
+        return []
+    shift = min(len(rows), 300) - 1 - max(item['i'] for item in rows)
+    return [{**item, 'i': item['i'] + shift} for item in rows]
+
+
+def ticker_relative(i_value, count, term='long'):
+    """TickerRelative of a study row the same way the scrapers compute it (0 = newest bar)."""
+    if term == 'long' and count >= 300:
+        return int(i_value - 299)
+    return int(i_value - count + 1)
+
+
+def indicator_rows(id_symbol, st_data, valid_indices, width=PIFAGOR_WIDTH, term='long'):
+    """Flatten study rows into insert tuples, newest bar first like the scrapers insert them."""
+    filtered = filter_study_rows(st_data, width, term)
+    count = len(filtered)
+    valid = set(valid_indices)
+    rows = []
+    for item in reversed(filtered):
+        tr = ticker_relative(item['i'], count, term)
+        for idx, value in enumerate(item['v']):
+            if idx in valid:
+                rows.append((id_symbol, tr, idx, convert_value(value)))
+    return rows
@@ -0,0 +1,145 @@
+"""Live buy/sell decision of stock_main.py, for all candidate symbols at once on NumPy arrays.
+
+indicator_arrays() folds wide indicator rows of the candidates into the
+newest values and the last WINDOW ind_5 values per symbol; decide() is the
+decision of stock/stock_main.py (the same one apiWorkers/stock/stock_main.py
+made) over those arrays and the tStockState columns, without pandas or
+per-symbol loops. run_cycle() is one pass of the live loop over any source:
+
+    candidates()          -> [(idSymbol, 'EXCHANGE:SYMBOL')]
+    indicators(ids)       -> [(idSymbol, TickerRelative, ind_5, ind_7, ind_22, ind_24)], last 20 bars
+    states(ids)           -> {idSymbol: {STATE_COLUMNS...}} for symbols having a state row
+    prices(symbols)       -> {idSymbol: close} of the current 1-minute bar
+    save_states(states)   -> write {idSymbol: {STATE_COLUMNS...}}, inserting symbols without a row
+
+(see common.live_sources: DbSource for PostgreSQL, ApiSource for the batch endpoints of api/main.py).
+"""
+import logging
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDICES = [5, 7, 22, 24]
+# Bary wskaźników czytane przez pętlę live ("TickerRelative" > -20)
+MIN_TICKER_RELATIVE = -20
+# Ostatnie wartości ind_5 sprawdzane przez reguły sprzedaży (6 z 10 poniżej 0, 3 kolejne poniżej -5)
+WINDOW = 10
+CONFIRM_DROP = 0.915
+BUY_AMOUNT = 10.0
+STATE_COLUMNS = ('status', 'buy', 'shouldSell', 'sell', 'checked', 'lastAction', 'invested', 'shares', 'maxValue',
+                 'amountBuySell')
+
+
+def default_state(now):
+    """State of a symbol without a tStockState row, as the scripts assumed it."""
+    return {'status': 'close', 'buy': False, 'shouldSell': False, 'sell': False, 'checked': now,
+            'lastAction': datetime(1990, 1, 1), 'invested': 0.0, 'shares': 0.0, 'maxValue': 0.0,
+            'amountBuySell': 0.0}
+
+
+def indicator_arrays(ids, rows):
+    """(latest, ind_5 window, bar count) of symbols ids from wide rows (idSymbol, TickerRelative, ind_5..ind_24).
+
+    latest is (n, 4): ind_5, ind_7, ind_22, ind_24 of the newest bar, NaN/None
+    as 0. The window is (n, WINDOW), newest bar first, NaN past the symbol's
+    bars; the bar count tells a missing bar from a NULL value.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    n = len(ids)
+    latest = np.zeros((n, len(INDICES)))
+    window = np.full((n, WINDOW), np.nan)
+    bars = np.zeros(n, np.int64)
+    if not rows:
+        return latest, window, bars
+    data = np.array([[np.nan if v is None else v for v in row] for row in rows], dtype=np.float64)
+    # Od najnowszego baru: idSymbol rosnąco, TickerRelative malejąco
+    data = data[np.lexsort((-data[:, 1], data[:, 0]))]
+    row_ids = data[:, 0].astype(np.int64)
+    order = np.argsort(ids)
+    k = order[np.clip(np.searchsorted(ids, row_ids, sorter=order), 0, n - 1)]
+    known = ids[k] == row_ids
+    data, row_ids, k = data[known], row_ids[known], k[known]
+    first = np.r_[True, row_ids[1:] != row_ids[:-1]]
+    start = np.flatnonzero(first)
+    rank = np.arange(len(row_ids)) - np.repeat(start, np.diff(np.r_[start, len(row_ids)]))
+    bars[k[first]] = np.diff(np.r_[start, len(row_ids)])
+    latest[k[first]] = np.nan_to_num(data[first, 2:2 + len(INDICES)])
+    in_window = rank < WINDOW
+    window[k[in_window], rank[in_window]] = data[in_window, 2]
+    return latest, window, bars
+
+
+def decide(latest, window, bars, price, is_open, should_sell, max_value, invested, shares, amount,
+           sell_value_amount=True):
+    """New (buy, shouldSell, sell, maxValue, amountBuySell) of symbols without a pending buy/sell.
+
+    An open position arms the sell (shouldSell) when ind_5 < -10, or when
+    it is not at a loss and ind_5 < -7, at least 6 of the last 10 ind_5 are
+    below 0 or the last 3 are all below -5. An armed position sells once its
+    value falls to CONFIRM_DROP * the highest value since. A bar with
+    ind_22 > 3 or ind_7 > 0 buys BUY_AMOUNT. amountBuySell of a sell is
+    -value of the position, or 0 with sell_value_amount=False (API worker).
+    """
+    ind_5, ind_7, ind_22 = latest[:, 0], latest[:, 1], latest[:, 2]
+    value = shares * price
+    profit = value - invested >= 0
+    with np.errstate(invalid='ignore'):
+        below_zero = np.sum(window < 0, axis=1)
+        below_minus_5 = np.sum(window[:, :3] < -5, axis=1)
+    trigger = is_open & ~should_sell & (
+        profit & (((bars >= WINDOW) & (below_zero >= 6)) | ((bars >= 3) & (below_minus_5 == 3)) | (ind_5 < -7))
+        | (ind_5 < -10))
+    should_sell = should_sell | trigger
+    armed = is_open & should_sell
+    max_value = np.where(armed, np.maximum(max_value, value), max_value)
+    sell = armed & (value <= max_value * CONFIRM_DROP)
+    amount = np.where(sell, -value if sell_value_amount else 0.0, amount)
+    buy = (ind_22 > 3) | (ind_7 > 0)
+    amount = np.where(buy, BUY_AMOUNT, amount)
+    return buy, should_sell, sell, max_value, amount
+
+
+def run_cycle(source, now=None, sell_value_amount=True):
+    """Evaluate every candidate of source once; returns the number of states written."""
+    now = now or datetime.now().replace(tzinfo=None)
+    candidates = source.candidates()
+    if not candidates:
+        return 0
+    ids = [id_symbol for id_symbol, _ in candidates]
+    saved = source.states(ids)
+    states = {id_symbol: dict(saved.get(id_symbol) or default_state(now)) for id_symbol in ids}
+    latest, window, bars = indicator_arrays(ids, source.indicators(ids))
+
+    # Symbol z akcją już dziś albo bez wskaźników - bez sprawdzania (i bez pobierania ceny)
+    active = np.array([bars[k] > 0 and (states[id_symbol]['lastAction'] is None
+                                        or states[id_symbol]['lastAction'].date() != now.date())
+                       for k, id_symbol in enumerate(ids)], dtype=bool)
+    prices = source.prices([candidates[k] for k in np.flatnonzero(active)])
+    price = np.array([prices.get(id_symbol, np.nan) for id_symbol in ids], dtype=np.float64)
+    # Zakup/sprzedaż czeka na wykonanie - stan zostaje
+    pending = np.array([bool(states[id_symbol]['buy']) or bool(states[id_symbol]['sell']) for id_symbol in ids])
+    active &= ~np.isnan(price) & ~pending
+    if not active.any():
+        return 0
+
+    rows = [states[ids[k]] for k in np.flatnonzero(active)]
+    column = lambda name: np.array([float(row[name] or 0) for row in rows])
+    buy, should_sell, sell, max_value, amount = decide(
+        latest[active], window[active], bars[active], price[active],
+        np.array([row['status'] == 'open' for row in rows]), np.array([bool(row['shouldSell']) for row in rows]),
+        column('maxValue'), column('invested'), column('shares'), column('amountBuySell'), sell_value_amount)
+    updates = {}
+    for n, k in enumerate(np.flatnonzero(active)):
+        id_symbol = ids[k]
+        state = states[id_symbol]
+        state.update(buy=bool(buy[n]), shouldSell=bool(should_sell[n]), sell=bool(sell[n]), checked=now,
+                     maxValue=float(max_value[n]), amountBuySell=float(amount[n]))
+        updates[id_symbol] = state
+        if buy[n] or sell[n]:
+            logger.info(f"{candidates[k][1]}: {'sprzedaż' if sell[n] else 'zakup'} {amount[n]:.2f}")
+    source.save_states(updates)
+    logger.info(f"{len(candidates)} kandydatów, {len(updates)} sprawdzonych, "
+                f"{int(buy.sum())} zakupów, {int(sell.sum())} sprzedaży")
+    return len(updates)
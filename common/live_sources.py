@@ -0,0 +1,223 @@
+"""Data sources of the live decision loop (common.live_decision.run_cycle): PostgreSQL directly or through api/main.py.
+
+DbSource reads candidates, indicators, states and fresh real-time prices
+with one query each for all symbols and writes states with one UPDATE and
+one INSERT (write_states(), also behind the API's POST /states). ApiSource
+does the same through the batch endpoints of api/main.py. Both fetch missing
+1-minute bars with a common.price_fetcher.PriceFetcher.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from common.indicator_tables import INDICATOR_LAYOUT, select_wide_many_sql, wide_columns
+from common.live_decision import INDICES, MIN_TICKER_RELATIVE, STATE_COLUMNS
+from common.quote_service import upsert_real_prices
+
+logger = logging.getLogger(__name__)
+
+# Kolumny stanu zmieniane przez decyzję (stock_main.py nie nadpisuje pozostałych) i ich typy w VALUES
+DECISION_COLUMNS = ('buy', 'shouldSell', 'sell', 'checked', 'maxValue', 'amountBuySell')
+STATE_TYPES = {'status': 'text', 'buy': 'boolean', 'shouldSell': 'boolean', 'sell': 'boolean', 'checked': 'timestamp',
+               'lastAction': 'timestamp', 'invested': 'float8', 'shares': 'float8', 'maxValue': 'float8',
+               'amountBuySell': 'float8'}
+# Cena z *_PricesReal młodsza niż tyle nie jest pobierana ponownie (stock_quote_service trzyma ją świeżą)
+FRESH_PRICE = timedelta(minutes=1)
+
+
+def bar_row(id_symbol, data, now):
+    """(idSymbol, open, high, low, close, volume, timestamp, updated) of the newest bar of a get_hist() frame."""
+    latest = data.iloc[-1]
+    volume = latest['volume']
+    return (id_symbol, float(latest['open']), float(latest['high']), float(latest['low']), float(latest['close']),
+            int(volume) if volume == volume else 0, latest.name.to_pydatetime().replace(tzinfo=None), now)
+
+
+def write_states(cursor, table, states, update_columns=DECISION_COLUMNS):
+    """Write {idSymbol: {STATE_COLUMNS...}}: one UPDATE of update_columns for existing rows, one INSERT of the rest.
+
+    Returns (updated, inserted).
+    """
+    from psycopg2.extras import execute_values
+
+    if not states:
+        return 0, 0
+    cursor.execute(f'SELECT "idSymbol" FROM public."{table}" WHERE "idSymbol" = ANY(%s)', (list(states),))
+    existing = {row[0] for row in cursor.fetchall()}
+    updated = [(id_symbol, *(s[col] for col in update_columns)) for id_symbol, s in states.items()
+               if id_symbol in existing]
+    inserted = [(id_symbol, *(s[col] for col in STATE_COLUMNS)) for id_symbol, s in states.items()
+                if id_symbol not in existing]
+    if updated:
+        assignments = ', '.join(f'"{col}" = v."{col}"' for col in update_columns)
+        names = ', '.join(f'"{col}"' for col in update_columns)
+        template = '(%s, ' + ', '.join(f'%s::{STATE_TYPES[col]}' for col in update_columns) + ')'
+        execute_values(cursor, f"""
+UPDATE public."{table}" st
+SET {assignments}
+FROM (VALUES %s) AS v("idSymbol", {names})
+WHERE st."idSymbol" = v."idSymbol"
+""", updated, template=template, page_size=len(updated))
+    if inserted:
+        columns = ', '.join(f'"{col}"' for col in STATE_COLUMNS)
+        execute_values(cursor, f'INSERT INTO public."{table}" ("idSymbol", {columns}) VALUES %s', inserted,
+                       page_size=len(inserted))
+    return len(updated), len(inserted)
+
+
+class DbSource:
+    """tStockSymbols / tStockState / tStock_IndicatorValues_Pifagor_Short / tStock_PricesReal over one connection."""
+
+    def __init__(self, conn, fetcher, updated_short_term, symbols_table='tStockSymbols', state_table='tStockState',
+                 indicators_table='tStock_IndicatorValues_Pifagor_Short', prices_table='tStock_PricesReal',
+                 layout=INDICATOR_LAYOUT):
+        self.conn = conn
+        self.fetcher = fetcher
+        self.updated_short_term = updated_short_term
+        self.symbols_table = symbols_table
+        self.state_table = state_table
+        self.indicators_table = indicators_table
+        self.prices_table = prices_table
+        self.layout = layout
+
+    def _fetchall(self, query, params=None):
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def candidates(self):
+        return self._fetchall(f"""
+SELECT s.id, s."Symbol"
+FROM public."{self.symbols_table}" s
+LEFT JOIN public."{self.state_table}" st ON s.id = st."idSymbol"
+WHERE s."enabled" = TRUE
+  AND (s."UpdatedShortTerm" = %s OR st.status = 'open')
+ORDER BY s.id
+""", (self.updated_short_term,))
+
+    def indicators(self, ids):
+        query = select_wide_many_sql(self.indicators_table, INDICES, self.layout, MIN_TICKER_RELATIVE)
+        return self._fetchall(query, (list(ids),))
+
+    def states(self, ids):
+        columns = ', '.join(f'"{col}"' for col in STATE_COLUMNS)
+        rows = self._fetchall(f'SELECT "idSymbol", {columns} FROM public."{self.state_table}" '
+                              f'WHERE "idSymbol" = ANY(%s)', (list(ids),))
+        return {row[0]: dict(zip(STATE_COLUMNS, row[1:])) for row in rows}
+
+    def prices(self, symbols):
+        """Close of the current bar: fresh rows of the prices table, the rest fetched and upserted there."""
+        now = datetime.now().replace(tzinfo=None)
+        rows = self._fetchall(f'SELECT "idSymbol", "updated", "close" FROM public."{self.prices_table}" '
+                              f'WHERE "idSymbol" = ANY(%s)', ([id_symbol for id_symbol, _ in symbols],))
+        prices = {id_symbol: float(close) for id_symbol, updated, close in rows
+                  if updated is not None and updated >= now - FRESH_PRICE}
+        stale = [(id_symbol, symbol) for id_symbol, symbol in symbols if id_symbol not in prices]
+        fetched = []
+        for id_symbol, symbol, data in self.fetcher.fetch_many(stale):
+            if data is None:
+                logger.warning(f"No data available for {symbol}. Skipping.")
+                continue
+            row = bar_row(id_symbol, data, now)
+            fetched.append(row)
+            prices[id_symbol] = row[4]
+        if fetched:
+            try:
+                with self.conn.cursor() as cursor:
+                    upsert_real_prices(cursor, self.prices_table, fetched)
+                self.conn.commit()
+            except Exception as e:
+                logger.error(f"Database error writing {self.prices_table}: {e}")
+                self.conn.rollback()
+        logger.info(f"Ceny: {len(symbols) - len(stale)} świeżych z {self.prices_table}, {len(fetched)} pobranych")
+        return prices
+
+    def save_states(self, states):
+        try:
+            with self.conn.cursor() as cursor:
+                updated, inserted = write_states(cursor, self.state_table, states)
+            self.conn.commit()
+            logger.info(f"Updated {updated} and inserted {inserted} rows of {self.state_table}")
+        except Exception as e:
+            logger.error(f"Database error updating {self.state_table}: {e}")
+            self.conn.rollback()
+
+
+class ApiSource:
+    """The batch endpoints of api/main.py: a cycle is the same five requests however many symbols there are."""
+
+    def __init__(self, api_url, fetcher, session=None):
+        import requests
+
+        self.api_url = api_url
+        self.fetcher = fetcher
+        self.session = session or requests.Session()
+
+    def _get(self, path):
+        response = self.session.get(f"{self.api_url}{path}")
+        response.raise_for_status()
+        return response.json()
+
+    def _post(self, path, data):
+        response = self.session.post(f"{self.api_url}{path}", json=data)
+        response.raise_for_status()
+        return response.json()
+
+    def candidates(self):
+        try:
+            symbols = self._get('/symbols/with-short-state')
+        except Exception as e:
+            logger.error(f"Error fetching symbols from API: {e}")
+            return []
+        logger.info(f"Fetched {len(symbols)} symbols with short-state criteria")
+        return [(symbol['id'], symbol['Symbol']) for symbol in symbols]
+
+    def indicators(self, ids):
+        try:
+            rows = self._post(f'/indicators/short/batch?min_ticker_relative={MIN_TICKER_RELATIVE}', {'ids': list(ids)})
+        except Exception as e:
+            logger.error(f"Error fetching indicator data: {e}")
+            return []
+        columns = ['idSymbol', 'TickerRelative'] + wide_columns(INDICES)
+        return [tuple(row.get(col) for col in columns) for row in rows]
+
+    def states(self, ids):
+        """Rows of the state table; the endpoint's defaults for symbols without one are left to run_cycle()."""
+        try:
+            rows = self._post('/states/query?defaults=false', {'ids': list(ids)})
+        except Exception as e:
+            logger.error(f"Error fetching state data: {e}")
+            return {}
+        states = {}
+        for state in rows:
+            for col in ('checked', 'lastAction'):
+                state[col] = datetime.fromisoformat(state[col]) if state.get(col) else None
+            states[state['idSymbol']] = {col: state.get(col) for col in STATE_COLUMNS}
+        return states
+
+    def prices(self, symbols):
+        """Close of the current bar of every symbol, fetched and posted to /prices/real/batch in one request."""
+        now = datetime.now().replace(tzinfo=None)
+        rows = [bar_row(id_symbol, data, now) for id_symbol, _, data in self.fetcher.fetch_many(symbols)
+                if data is not None]
+        if not rows:
+            return {}
+        try:
+            self._post('/prices/real/batch', {'prices': [
+                dict(zip(('idSymbol', 'open', 'high', 'low', 'close', 'volume'), row),
+                     timestamp=row[6].isoformat(), updated=row[7].isoformat()) for row in rows]})
+        except Exception as e:
+            logger.error(f"Error updating prices: {e}")
+        return {row[0]: row[4] for row in rows}
+
+    def save_states(self, states):
+        data = []
+        for id_symbol, state in states.items():
+            row = {col: state[col] for col in STATE_COLUMNS}
+            row.update(idSymbol=id_symbol, checked=state['checked'].isoformat(),
+                       lastAction=state['lastAction'].isoformat() if state['lastAction'] else None)
+            data.append(row)
+        try:
+            result = self._post('/states', {'states': data})
+            logger.info(f"Updated {result['updated']} and inserted {result['inserted']} states")
+        except Exception as e:
+            logger.error(f"Error updating states: {e}")
@@ -0,0 +1,134 @@
+"""Concurrent tvDatafeed fetches with a shared rate limit, retries and a per-call timeout.
+
+tv.get_hist() opens its own websocket and blocks until the bars arrive, so a
+refresh of a few thousand symbols is bound by network round trips. PriceFetcher
+runs them on a bounded thread pool - one TvDatafeed per thread, the client keeps
+its socket on the instance and is not thread safe - and starts at most `rate`
+calls per second across all threads.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def split_symbol(full_symbol):
+    """'EXCHANGE:SYMBOL' -> (exchange, symbol); ValueError for any other format."""
+    if ':' not in full_symbol:
+        raise ValueError(f"Invalid symbol format: {full_symbol}")
+    exchange, symbol = full_symbol.split(':', 1)
+    return exchange, symbol
+
+
+def _default_tv_factory():
+    # Import lokalny - moduł ładuje się także tam, gdzie tvDatafeed nie jest zainstalowany
+    from tvDatafeed import TvDatafeed
+    return TvDatafeed()
+
+
+class PriceFetcher:
+    """Bounded pool of tv.get_hist() calls.
+
+    fetch() is one call with retries; fetch_many() runs many of them on the
+    pool and yields results as they complete. A call that raises or returns
+    None/empty is retried up to `retries` times with exponential backoff and
+    jitter. `timeout` is the websocket timeout of each call (seconds).
+    """
+
+    def __init__(self, interval, n_bars, workers=8, rate=4.0, burst=None, retries=3, backoff=1.0, timeout=10.0,
+                 tv_factory=None):
+        self.interval = interval
+        self.n_bars = n_bars
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, burst)
+        self.tv_factory = tv_factory or _default_tv_factory
+        self._local = threading.local()
+
+    def _tv(self):
+        tv = getattr(self._local, 'tv', None)
+        if tv is None:
+            tv = self.tv_factory()
+            # TvDatafeed trzyma timeout websocketu w prywatnym atrybucie klasy (domyślnie 5 s)
+            if hasattr(tv, '_TvDatafeed__ws_timeout'):
+                tv._TvDatafeed__ws_timeout = self.timeout
+            self._local.tv = tv
+        return tv
+
+    def fetch(self, exchange, symbol, n_bars=None):
+        """DataFrame of the newest n_bars bars, or None once all attempts failed."""
+        n_bars = n_bars or self.n_bars
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                data = self._tv().get_hist(symbol=symbol, exchange=exchange, interval=self.interval, n_bars=n_bars)
+                if data is not None and not data.empty:
+                    return data
+                error = 'no data'
+            except Exception as exc:
+                error = exc
+                # Po błędzie połączenia budujemy klienta od nowa
+                self._local.tv = None
+            if attempt < self.retries:
+                delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                logger.warning(f"{exchange}:{symbol} attempt {attempt + 1} failed ({error}), retry in {delay:.1f}s")
+                time.sleep(delay)
+            else:
+                logger.error(f"{exchange}:{symbol} failed after {attempt + 1} attempts: {error}")
+        return None
+
+    def fetch_many(self, symbols, n_bars=None):
+        """Fetch (idSymbol, 'EXCHANGE:SYMBOL') pairs concurrently, yield (idSymbol, full_symbol, data).
+
+        Results come in completion order; data is None for failed symbols.
+        n_bars may be a callable idSymbol -> n_bars (incremental loads).
+        Symbols in a wrong format are logged and skipped.
+        """
+        started = time.perf_counter()
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='tvfetch') as pool:
+            futures = {}
+            for id_symbol, full_symbol in symbols:
+                try:
+                    exchange, symbol = split_symbol(full_symbol)
+                except ValueError as error:
+                    logger.error(f"Error processing symbol {full_symbol}: {error}")
+                    continue
+                bars = n_bars(id_symbol) if callable(n_bars) else n_bars
+                futures[pool.submit(self.fetch, exchange, symbol, bars)] = (id_symbol, full_symbol)
+            for future in as_completed(futures):
+                id_symbol, full_symbol = futures[future]
+                done += 1
+                yield id_symbol, full_symbol, future.result()
+        elapsed = time.perf_counter() - started
+        if done:
+            logger.info(f"Fetched {done} symbols in {elapsed:.1f}s ({done / elapsed:.1f} symbols/s)")
@@ -0,0 +1,140 @@
+"""Bulk writer for the daily price tables (tStock_Prices, tCrypto_Prices and their _Dated variants).
+
+One symbol = one round trip: the tvDatafeed DataFrame is turned column-wise
+into a COPY buffer with TickerRelative computed in the same pass, then DELETE
++ COPY commit together over a pooled connection.
+"""
+import io
+import logging
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from common.dated_tables import NEWEST_TICKER_RELATIVE, PRICE_COLUMNS, price_bar_rows, upsert_price_bars
+
+logger = logging.getLogger(__name__)
+
+
+def ticker_relative_frame(id_symbol, data, newest_ticker_relative=0):
+    """idSymbol, TickerRelative, open..volume newest bar first; TickerRelative = newest, newest-1, ...
+
+    Same numbering the loaders' per-row UPDATE used to store (ordered by id, i.e. insert order).
+    """
+    data = data.sort_index(ascending=False)
+    frame = pd.DataFrame({col: data[col].to_numpy(dtype=float) for col in PRICE_COLUMNS})
+    frame.insert(0, 'TickerRelative', newest_ticker_relative - np.arange(len(frame), dtype=np.int64))
+    frame.insert(0, 'idSymbol', np.full(len(frame), id_symbol, dtype=np.int64))
+    return frame
+
+
+def copy_buffer(frame):
+    """COPY text-format buffer (tab separated, \\N for NaN) of a frame."""
+    buffer = io.StringIO()
+    frame.to_csv(buffer, sep='\t', header=False, index=False, na_rep='\\N', lineterminator='\n')
+    buffer.seek(0)
+    return buffer
+
+
+class PriceWriter:
+    """Replaces or upserts price bars of one symbol per call, sharing a small connection pool.
+
+    The pool is opened on first use, so the writer can be created at import time.
+    Both methods return the number of rows written, or None on error (rolled back).
+    """
+
+    def __init__(self, db_params, table, newest_ticker_relative=None, maxconn=2):
+        self.db_params = db_params
+        self.table = table
+        if newest_ticker_relative is None:
+            newest_ticker_relative = NEWEST_TICKER_RELATIVE.get(table, 0)
+        self.newest_ticker_relative = newest_ticker_relative
+        self.maxconn = maxconn
+        self._pool = None
+        self.rows_written = 0
+        self.write_time = 0.0
+
+    @contextmanager
+    def connection(self):
+        if self._pool is None:
+            self._pool = ThreadedConnectionPool(1, self.maxconn, **self.db_params)
+        conn = self._pool.getconn()
+        try:
+            yield conn
+        finally:
+            # Połączenie zerwane - pula je zamyka zamiast oddawać kolejnemu wywołaniu
+            self._pool.putconn(conn, close=bool(conn.closed))
+
+    def replace_symbol(self, id_symbol, data):
+        """DELETE the symbol's bars and COPY the new ones with TickerRelative, in one transaction."""
+        frame = ticker_relative_frame(id_symbol, data, self.newest_ticker_relative)
+        return self._write(id_symbol, len(frame), lambda cursor: self._copy(cursor, id_symbol, frame))
+
+    def upsert_dated(self, id_symbol, data):
+        """Upsert bars into <table>_Dated; returns the number of inserted or changed rows."""
+        rows = price_bar_rows(id_symbol, data)
+        return self._write(id_symbol, len(rows), lambda cursor: upsert_price_bars(cursor, self.table, rows))
+
+    def append_relative(self, id_symbol, data, new_bars, keep=None):
+        """Incremental update of the relative table, in one transaction with the upsert into <table>_Dated.
+
+        data are the newest contiguous bars: new_bars not stored yet plus the
+        overlap already stored. Stored bars move back by new_bars, the ones
+        data covers are replaced (corrections included) and only the newest
+        keep bars of the symbol are kept. <table>_Dated keeps the bar dates
+        the next incremental run starts from.
+        """
+        frame = ticker_relative_frame(id_symbol, data, self.newest_ticker_relative)
+        rows = price_bar_rows(id_symbol, data)
+        covered = self.newest_ticker_relative - len(frame)
+        oldest = self.newest_ticker_relative - keep if keep else None
+
+        def write(cursor):
+            cursor.execute(f'UPDATE public."{self.table}" SET "TickerRelative" = "TickerRelative" - %s '
+                           f'WHERE "idSymbol" = %s', (new_bars, id_symbol))
+            cursor.execute(f'DELETE FROM public."{self.table}" WHERE "idSymbol" = %s '
+                           f'AND ("TickerRelative" > %s OR "TickerRelative" <= %s)',
+                           (id_symbol, covered, oldest if oldest is not None else np.iinfo(np.int64).min))
+            self._copy_frame(cursor, frame)
+            upsert_price_bars(cursor, self.table, rows)
+            return len(frame)
+
+        return self._write(id_symbol, len(frame), write)
+
+    def _copy(self, cursor, id_symbol, frame):
+        cursor.execute(f'DELETE FROM public."{self.table}" WHERE "idSymbol" = %s', (id_symbol,))
+        return self._copy_frame(cursor, frame)
+
+    def _copy_frame(self, cursor, frame):
+        columns = ', '.join(f'"{col}"' for col in frame.columns)
+        cursor.copy_expert(f'COPY public."{self.table}" ({columns}) FROM STDIN', copy_buffer(frame))
+        return len(frame)
+
+    def _write(self, id_symbol, rows, write):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                started = time.perf_counter()
+                written = write(cursor)
+                conn.commit()
+                elapsed = time.perf_counter() - started
+                self.write_time += elapsed
+                self.rows_written += rows
+                logger.info(f"Zapisano {rows} barów idSymbol {id_symbol} do {self.table} "
+                            f"({rows / elapsed if elapsed > 0 else 0:,.0f} wierszy/s)")
+                return written
+            except (Exception, psycopg2.Error) as error:
+                if not conn.closed:
+                    conn.rollback()
+                logger.error(f"Błąd zapisu barów idSymbol {id_symbol} do {self.table}: {error}")
+                return None
+            finally:
+                cursor.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
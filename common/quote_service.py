@@ -0,0 +1,154 @@
+"""Latest 1-minute bars kept in memory from one TradingView quote session, flushed in batches to *_PricesReal.
+
+Every `qsd` update carries the last price, its time and the cumulative volume
+of the day. LatestBars folds them into the current minute bar of each symbol
+(open/high/low/close of the ticks in that minute, volume = growth of the day
+volume) - the same row the loaders used to get from tv.get_hist(n_bars=1).
+Only bars changed since the previous flush are written, with one
+INSERT ... ON CONFLICT per flush.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+REAL_PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'timestamp', 'updated')
+
+
+def unique_index_sql(table):
+    """ON CONFLICT ("idSymbol") needs a unique index; the table was created without one (create_real_prices_index.py)."""
+    return f'CREATE UNIQUE INDEX IF NOT EXISTS "{table}_idSymbol_key" ON public."{table}" ("idSymbol")'
+
+
+def upsert_real_prices_sql(table):
+    columns = ', '.join(f'"{col}"' for col in REAL_PRICE_COLUMNS)
+    assignments = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in REAL_PRICE_COLUMNS)
+    return f"""
+INSERT INTO public."{table}" ("idSymbol", {columns})
+VALUES %s
+ON CONFLICT ("idSymbol") DO UPDATE
+SET {assignments}
+"""
+
+
+def upsert_real_prices(cursor, table, rows):
+    """Upsert (idSymbol, open, high, low, close, volume, timestamp, updated) rows in one statement."""
+    from psycopg2.extras import execute_values
+
+    if not rows:
+        return 0
+    # Ostatni wiersz symbolu wygrywa - ON CONFLICT nie przyjmie dwóch wierszy tego samego klucza
+    rows = list({row[0]: row for row in rows}.values())
+    execute_values(cursor, upsert_real_prices_sql(table), rows, page_size=len(rows))
+    return len(rows)
+
+
+class LatestBars:
+    """Current minute bar per symbol folded from quote updates, with the set of bars changed since pop_changed()."""
+
+    def __init__(self, symbol_ids=None):
+        self.symbol_ids = dict(symbol_ids or {})
+        self._quotes = {}
+        self._bars = {}
+        self._changed = set()
+        self.updates = 0
+
+    def set_symbols(self, symbol_ids):
+        """Replace the {symbol: idSymbol} map; state of symbols no longer in it is dropped."""
+        self.symbol_ids = dict(symbol_ids)
+        for symbol in set(self._quotes) - set(self.symbol_ids):
+            self._quotes.pop(symbol, None)
+            self._bars.pop(symbol, None)
+            self._changed.discard(symbol)
+
+    def apply(self, symbol, values, now=None):
+        """Fold one qsd `v` dict into the symbol's bar; True if the bar changed."""
+        if symbol not in self.symbol_ids:
+            return False
+        self.updates += 1
+        quote = self._quotes.setdefault(symbol, {})
+        previous_volume = quote.get('volume')
+        quote.update(values)
+        bar = self._bars.get(symbol)
+        price = values.get('lp')
+        if price is None:
+            if bar is None or 'volume' not in values:
+                return False
+            bar['volume'] = max(0, quote['volume'] - bar['base_volume'])
+        else:
+            minute = int(quote.get('lp_time') or now or time.time()) // 60 * 60
+            if bar is None or minute > bar['minute']:
+                base = previous_volume if previous_volume is not None else quote.get('volume', 0)
+                bar = self._bars[symbol] = {'minute': minute, 'open': price, 'high': price, 'low': price,
+                                            'close': price, 'base_volume': base or 0, 'volume': 0}
+            elif minute < bar['minute']:
+                # Spóźniony tick z poprzedniej minuty
+                return False
+            else:
+                bar['high'] = max(bar['high'], price)
+                bar['low'] = min(bar['low'], price)
+                bar['close'] = price
+            bar['volume'] = max(0, (quote.get('volume') or 0) - bar['base_volume'])
+        self._changed.add(symbol)
+        return True
+
+    def pop_changed(self):
+        """Rows (idSymbol, open, high, low, close, volume, timestamp, updated) of changed bars; clears the set."""
+        updated = datetime.now().replace(tzinfo=None)
+        rows = []
+        for symbol in self._changed:
+            bar = self._bars[symbol]
+            rows.append((self.symbol_ids[symbol], bar['open'], bar['high'], bar['low'], bar['close'],
+                         int(bar['volume']), datetime.fromtimestamp(bar['minute']), updated))
+        self._changed.clear()
+        return rows
+
+
+async def run_quote_service(client_factory, load_symbols, write_rows, flush_interval=1.0, refresh_interval=60.0,
+                            reconnect_delay=5.0, stop=None):
+    """Stream quotes of load_symbols() ({symbol: idSymbol}) and write changed bars every flush_interval.
+
+    load_symbols and write_rows are blocking (DB) callables, run in a thread.
+    The symbol list is reloaded every refresh_interval seconds and the quote
+    session adjusted; a dropped socket is reopened after reconnect_delay.
+    Runs until `stop` (an asyncio.Event) is set.
+    """
+    stop = stop or asyncio.Event()
+    bars = LatestBars()
+    while not stop.is_set():
+        try:
+            async with client_factory() as client:
+                session = await client.quote_session().open()
+                bars.set_symbols(await asyncio.to_thread(load_symbols))
+                await session.add_symbols(list(bars.symbol_ids))
+                logger.info(f"Sesja notowań {session.id}: {len(bars.symbol_ids)} symboli")
+                last_flush = last_refresh = time.monotonic()
+                async for symbol, status, values in session.updates(timeout=flush_interval):
+                    if symbol is not None:
+                        if status == 'ok':
+                            bars.apply(symbol, values)
+                        elif status is not None:
+                            logger.warning(f"Notowania {symbol}: status {status}")
+                    now = time.monotonic()
+                    if now - last_flush >= flush_interval:
+                        rows = bars.pop_changed()
+                        if rows:
+                            await asyncio.to_thread(write_rows, rows)
+                        last_flush = now
+                    if now - last_refresh >= refresh_interval:
+                        symbol_ids = await asyncio.to_thread(load_symbols)
+                        await session.remove_symbols(list(set(session.symbols) - set(symbol_ids)))
+                        bars.set_symbols(symbol_ids)
+                        await session.add_symbols(list(symbol_ids))
+                        last_refresh = now
+                    if stop.is_set():
+                        break
+                rows = bars.pop_changed()
+                if rows:
+                    await asyncio.to_thread(write_rows, rows)
+        except Exception as e:
+            logger.error(f"Sesja notowań przerwana: {e}")
+            if not stop.is_set():
+                await asyncio.sleep(reconnect_delay)
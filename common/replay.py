@@ -0,0 +1,101 @@
+"""Offline replay of captured websocket payloads through the scrapers' processing path.
+
+ReplayDriver stands in for the selenium-wire driver: driver.get(chart_url)
+appends one TradingView socket request holding the captured payloads of that
+symbol, so load_symbol_rows() - the scrapers' own per-symbol step, with
+MessageDedup, the study frame decoder and indicator_rows() - runs exactly as
+in the scrapers, just without a browser.
+"""
+import time
+from urllib.parse import parse_qs, urlparse
+
+from common.indicators import PIFAGOR_WIDTH
+from common.tv_frames import FRAME_MARKER, _as_text
+from common.ws_capture import TV_SOCKET_PREFIX, iter_ws_payloads, load_symbol_rows, reset_captured_requests
+
+
+class ReplayMessage:
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+class ReplayRequest:
+    __slots__ = ('id', 'url', 'ws_messages')
+
+    def __init__(self, request_id, payloads):
+        self.id = request_id
+        self.url = f'{TV_SOCKET_PREFIX}/websocket?from=chart'
+        self.ws_messages = [ReplayMessage(payload) for payload in payloads]
+
+
+class ReplayDriver:
+    """Minimal selenium-wire driver lookalike serving {symbol: [payload, ...]} recordings."""
+
+    def __init__(self, recordings):
+        self.recordings = recordings
+        self.scopes = []
+        self._requests = []
+        self._next_id = 0
+        self._url = None
+
+    @property
+    def requests(self):
+        # selenium-wire też zwraca nową listę przy każdym odczycie
+        return list(self._requests)
+
+    @requests.deleter
+    def requests(self):
+        self._requests = []
+
+    def get(self, url):
+        self._url = url
+        symbol = parse_qs(urlparse(url).query).get('symbol', [''])[0]
+        self._next_id += 1
+        self._requests.append(ReplayRequest(str(self._next_id), self.recordings.get(symbol, [])))
+
+    def refresh(self):
+        self.get(self._url)
+
+    def set_window_size(self, width, height):
+        pass
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+def process_symbol(driver, id_symbol, symbol, seen_messages, valid_indices, width=PIFAGOR_WIDTH, term='long',
+                   timeout=0.0):
+    """One scraper iteration without the DB: load_symbol_rows() as the scrapers call it.
+
+    Returns (frames_seen, rows) where rows are the insert tuples (empty list if no frame matched).
+    """
+    reset_captured_requests(driver)
+    rows = load_symbol_rows(driver, id_symbol, symbol, valid_indices, width, term, timeout=timeout, retries=0,
+                            seen_messages=seen_messages)
+    # Dwa markery na ramkę - licznik bez krojenia payloadu
+    frames_seen = sum(_as_text(payload).count(FRAME_MARKER) // 2 for payload in iter_ws_payloads(driver.requests))
+    return frames_seen, rows or []
+
+
+def replay(recordings, seen_messages, valid_indices, width=PIFAGOR_WIDTH, term='long', sink=None):
+    """Run process_symbol() over every recorded symbol; rows go to sink(id_symbol, rows) if given.
+
+    Returns a dict with symbols, frames, rows and elapsed seconds.
+    """
+    driver = ReplayDriver(recordings)
+    stats = {'symbols': 0, 'frames': 0, 'rows': 0}
+    started = time.perf_counter()
+    for id_symbol, symbol in enumerate(recordings, start=1):
+        frames, rows = process_symbol(driver, id_symbol, symbol, seen_messages, valid_indices, width, term)
+        stats['symbols'] += 1
+        stats['frames'] += frames
+        stats['rows'] += len(rows)
+        if sink is not None and rows:
+            sink(id_symbol, rows)
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
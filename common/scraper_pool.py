@@ -0,0 +1,154 @@
+"""Pool of headless browser workers scraping chart indicators in parallel.
+
+Each worker process owns one selenium-wire driver with its own copy of the
+Opera profile and its own interception scope. Workers pull (idSymbol, Symbol)
+tasks from a shared queue - in the order the DB returned them - and send the
+parsed rows back to the parent, which writes them through one batched writer.
+"""
+import logging
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import tempfile
+import time
+
+from common.indicators import PIFAGOR_WIDTH
+from common.ws_capture import limit_capture_to_tv_socket, load_symbol_rows, reset_captured_requests
+
+logger = logging.getLogger(__name__)
+
+
+def make_opera_driver(config, profile_path):
+    """Start a selenium-wire driver for Opera with the given user-data-dir."""
+    # Import lokalny - moduł ładuje się także tam, gdzie selenium nie jest zainstalowane
+    from seleniumwire import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    options = Options()
+    options.binary_location = config['opera_binary_path']
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-cache')
+    options.add_argument(f'--user-data-dir={profile_path}')
+    options.add_argument('--profile-directory=Default')
+    options.add_experimental_option('w3c', True)
+    options.add_argument('--disable-extensions')
+    if config.get('headless', True):
+        options.add_argument('--headless=new')
+    service = Service(executable_path=config['operadriver_path'])
+    driver = webdriver.Chrome(service=service, options=options)
+    window_size = config.get('window_size')
+    if window_size:
+        driver.set_window_size(*window_size)
+    limit_capture_to_tv_socket(driver)
+    return driver
+
+
+def copy_profile(profile_path, worker_no):
+    """Copy the logged-in browser profile so that workers do not share a locked user-data-dir."""
+    target = tempfile.mkdtemp(prefix=f'tv_worker_{worker_no}_')
+    shutil.copytree(profile_path, target, dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns('Singleton*', 'lockfile', 'Cache', 'Code Cache'))
+    return target
+
+
+def scrape_symbol(driver, id_symbol, symbol, config):
+    """Load one chart and return its indicator rows, or None if no matching study frame was captured."""
+    reset_captured_requests(driver)
+    return load_symbol_rows(driver, id_symbol, symbol, config['valid_indices'], config.get('width', PIFAGOR_WIDTH),
+                            config['term'], config.get('layout', 'long'),
+                            timeout=config.get('study_wait_timeout', 20),
+                            retries=config.get('study_wait_retries', 1))
+
+
+def _worker(worker_no, config, task_queue, result_queue):
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - W{worker_no} - %(levelname)s - %(message)s')
+    profile = None
+    driver = None
+    try:
+        profile = copy_profile(config['opera_profile_path'], worker_no)
+        driver = make_opera_driver(config, profile)
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            id_symbol, symbol = task
+            started = time.perf_counter()
+            try:
+                rows = scrape_symbol(driver, id_symbol, symbol, config)
+                error = None
+            except Exception as e:
+                rows, error = None, str(e)
+            result_queue.put((worker_no, id_symbol, symbol, rows, error, time.perf_counter() - started))
+    except Exception as e:
+        logger.error(f"Worker {worker_no} nie wystartował: {e}")
+        result_queue.put((worker_no, None, None, None, f'worker failed: {e}', 0.0))
+    finally:
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.error(f"Błąd zamykania WebDriver w workerze {worker_no}: {e}")
+        if profile is not None:
+            shutil.rmtree(profile, ignore_errors=True)
+
+
+def run_pool(symbols, config, writer, workers=4):
+    """Scrape (idSymbol, Symbol) pairs with `workers` browsers; rows go through `writer.add()`.
+
+    Returns a dict with counters and wall time.
+    """
+    ctx = mp.get_context('spawn')
+    task_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    for task in symbols:
+        task_queue.put(task)
+    for _ in range(workers):
+        task_queue.put(None)
+
+    processes = [ctx.Process(target=_worker, args=(n, config, task_queue, result_queue), daemon=True)
+                 for n in range(workers)]
+    started = time.perf_counter()
+    for p in processes:
+        p.start()
+
+    stats = {'ok': 0, 'missing': 0, 'errors': 0, 'rows': 0}
+    pending = len(symbols)
+    alive_workers = workers
+    while pending > 0 and alive_workers > 0:
+        try:
+            worker_no, id_symbol, symbol, rows, error, elapsed = result_queue.get(timeout=5)
+        except queue.Empty:
+            if not any(p.is_alive() for p in processes):
+                logger.error(f"Wszystkie workery zakończone, {pending} symboli nieprzetworzonych")
+                break
+            continue
+        if id_symbol is None:
+            # Worker padł przy starcie - jego zadania przejmą pozostałe
+            alive_workers -= 1
+            stats['errors'] += 1
+            logger.error(error)
+            continue
+        pending -= 1
+        if error:
+            stats['errors'] += 1
+            logger.error(f"[W{worker_no}] {symbol}: {error}")
+        elif not rows:
+            stats['missing'] += 1
+            logger.warning(f"[W{worker_no}] {symbol}: brak ramki du z danymi study ({elapsed:.1f}s)")
+        else:
+            writer.add(id_symbol, rows)
+            stats['ok'] += 1
+            stats['rows'] += len(rows)
+            logger.info(f"[W{worker_no}] {symbol}: {len(rows)} wierszy w {elapsed:.1f}s")
+    writer.flush()
+
+    for p in processes:
+        p.join(timeout=30)
+    stats['wall_time'] = time.perf_counter() - started
+    done = stats['ok'] + stats['missing']
+    stats['symbols_per_minute'] = 60 * done / stats['wall_time'] if stats['wall_time'] > 0 else 0.0
+    return stats
@@ -0,0 +1,87 @@
+"""Push notification of symbols due for a state check: Postgres LISTEN/NOTIFY on requestStateCheck.
+
+A trigger on the symbols table (notify_trigger_sql(), installed by
+create_state_notify.py) sends pg_notify(CHANNEL, '{"table": ..., "id": ...}')
+whenever a row is written with "requestStateCheck" = TRUE - the short-term
+scraper sets it after every upload of indicators. The notification is
+delivered at COMMIT, so the indicators are already visible to a listener.
+
+api/main.py streams them as server-sent events; read_events() parses that
+stream on the worker side.
+"""
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'request_state_check'
+FUNCTION = 'notify_request_state_check'
+
+
+def trigger_name(table):
+    return f'{table}_requestStateCheck_notify'
+
+
+def notify_function_sql():
+    return f"""
+CREATE OR REPLACE FUNCTION public.{FUNCTION}() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{CHANNEL}', json_build_object('table', TG_TABLE_NAME, 'id', NEW.id)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def notify_trigger_sql(table):
+    """Trigger firing on every INSERT and every UPDATE that sets "requestStateCheck" (also TRUE -> TRUE)."""
+    name = trigger_name(table)
+    return f"""
+DROP TRIGGER IF EXISTS "{name}" ON public."{table}";
+CREATE TRIGGER "{name}"
+AFTER INSERT OR UPDATE OF "requestStateCheck" ON public."{table}"
+FOR EACH ROW WHEN (NEW."requestStateCheck")
+EXECUTE FUNCTION public.{FUNCTION}()
+"""
+
+
+def listen(dsn):
+    """New autocommit psycopg2 connection listening on CHANNEL (a pooled connection would lose the LISTEN)."""
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f'LISTEN {CHANNEL}')
+    return conn
+
+
+def drain(conn, table):
+    """idSymbols of table from all notifications received by conn, in order, without duplicates."""
+    conn.poll()
+    ids = []
+    while conn.notifies:
+        notify = conn.notifies.pop(0)
+        try:
+            payload = json.loads(notify.payload)
+        except ValueError:
+            logger.warning(f"Unexpected {CHANNEL} payload: {notify.payload}")
+            continue
+        if payload.get('table') == table and payload['id'] not in ids:
+            ids.append(payload['id'])
+    return ids
+
+
+def read_events(lines):
+    """Server-sent events of an iterable of text lines: yields the data of each event, None for a keepalive comment."""
+    data = []
+    for line in lines:
+        if line is None:
+            continue
+        if line.startswith(':'):
+            yield None
+        elif line.startswith('data:'):
+            data.append(line[5:].lstrip())
+        elif not line and data:
+            yield json.loads('\n'.join(data))
+            data = []
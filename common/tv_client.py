@@ -0,0 +1,322 @@
+"""Browserless asyncio client for TradingView chart sessions.
+
+Speaks the same `~m~`-framed socket.io protocol the chart page uses: one
+websocket carries many chart sessions, each of which resolves a symbol,
+creates a series and a study and receives the study rows in `du` frames.
+The rows are the same `st` lists the selenium-wire scrapers sniff, so they go
+straight into common.indicators.indicator_rows() and the existing writers.
+"""
+import asyncio
+import json
+import logging
+import random
+import string
+
+from common.tv_frames import encode_frame, iter_frames
+
+logger = logging.getLogger(__name__)
+
+TV_WS_URL = 'wss://prodata.tradingview.com/socket.io/websocket'
+TV_ORIGIN = 'https://www.tradingview.com'
+PINE_FACADE_URL = 'https://pine-facade.tradingview.com/pine-facade/translate/{pine_id}/{version}'
+UNAUTHORIZED_TOKEN = 'unauthorized_user_token'
+STUDY_SCRIPT_ID = 'Script@tv-scripting-101!'
+# Wiadomości, po których sesja wykresu nie dostanie już danych
+SESSION_ERRORS = ('symbol_error', 'series_error', 'study_error', 'critical_error', 'protocol_error')
+# Pola sesji notowań: ostatnia cena i jej czas, skumulowany wolumen dnia
+QUOTE_FIELDS = ('lp', 'lp_time', 'volume', 'open_price', 'high_price', 'low_price', 'prev_close_price')
+
+
+class TradingViewError(Exception):
+    """Error reported by the server for a chart session (unknown symbol, study error...)."""
+
+
+def session_id(prefix):
+    return prefix + '_' + ''.join(random.choices(string.ascii_lowercase + string.digits, k=12))
+
+
+def fetch_study_inputs(pine_id, version='last', session_cookie=None):
+    """Build create_study inputs of a Pine script from the pine-facade translation (blocking HTTP)."""
+    import requests
+
+    cookies = {'sessionid': session_cookie} if session_cookie else None
+    response = requests.get(PINE_FACADE_URL.format(pine_id=pine_id.replace(';', '%3B'), version=version),
+                            cookies=cookies, headers={'Origin': TV_ORIGIN}, timeout=20)
+    response.raise_for_status()
+    body = response.json()
+    if not body.get('success'):
+        raise TradingViewError(f"pine-facade: {body.get('reason', body)}")
+    result = body['result']
+    meta = result['metaInfo']
+    inputs = {
+        'text': result['ilTemplate'],
+        'pineId': meta.get('scriptIdPart', pine_id),
+        'pineVersion': meta.get('pine', {}).get('version', version),
+    }
+    for item in meta.get('inputs', []):
+        if item['id'] in ('text', 'pineId', 'pineVersion'):
+            continue
+        inputs[item['id']] = {'v': item.get('defval'), 'f': True, 't': item.get('type')}
+    return inputs
+
+
+def study_rows_of_width(data, width):
+    """`st` rows of the first study in a du/timescale_update message whose rows carry `width` values."""
+    params = data.get('p')
+    if not isinstance(params, list) or len(params) < 2 or not isinstance(params[1], dict):
+        return None
+    for item in params[1].values():
+        st_data = item.get('st') if isinstance(item, dict) else None
+        if st_data and any(len(row.get('v', [])) == width for row in st_data):
+            return st_data
+    return None
+
+
+class TradingViewClient:
+    """One websocket connection multiplexing chart sessions.
+
+        async with TradingViewClient(auth_token=token) as client:
+            st_data = await client.fetch_study_rows('NASDAQ:AAPL', inputs, width=37)
+    """
+
+    def __init__(self, url=TV_WS_URL, auth_token=UNAUTHORIZED_TOKEN, origin=TV_ORIGIN, open_timeout=20):
+        self.url = url
+        self.auth_token = auth_token
+        self.origin = origin
+        self.open_timeout = open_timeout
+        self._ws = None
+        self._reader = None
+        self._sessions = {}
+        self.frames_received = 0
+
+    async def connect(self):
+        # Import lokalny - moduł ładuje się także tam, gdzie websockets nie jest zainstalowane
+        import websockets
+
+        self._ws = await websockets.connect(self.url, origin=self.origin, max_size=None,
+                                           open_timeout=self.open_timeout)
+        self._reader = asyncio.create_task(self._read_loop())
+        await self.send('set_auth_token', [self.auth_token])
+        return self
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            try:
+                await self._reader
+            except Exception as e:
+                logger.debug(f"Reader zakończony błędem: {e}")
+        self._ws = None
+        self._reader = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def closed(self):
+        return self._reader is None or self._reader.done()
+
+    async def send(self, method, params):
+        await self._ws.send(encode_frame({'m': method, 'p': params}))
+
+    async def _read_loop(self):
+        try:
+            async for message in self._ws:
+                for body in iter_frames(message):
+                    self.frames_received += 1
+                    if body.startswith('~h~'):
+                        # Heartbeat - serwer rozłącza klienta, który go nie odeśle
+                        await self._ws.send(encode_frame(body))
+                        continue
+                    if not body.startswith('{"m":'):
+                        continue
+                    try:
+                        data = json.loads(body)
+                    except json.JSONDecodeError:
+                        continue
+                    params = data.get('p')
+                    if isinstance(params, list) and params and params[0] in self._sessions:
+                        self._sessions[params[0]].put_nowait(data)
+        finally:
+            # Połączenie zamknięte - obudź wszystkie czekające sesje
+            for session_queue in self._sessions.values():
+                session_queue.put_nowait(None)
+
+    async def fetch_study_rows(self, symbol, study_inputs, width=37, method='du', interval='1D', bars=300,
+                               timeout=20, min_rows=0):
+        """Open a chart session for `symbol`, add the study and return its first `st` rows of `width` values.
+
+        Returns None on timeout, raises TradingViewError when the server rejects
+        the symbol or the study and ConnectionError when the socket closes.
+        """
+        if self.closed:
+            raise ConnectionError('TradingView socket is closed')
+        cs = session_id('cs')
+        session_queue = asyncio.Queue()
+        self._sessions[cs] = session_queue
+        try:
+            await self.send('chart_create_session', [cs, ''])
+            await self.send('resolve_symbol', [cs, 'sds_sym_1',
+                                               '=' + json.dumps({'symbol': symbol, 'adjustment': 'splits'})])
+            await self.send('create_series', [cs, 'sds_1', 's1', 'sds_sym_1', interval, bars, ''])
+            await self.send('create_study', [cs, 'st1', 'st1', 'sds_1', STUDY_SCRIPT_ID, study_inputs])
+            return await asyncio.wait_for(self._wait_rows(session_queue, width, method, min_rows), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            del self._sessions[cs]
+            if not self.closed:
+                try:
+                    await self.send('chart_delete_session', [cs])
+                except Exception as e:
+                    logger.debug(f"chart_delete_session {cs}: {e}")
+
+    def quote_session(self, fields=QUOTE_FIELDS):
+        """New QuoteSession on this socket; open it with `await session.open()`."""
+        return QuoteSession(self, fields)
+
+    @staticmethod
+    async def _wait_rows(session_queue, width, method, min_rows):
+        while True:
+            data = await session_queue.get()
+            if data is None:
+                raise ConnectionError('TradingView socket closed while waiting for study data')
+            m = data.get('m')
+            if m in SESSION_ERRORS:
+                raise TradingViewError(f"{m}: {data.get('p')[1:]}")
+            if m != method:
+                continue
+            st_data = study_rows_of_width(data, width)
+            if st_data and len(st_data) >= min_rows:
+                return st_data
+
+
+class QuoteSession:
+    """One quote session streaming `qsd` updates for many symbols over the client's socket.
+
+        session = await client.quote_session().open()
+        await session.add_symbols(['NASDAQ:AAPL', 'NYSE:IBM'])
+        async for symbol, status, values in session.updates():
+            ...
+
+    `values` holds only the fields that changed since the previous update.
+    """
+
+    def __init__(self, client, fields=QUOTE_FIELDS, chunk_size=100):
+        self.client = client
+        self.fields = list(fields)
+        self.chunk_size = chunk_size
+        self.id = session_id('qs')
+        self.symbols = set()
+        self._queue = asyncio.Queue()
+
+    async def open(self):
+        if self.client.closed:
+            raise ConnectionError('TradingView socket is closed')
+        self.client._sessions[self.id] = self._queue
+        await self.client.send('quote_create_session', [self.id])
+        await self.client.send('quote_set_fields', [self.id, *self.fields])
+        return self
+
+    async def add_symbols(self, symbols):
+        symbols = [symbol for symbol in symbols if symbol not in self.symbols]
+        for start in range(0, len(symbols), self.chunk_size):
+            await self.client.send('quote_add_symbols', [self.id, *symbols[start:start + self.chunk_size]])
+        self.symbols.update(symbols)
+
+    async def remove_symbols(self, symbols):
+        symbols = [symbol for symbol in symbols if symbol in self.symbols]
+        for start in range(0, len(symbols), self.chunk_size):
+            await self.client.send('quote_remove_symbols', [self.id, *symbols[start:start + self.chunk_size]])
+        self.symbols.difference_update(symbols)
+
+    async def updates(self, timeout=None):
+        """Yield (symbol, status, values) per qsd message; ConnectionError when the socket closes.
+
+        With a timeout, (None, None, None) is yielded whenever nothing arrived
+        for `timeout` seconds, so the caller can flush or refresh on a quiet socket.
+        """
+        while True:
+            try:
+                data = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield None, None, None
+                continue
+            if data is None:
+                raise ConnectionError('TradingView socket closed during the quote session')
+            if data.get('m') != 'qsd':
+                continue
+            item = data['p'][1] if len(data['p']) > 1 and isinstance(data['p'][1], dict) else {}
+            if 'n' in item:
+                yield item['n'], item.get('s'), item.get('v', {})
+
+    async def close(self):
+        self.client._sessions.pop(self.id, None)
+        if not self.client.closed:
+            try:
+                await self.client.send('quote_delete_session', [self.id])
+            except Exception as e:
+                logger.debug(f"quote_delete_session {self.id}: {e}")
+
+
+async def fetch_symbols_concurrently(symbols, study_inputs, connections=4, sessions_per_connection=8,
+                                     client_factory=TradingViewClient, **fetch_kwargs):
+    """Yield (idSymbol, Symbol, st_data or None, error or None) for (idSymbol, Symbol) pairs as they finish.
+
+    Symbols are handed out in the given order to `connections` sockets with at
+    most `sessions_per_connection` chart sessions open on each at a time.
+    A symbol whose socket drops goes back to the queue for another connection.
+    """
+    # Import lokalny jak w TradingViewClient.connect - send() na zamkniętym gnieździe rzuca ConnectionClosed
+    from websockets.exceptions import ConnectionClosed
+
+    pending = asyncio.Queue()
+    for task in symbols:
+        pending.put_nowait(task)
+    results = asyncio.Queue()
+
+    async def session_worker(client):
+        while True:
+            try:
+                id_symbol, symbol = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                st_data = await client.fetch_study_rows(symbol, study_inputs, **fetch_kwargs)
+                await results.put((id_symbol, symbol, st_data, None))
+            except (ConnectionError, ConnectionClosed) as e:
+                # Symbol wraca do kolejki, obsłuży go inne połączenie
+                pending.put_nowait((id_symbol, symbol))
+                logger.error(f"{symbol}: {e}")
+                return
+            except Exception as e:
+                await results.put((id_symbol, symbol, None, str(e)))
+
+    async def connection_worker(no):
+        try:
+            async with client_factory() as client:
+                await asyncio.gather(*(session_worker(client) for _ in range(sessions_per_connection)))
+        except Exception as e:
+            logger.error(f"Połączenie {no}: {e}")
+
+    async def run_all():
+        await asyncio.gather(*(connection_worker(no) for no in range(connections)))
+        await results.put(None)
+
+    runner = asyncio.create_task(run_all())
+    try:
+        while True:
+            item = await results.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        await runner
+    # Symbole, których nie obsłużyło żadne połączenie
+    while not pending.empty():
+        id_symbol, symbol = pending.get_nowait()
+        yield id_symbol, symbol, None, 'no live connection'
@@ -0,0 +1,107 @@
+"""Decoder for TradingView socket.io `~m~<len>~m~<json>` websocket frames."""
+import json
+
+FRAME_MARKER = '~m~'
+MARKER_LEN = len(FRAME_MARKER)
+
+
+def _as_text(payload):
+    """Return the payload as str (selenium-wire may hand out bytes for binary messages)."""
+    if isinstance(payload, (bytes, bytearray)):
+        return payload.decode('utf-8', errors='replace')
+    return payload
+
+
+def encode_frame(body):
+    """Wrap a message body (str or JSON-serialisable object) into a `~m~<len>~m~` frame."""
+    if not isinstance(body, str):
+        body = json.dumps(body, separators=(',', ':'))
+    return f'{FRAME_MARKER}{len(body)}{FRAME_MARKER}{body}'
+
+
+def iter_frames(payload, prefix=None):
+    """Yield frame bodies of a payload walking it once by length prefix.
+
+    When prefix is given only bodies starting with it are sliced out, so
+    heartbeats and unrelated messages cost a single startswith().
+    """
+    payload = _as_text(payload)
+    if not payload:
+        return
+    end = len(payload)
+    pos = 0
+    while pos < end:
+        start = payload.find(FRAME_MARKER, pos)
+        if start < 0:
+            return
+        len_start = start + MARKER_LEN
+        len_end = payload.find(FRAME_MARKER, len_start)
+        if len_end < 0:
+            return
+        length_str = payload[len_start:len_end]
+        if not length_str.isdigit():
+            # Nie jest to nagłówek ramki - szukaj dalej od drugiego markera
+            pos = len_end
+            continue
+        body_start = len_end + MARKER_LEN
+        body_end = body_start + int(length_str)
+        if body_end > end:
+            # Ucięta ramka (niepełny payload)
+            return
+        if prefix is None or payload.startswith(prefix, body_start):
+            yield payload[body_start:body_end]
+        pos = body_end
+
+
+class StudyFrame:
+    """Single study message (`du` / `timescale_update`) decoded lazily on first access."""
+
+    __slots__ = ('raw', '_data')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._data = None
+
+    @property
+    def data(self):
+        """Parsed JSON body; raises json.JSONDecodeError on malformed frames."""
+        if self._data is None:
+            self._data = json.loads(self.raw)
+        return self._data
+
+    @property
+    def method(self):
+        return self.data.get('m')
+
+    def series(self):
+        """Return the `st` rows of the first series in the frame (KeyError/IndexError on bad structure)."""
+        series_map = self.data['p'][1]
+        for key in series_map:
+            return series_map[key].get('st', [])
+        raise IndexError('empty series map')
+
+    def has_rows_of_width(self, width):
+        """True if any `st` row carries exactly `width` values (37 - Pifagor, 9 - divergence)."""
+        return any(len(item.get('v', [])) == width for item in self.series())
+
+
+def study_prefix(method='du'):
+    """Frame body prefix of a chart session study message for the given method."""
+    return '{"m":"%s","p":["cs' % method
+
+
+def iter_study_frames(payload, method='du'):
+    """Yield StudyFrame objects for chart-session messages of the given method only."""
+    for raw in iter_frames(payload, study_prefix(method)):
+        yield StudyFrame(raw)
+
+
+def find_study_rows(payload, width, method='du'):
+    """Return the `st` rows of the first frame with rows of `width` values, or None."""
+    for frame in iter_study_frames(payload, method):
+        try:
+            if frame.has_rows_of_width(width):
+                return frame.series()
+        except (json.JSONDecodeError, KeyError, IndexError, AttributeError):
+            continue
+    return None
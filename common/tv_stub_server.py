@@ -0,0 +1,208 @@
+"""Local stand-in for the TradingView data socket, replaying recorded frames to common.tv_client.
+
+Recordings are a common.capture .jsonl.gz file or a JSON file
+{"NASDAQ:AAPL": ["~m~..~m~{...}", ...], ...} with the raw websocket payloads
+of each symbol. Chart session ids in the frames are
+rewritten to the client's one, everything else goes out unchanged.
+Quote sessions get a synthetic random-walk `qsd` tick per symbol every
+`quote_interval` seconds.
+
+Uruchomienie:
+    python3 -m common.tv_stub_server capture.jsonl.gz --port 8765
+    python3 -m common.tv_stub_server --synthetic NYSE:A NYSE:B
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+from common.capture import load_capture
+from common.tv_frames import encode_frame, iter_frames
+
+logger = logging.getLogger(__name__)
+
+
+def load_recordings(path):
+    if path.endswith('.gz'):
+        return load_capture(path)
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def synthetic_payloads(symbol, bars=300, width=37, seed=None):
+    """Payloads with one `du` study frame shaped like a captured create_series session (random values).
+
+    Bars are numbered from the start of the series (0 .. bars-1), as the data
+    socket sends them; common.indicators.series_study_rows() maps them to TickerRelative.
+    """
+    rng = random.Random(seed if seed is not None else symbol)
+    rows = [{'i': i, 'v': [round(rng.uniform(-50, 50), 4) for _ in range(width)]} for i in range(bars)]
+    du = {'m': 'du', 'p': ['cs_recorded', {'st9': {'st': rows, 'ns': {'d': '', 'indexes': 'nochange'}}}]}
+    completed = {'m': 'study_completed', 'p': ['cs_recorded', 'st9', 'st9_1']}
+    return [encode_frame(du) + encode_frame(completed)]
+
+
+def rewrite_session(payload, session):
+    """Re-encode frames of a recorded payload with chart session ids replaced by `session`."""
+    frames = []
+    for body in iter_frames(payload):
+        start = body.find('"p":["cs_') if body.startswith('{"m":') else -1
+        if start >= 0:
+            # Podmiana w tekście - bez json.loads/dumps całej ramki z setkami barów
+            start += len('"p":["')
+            end = body.find('"', start)
+            body = body[:start] + session + body[end:]
+        frames.append(encode_frame(body))
+    return ''.join(frames)
+
+
+class StubTradingViewServer:
+    """Websocket server answering chart sessions from recordings.
+
+    `delay` (seconds) is added before the study frames to imitate server-side
+    computation of the script.
+    """
+
+    def __init__(self, recordings, host='127.0.0.1', port=8765, delay=0.0, heartbeat_interval=10,
+                 quote_interval=1.0):
+        self.recordings = recordings
+        self.quote_interval = quote_interval
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.heartbeat_interval = heartbeat_interval
+        self.sessions_served = 0
+        self._server = None
+
+    @property
+    def url(self):
+        return f'ws://{self.host}:{self.port}/socket.io/websocket'
+
+    async def start(self):
+        import websockets
+
+        self._server = await websockets.serve(self._handle, self.host, self.port, max_size=None, compression=None)
+        if self.port == 0:
+            self.port = next(iter(self._server.sockets)).getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def _handle(self, ws, path=None):
+        await ws.send(encode_frame({'session_id': f'stub_{id(ws)}', 'timestamp': int(time.time()),
+                                    'release': 'stub', 'protocol': 'json'}))
+        heartbeat = asyncio.create_task(self._heartbeat(ws))
+        symbols = {}
+        quotes = {}
+        try:
+            async for message in ws:
+                for body in iter_frames(message):
+                    if not body.startswith('{'):
+                        continue
+                    data = json.loads(body)
+                    m, params = data.get('m'), data.get('p', [])
+                    if m == 'resolve_symbol':
+                        symbol = json.loads(params[2].lstrip('='))['symbol']
+                        symbols[params[0]] = symbol
+                        if symbol in self.recordings:
+                            await ws.send(encode_frame({'m': 'symbol_resolved', 'p': [
+                                params[0], params[1], {'pro_name': symbol, 'name': symbol.split(':')[-1]}]}))
+                        else:
+                            await ws.send(encode_frame({'m': 'symbol_error', 'p': [
+                                params[0], params[1], 'invalid symbol']}))
+                    elif m == 'create_study':
+                        symbol = symbols.get(params[0])
+                        if symbol not in self.recordings:
+                            continue
+                        asyncio.create_task(self._send_study(ws, params[0], symbol))
+                    elif m == 'chart_delete_session':
+                        symbols.pop(params[0], None)
+                    elif m == 'quote_create_session':
+                        quotes[params[0]] = {}
+                        asyncio.create_task(self._send_quotes(ws, params[0], quotes))
+                    elif m == 'quote_add_symbols' and params[0] in quotes:
+                        for symbol in params[1:]:
+                            if symbol in self.recordings:
+                                quotes[params[0]][symbol] = {'lp': 100.0, 'volume': 0}
+                            else:
+                                await ws.send(encode_frame({'m': 'qsd', 'p': [
+                                    params[0], {'n': symbol, 's': 'error', 'v': {}}]}))
+                    elif m == 'quote_remove_symbols' and params[0] in quotes:
+                        for symbol in params[1:]:
+                            quotes[params[0]].pop(symbol, None)
+                    elif m == 'quote_delete_session':
+                        quotes.pop(params[0], None)
+        except Exception as e:
+            logger.debug(f"Stub: połączenie zamknięte: {e}")
+        finally:
+            heartbeat.cancel()
+            quotes.clear()
+
+    async def _send_study(self, ws, session, symbol):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        for payload in self.recordings[symbol]:
+            await ws.send(rewrite_session(payload, session))
+        self.sessions_served += 1
+
+    async def _send_quotes(self, ws, session, quotes):
+        rng = random.Random(session)
+        while session in quotes:
+            now = int(time.time())
+            frames = []
+            for symbol, quote in list(quotes[session].items()):
+                quote['lp'] = round(quote['lp'] * (1 + rng.uniform(-0.002, 0.002)), 4)
+                quote['volume'] += rng.randint(0, 500)
+                frames.append(encode_frame({'m': 'qsd', 'p': [session, {'n': symbol, 's': 'ok', 'v': {
+                    'lp': quote['lp'], 'lp_time': now, 'volume': quote['volume']}}]}))
+            try:
+                if frames:
+                    await ws.send(''.join(frames))
+            except Exception:
+                return
+            await asyncio.sleep(self.quote_interval)
+
+    async def _heartbeat(self, ws):
+        n = 0
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            n += 1
+            await ws.send(encode_frame(f'~h~{n}'))
+
+
+async def serve_forever(server):
+    async with server:
+        logger.info(f"Stub TradingView na {server.url} ({len(server.recordings)} symboli)")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recordings', nargs='?', help='capture .jsonl.gz or JSON {symbol: [payload, ...]}')
+    parser.add_argument('--synthetic', nargs='*', default=[], metavar='SYMBOL')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    recordings = load_recordings(args.recordings) if args.recordings else {}
+    for symbol in args.synthetic:
+        recordings[symbol] = synthetic_payloads(symbol)
+    asyncio.run(serve_forever(StubTradingViewServer(recordings, args.host, args.port, args.delay)))
+
+
+if __name__ == "__main__":
+    main()
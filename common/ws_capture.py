@@ -0,0 +1,157 @@
+"""Helpers around selenium-wire websocket capture shared by the chart scrapers."""
+import os
+import time
+
+from common.dated_tables import dated_indicator_rows
+from common.indicators import indicator_rows, PIFAGOR_WIDTH
+from common.tv_frames import find_study_rows, iter_frames
+
+CHART_URL = 'https://www.tradingview.com/chart/?symbol={symbol}'
+TV_SOCKET_PREFIX = 'wss://prodata.tradingview.com/socket.io'
+# selenium-wire przechowuje tylko requesty pasujące do scope - reszta (skrypty, obrazki) nie trafia do pamięci
+TV_SOCKET_SCOPE = r'.*prodata\.tradingview\.com/socket\.io.*'
+
+
+def limit_capture_to_tv_socket(driver):
+    """Make selenium-wire store only the TradingView data socket requests."""
+    driver.scopes = [TV_SOCKET_SCOPE]
+
+
+def reset_captured_requests(driver):
+    """Drop every request (and its ws_messages) selenium-wire has stored so far."""
+    del driver.requests
+
+
+def tv_socket_requests(requests):
+    return [r for r in requests if r.url.lower().startswith(TV_SOCKET_PREFIX)]
+
+
+def iter_ws_payloads(requests):
+    """Yield raw payloads of all messages captured on the TradingView data socket."""
+    for request in tv_socket_requests(requests):
+        for msg in getattr(request, 'ws_messages', ()):
+            payload = msg.data if hasattr(msg, 'data') else str(msg)
+            if payload:
+                yield payload
+
+
+def _symbol_state(payload, symbol):
+    """True/False if the payload resolves the chart to `symbol` / to another symbol, None if it says nothing."""
+    state = None
+    for raw in iter_frames(payload, '{"m":"symbol_resolved"'):
+        if f'"{symbol}"' in raw:
+            return True
+        state = False
+    return state
+
+
+def wait_for_study_rows(driver, width=37, method='du', symbol=None, timeout=20, poll_interval=0.1,
+                        min_rows=0, start_index=0, seen_messages=None, max_poll_interval=0.8):
+    """Block until a study frame with rows of `width` values arrives; return its `st` rows or None on timeout.
+
+    Only requests from driver.requests[start_index:] are considered and every
+    message is inspected once. Each driver.requests read reloads selenium-wire's
+    storage, so the poll interval doubles from `poll_interval` up to
+    `max_poll_interval`. With `symbol` given, frames from a socket that resolved
+    a different symbol are ignored; payloads already in `seen_messages` are skipped.
+    """
+    deadline = time.monotonic() + timeout
+    scanned = {}
+    resolved = {}
+    while True:
+        for request in tv_socket_requests(driver.requests[start_index:]):
+            messages = getattr(request, 'ws_messages', None) or []
+            first = scanned.get(request.id, 0)
+            scanned[request.id] = len(messages)
+            for msg in messages[first:]:
+                payload = msg.data if hasattr(msg, 'data') else str(msg)
+                if not payload:
+                    continue
+                if symbol is not None and resolved.get(request.id) is not True:
+                    state = _symbol_state(payload, symbol)
+                    if state is not None:
+                        resolved[request.id] = state
+                if seen_messages is not None:
+                    if payload in seen_messages:
+                        continue
+                    seen_messages.add(payload)
+                st_data = find_study_rows(payload, width, method)
+                if st_data and len(st_data) >= min_rows and resolved.get(request.id) is not False:
+                    return st_data
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(poll_interval, remaining))
+        poll_interval = min(poll_interval * 2, max_poll_interval)
+
+
+def load_chart_and_wait(driver, url, width=37, method='du', symbol=None, timeout=20, retries=1,
+                        min_rows=0, start_index=0, seen_messages=None):
+    """driver.get(url) and wait for the study frame, reloading the chart up to `retries` times."""
+    for attempt in range(retries + 1):
+        if attempt == 0:
+            driver.get(url)
+        else:
+            driver.refresh()
+        st_data = wait_for_study_rows(driver, width, method, symbol, timeout, min_rows=min_rows,
+                                      start_index=start_index, seen_messages=seen_messages)
+        if st_data is not None:
+            return st_data
+    return None
+
+
+def load_symbol_rows(driver, id_symbol, symbol, valid_indices, width=PIFAGOR_WIDTH, term='long', layout='long',
+                     timeout=20, retries=1, start_index=0, seen_messages=None):
+    """One scraper iteration: load the chart of `symbol`, wait for its study frame and flatten it into rows.
+
+    Returns indicator_rows() tuples (dated_indicator_rows() with layout 'dated'),
+    or None if no matching frame arrived. Shared by the scrapers, the scraper
+    pool and common.replay.
+    """
+    st_data = load_chart_and_wait(driver, CHART_URL.format(symbol=symbol), width=width, symbol=symbol,
+                                  timeout=timeout, retries=retries, start_index=start_index,
+                                  seen_messages=seen_messages)
+    if not st_data:
+        return None
+    if layout == 'dated':
+        return dated_indicator_rows(id_symbol, st_data, valid_indices, width, term)
+    return indicator_rows(id_symbol, st_data, valid_indices, width, term)
+
+
+class ScrapeTimer:
+    """Per-symbol wall time and running average.
+
+    The counters are mirrored in environment variables so that they survive an
+    os.execv restart - the average then includes the restart overhead, which
+    makes the restart mode and the long-lived mode directly comparable.
+    """
+
+    def __init__(self, env_prefix='TV_SCRAPER'):
+        self.env_prefix = env_prefix
+        self.started_at = float(os.environ.get(f'{env_prefix}_STARTED_AT', time.time()))
+        self.symbols_done = int(os.environ.get(f'{env_prefix}_SYMBOLS_DONE', 0))
+        self._symbol_started = None
+        self.last_elapsed = 0.0
+
+    def start_symbol(self):
+        self._symbol_started = time.perf_counter()
+
+    def finish_symbol(self):
+        self.last_elapsed = time.perf_counter() - self._symbol_started if self._symbol_started else 0.0
+        self.symbols_done += 1
+        return self.last_elapsed
+
+    def average(self):
+        """Average wall time per symbol since the first start, restarts included."""
+        if self.symbols_done == 0:
+            return 0.0
+        return (time.time() - self.started_at) / self.symbols_done
+
+    def persist(self):
+        """Store counters in the environment before os.execv."""
+        os.environ[f'{self.env_prefix}_STARTED_AT'] = str(self.started_at)
+        os.environ[f'{self.env_prefix}_SYMBOLS_DONE'] = str(self.symbols_done)
+
+    def summary(self):
+        return (f"czas symbolu {self.last_elapsed:.2f}s, średnio {self.average():.2f}s/symbol "
+                f"({self.symbols_done} symboli)")
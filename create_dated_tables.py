@@ -0,0 +1,73 @@
+"""Create the bar-date keyed tables (common.dated_tables) and their TickerRelative views.
+
+Tworzy tabele <tabela>_Dated dla cen i wskaźników Pifagor oraz widoki
+<tabela>_Dated_Relative, które wyliczają TickerRelative z daty baru tak jak
+dotychczas zapisywały go loadery (tStock_Prices: najnowszy bar = 1,
+tCrypto_Prices i wskaźniki: najnowszy bar = 0). Istniejące tabele nie są
+zmieniane; tabele _Dated wypełniają się przy kolejnym przebiegu loaderów
+i scraperów po ustawieniu PRICE_STORAGE = 'dated' (common.dated_tables) /
+INDICATOR_LAYOUT = 'dated' (common.indicator_tables). Te same ustawienia
+przełączają czytelników (stock_main.py, backtest) na widoki _Dated_Relative.
+
+Uruchomienie:
+    python3 create_dated_tables.py
+"""
+import logging
+import psycopg2
+
+from common.dated_tables import NEWEST_TICKER_RELATIVE, PRICE_COLUMNS, create_dated_indicators_sql, \
+    create_dated_prices_sql, relative_view_name, relative_view_sql
+from common.indicator_tables import wide_columns
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Parametry połączenia z bazą danych PostgreSQL
+db_params = {
+    'dbname': 'TradingView',
+    'user': 'postgres',
+    'password': 'postgres',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+STOCK_INDICES = [5, 7, 22, 24]
+CRYPTO_INDICES = [5, 6, 7, 8, 9, 11, 13, 15, 17, 19, 22, 24, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36]
+INDICATOR_TABLES = {
+    'tStock_IndicatorValues_Pifagor_Long': STOCK_INDICES,
+    'tStock_IndicatorValues_Pifagor_Short': STOCK_INDICES,
+    'tCrypto_IndicatorValues_Pifagor_Long': CRYPTO_INDICES,
+}
+
+
+def main():
+    conn = psycopg2.connect(**db_params)
+    cursor = conn.cursor()
+    try:
+        for table, newest in NEWEST_TICKER_RELATIVE.items():
+            cursor.execute(create_dated_prices_sql(table))
+            cursor.execute(relative_view_sql(table, PRICE_COLUMNS, newest))
+            logger.info(f"Utworzono {relative_view_name(table)} (najnowszy bar = {newest})")
+        for table, indices in INDICATOR_TABLES.items():
+            cursor.execute(create_dated_indicators_sql(table, indices))
+            cursor.execute(relative_view_sql(table, wide_columns(indices)))
+            logger.info(f"Utworzono {relative_view_name(table)} ({len(indices)} indeksów)")
+        conn.commit()
+    except psycopg2.Error as error:
+        conn.rollback()
+        logger.error(f"Błąd tworzenia tabel _Dated: {error}")
+        raise SystemExit(1)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
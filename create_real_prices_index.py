@@ -0,0 +1,58 @@
+"""Create the unique ("idSymbol") index the *_PricesReal upserts (common.quote_service) rely on.
+
+INSERT ... ON CONFLICT ("idSymbol") w stock_get_real_prices.py,
+stock_quote_service.py, common/live_sources.py i api/main.py wymaga
+unikalnego indeksu, a tabele powstały bez niego. Indeks zakładany jest raz
+tym skryptem, a nie przy każdym zapisie cen. Jeśli tabela ma już zdublowane
+idSymbol, utworzenie indeksu się nie powiedzie - duplikaty trzeba najpierw
+usunąć. Skrypt można uruchamiać wielokrotnie (IF NOT EXISTS).
+
+Uruchomienie:
+    python3 create_real_prices_index.py
+"""
+import logging
+import psycopg2
+
+from common.quote_service import unique_index_sql
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Parametry połączenia z bazą danych PostgreSQL
+db_params = {
+    'dbname': 'TradingView',
+    'user': 'postgres',
+    'password': 'postgres',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+PRICES_REAL_TABLES = ['tStock_PricesReal', '1DtStock_PricesReal', '1DtCrypto_PricesReal']
+
+
+def main():
+    conn = psycopg2.connect(**db_params)
+    cursor = conn.cursor()
+    try:
+        for table in PRICES_REAL_TABLES:
+            cursor.execute(unique_index_sql(table))
+            logger.info(f"Utworzono indeks {table}_idSymbol_key")
+        conn.commit()
+    except psycopg2.Error as error:
+        conn.rollback()
+        logger.error(f"Błąd tworzenia indeksów idSymbol tabel *_PricesReal: {error}")
+        raise SystemExit(1)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
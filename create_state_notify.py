@@ -0,0 +1,57 @@
+"""Install the requestStateCheck NOTIFY trigger (common.state_notify) on the symbols tables of api/main.py.
+
+Po instalacji każde ustawienie "requestStateCheck" = TRUE (upload wskaźników
+short przez API) wysyła powiadomienie na kanale request_state_check, które
+api/main.py przekazuje jako server-sent events do apiWorkers/stock/stock_main.py.
+Skrypt można uruchamiać wielokrotnie - funkcja i triggery są zastępowane.
+
+Uruchomienie:
+    python3 create_state_notify.py
+"""
+import logging
+import psycopg2
+
+from common.state_notify import notify_function_sql, notify_trigger_sql, trigger_name
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Parametry połączenia z bazą danych PostgreSQL
+db_params = {
+    'dbname': 'TradingView',
+    'user': 'postgres',
+    'password': 'postgres',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+SYMBOLS_TABLES = ['1DtStockSymbols', '1DtCryptoSymbols']
+
+
+def main():
+    conn = psycopg2.connect(**db_params)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(notify_function_sql())
+        for table in SYMBOLS_TABLES:
+            cursor.execute(notify_trigger_sql(table))
+            logger.info(f"Utworzono trigger {trigger_name(table)}")
+        conn.commit()
+    except psycopg2.Error as error:
+        conn.rollback()
+        logger.error(f"Błąd tworzenia triggerów requestStateCheck: {error}")
+        raise SystemExit(1)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
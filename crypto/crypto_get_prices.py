@@ -1,8 +1,16 @@
 import psycopg2
 import logging
+import os
+import sys
 from tvDatafeed import TvDatafeed, Interval
 import pandas as pd
 
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.price_fetcher import PriceFetcher, split_symbol
+from common.dated_tables import PRICE_STORAGE
+from common.price_writer import PriceWriter
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,8 +30,23 @@ db_params = {
     'port': '5432'
 }
 
-# Initialize TvDatafeed (no credentials for basic usage)
-tv = TvDatafeed()
+# Pobieranie równoległe: FETCH_WORKERS wątków (każdy z własnym TvDatafeed, bez logowania),
+# łącznie najwyżej FETCH_RATE wywołań get_hist na sekundę, ponowienia z backoffem
+FETCH_WORKERS = 8
+FETCH_RATE = 4.0
+FETCH_RETRIES = 3
+FETCH_TIMEOUT = 10
+
+# 'relative' - DELETE + INSERT wszystkich barów i przeliczenie TickerRelative w tCrypto_Prices
+# 'dated' - upsert barów do tCrypto_Prices_Dated (klucz: data baru), TickerRelative liczy widok tCrypto_Prices_Dated_Relative
+# Ustawiane w common.dated_tables, żeby czytelnicy (backtest) czytali to samo miejsce
+price_storage = PRICE_STORAGE
+
+# Zapis cen: pula połączeń otwierana przy pierwszym zapisie, jedna transakcja na symbol
+price_writer = PriceWriter(db_params, 'tCrypto_Prices')
+
+fetcher = PriceFetcher(Interval.in_daily, 2500, workers=FETCH_WORKERS, rate=FETCH_RATE, retries=FETCH_RETRIES,
+                       timeout=FETCH_TIMEOUT, tv_factory=TvDatafeed)
 
 def fetch_enabled_symbols():
     """Fetch enabled symbols and their IDs from tCryptoSymbols."""
@@ -55,12 +78,7 @@ def fetch_enabled_symbols():
 def fetch_historical_data(exchange, symbol):
     """Fetch historical data for a given exchange and symbol."""
     try:
-        data = tv.get_hist(
-            symbol=symbol,
-            exchange=exchange,
-            interval=Interval.in_daily,
-            n_bars=2500
-        )
+        data = fetcher.fetch(exchange, symbol)
         logger.info(f"Fetched historical data for {exchange}:{symbol}")
         return data
     except Exception as error:
@@ -68,103 +86,26 @@ def fetch_historical_data(exchange, symbol):
         return None
 
 def insert_historical_data(id_symbol, data):
-    """Insert historical data into tCrypto_Prices with TickerRelative after deleting existing records."""
+    """Replace the bars of idSymbol in tCrypto_Prices: DELETE + one COPY with TickerRelative, one transaction."""
     if data is None or data.empty:
         logger.warning(f"No data to insert for idSymbol {id_symbol}")
         return
 
-    try:
-        conn = psycopg2.connect(**db_params)
-        cursor = conn.cursor()
-
-        # Check if records exist for idSymbol
-        cursor.execute('SELECT COUNT(*) FROM public."tCrypto_Prices" WHERE "idSymbol" = %s', (id_symbol,))
-        count = cursor.fetchone()[0]
-        if count > 0:
-            logger.info(f"Found {count} existing records for idSymbol {id_symbol}, deleting them")
-            cursor.execute('DELETE FROM public."tCrypto_Prices" WHERE "idSymbol" = %s', (id_symbol,))
-            conn.commit()
-            logger.info(f"Deleted {count} records for idSymbol {id_symbol}")
-
-        # Sort data by datetime descending (newest first)
-        data = data.sort_index(ascending=False)
-        # Calculate TickerRelative: 0 for newest, -1 for each day back
-        data['TickerRelative'] = -data.index.to_series().diff(-1).dt.days.fillna(0).cumsum().astype(int)
-        # Ensure newest date gets TickerRelative = 0
-        data['TickerRelative'] = data['TickerRelative'] - data['TickerRelative'].iloc[0]
-
-        query = """
-        INSERT INTO public."tCrypto_Prices" ("idSymbol", "TickerRelative", "open", "high", "low", "close", "volume")
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        for index, row in data.iterrows():
-            cursor.execute(query, (
-                id_symbol,
-                row['TickerRelative'],
-                row['open'],
-                row['high'],
-                row['low'],
-                row['close'],
-                row['volume']
-            ))
-        conn.commit()
-        logger.info(f"Inserted {len(data)} records for idSymbol {id_symbol}")
-
-    except (Exception, psycopg2.Error) as error:
-        logger.error(f"Error inserting data for idSymbol {id_symbol}: {error}")
-        conn.rollback()
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-            logger.info("Database connection closed")
-
+    inserted = price_writer.replace_symbol(id_symbol, data)
+    if inserted is not None:
+        logger.info(f"Inserted {inserted} records for idSymbol {id_symbol}")
 
-def update_ticker_relative(id_symbol):
-    """Update TickerRelative values for a given idSymbol based on id ascending order."""
-    try:
-        conn = psycopg2.connect(**db_params)
-        cursor = conn.cursor()
-        logger.info(f"Connected to the database for updating TickerRelative for idSymbol {id_symbol}")
 
-        # Fetch records ordered by id ascending
-        query = """
-        SELECT "id"
-        FROM public."tCrypto_Prices"
-        WHERE "idSymbol" = %s
-        ORDER BY "id" ASC
-        """
-        cursor.execute(query, (id_symbol,))
-        records = cursor.fetchall()
-
-        if not records:
-            logger.warning(f"No records found for idSymbol {id_symbol}")
-            return
-
-        # Calculate TickerRelative: +1 for first, 0 for second, -1 for third, and so on
-        for index, (record_id,) in enumerate(records):
-            ticker_relative = -index  # +1 for first, 0 for second, -1 for third, etc.
-            update_query = """
-            UPDATE public."tCrypto_Prices"
-            SET "TickerRelative" = %s
-            WHERE "id" = %s
-            """
-            cursor.execute(update_query, (ticker_relative, record_id))
-            #logger.info(f"Updated TickerRelative to {ticker_relative} for id {record_id}")
-
-        conn.commit()
-        logger.info(f"Successfully updated TickerRelative for {len(records)} records for idSymbol {id_symbol}")
+def upsert_historical_data(id_symbol, data):
+    """Upsert bars into tCrypto_Prices_Dated keyed by bar date; unchanged bars are left alone."""
+    if data is None or data.empty:
+        logger.warning(f"No data to upsert for idSymbol {id_symbol}")
+        return
 
-    except (Exception, psycopg2.Error) as error:
-        logger.error(f"Error updating TickerRelative for idSymbol {id_symbol}: {error}")
-        conn.rollback()
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-            logger.info("Database connection closed")
+    changed = price_writer.upsert_dated(id_symbol, data)
+    if changed is None:
+        return
+    logger.info(f"Upserted {len(data)} bars for idSymbol {id_symbol}, {changed} new or changed")
 
 
 def main():
@@ -174,25 +115,21 @@ def main():
         logger.error("No enabled symbols found or database error")
         return
 
-    # Process each symbol
-    for id_symbol, full_symbol in symbols:
+    # Pobieranie równoległe, zapis do bazy po kolei w kolejności ukończenia pobrań
+    for id_symbol, full_symbol, data in fetcher.fetch_many(symbols):
         try:
-            # Split symbol into exchange and symbol
-            if ':' not in full_symbol:
-                logger.error(f"Invalid symbol format: {full_symbol}")
-                continue
-            exchange, symbol = full_symbol.split(':')
+            exchange, symbol = split_symbol(full_symbol)
             logger.info(f"Processing {exchange}:{symbol} (idSymbol: {id_symbol})")
 
-            # Fetch historical data
-            data = fetch_historical_data(exchange, symbol)
             if data is not None:
                 print(f"\nHistorical data for {exchange}:{symbol}:")
                 print(data)
-                # Insert data into tCrypto_Prices
-                insert_historical_data(id_symbol, data)
-                # Update TickerRelative values
-                update_ticker_relative(id_symbol)
+                if price_storage == 'dated':
+                    # Upsert barów po dacie - TickerRelative nie jest przeliczany
+                    upsert_historical_data(id_symbol, data)
+                else:
+                    # DELETE + COPY do tCrypto_Prices, TickerRelative liczony przy zapisie
+                    insert_historical_data(id_symbol, data)
             else:
                 logger.warning(f"No data returned for {exchange}:{symbol}")
 
@@ -201,6 +138,8 @@ def main():
             logger.error(f"Error processing symbol {full_symbol}: {ve}")
             continue
 
+    price_writer.close()
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+"""Migrate Pifagor indicator tables from the long layout to the wide one (common.indicator_tables).
+
+Tworzy tabelę <tabela>_Wide, przepisuje do niej dane paczkami symboli (każda paczka
+w osobnej transakcji, można przerwać i wznowić), opcjonalnie tworzy widok
+<tabela>_Wide_AsLong o kolumnach starej tabeli i sprawdza zgodność danych.
+Stara tabela nie jest usuwana.
+
+Uruchomienie:
+    python3 migrate_indicators_wide.py --table tStock_IndicatorValues_Pifagor_Long --create-view --verify
+    python3 migrate_indicators_wide.py --table tCrypto_IndicatorValues_Pifagor_Long --indices crypto
+"""
+import argparse
+import logging
+import time
+import psycopg2
+
+from common.indicator_tables import copy_from_long_sql, create_wide_table_sql, long_view_sql, wide_columns, \
+    wide_table_name
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Parametry połączenia z bazą danych PostgreSQL
+db_params = {
+    'dbname': 'TradingView',
+    'user': 'postgres',
+    'password': 'postgres',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+# valid_indices zapisywane przez scrapery
+VALID_INDICES = {
+    'stock': [5, 7, 22, 24],
+    'crypto': [5, 6, 7, 8, 9, 11, 13, 15, 17, 19, 22, 24, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36],
+}
+
+
+def pending_symbols(cursor, table):
+    """idSymbol present in the long table and not yet in the wide one."""
+    cursor.execute(f"""
+        SELECT DISTINCT l."idSymbol"
+        FROM public."{table}" l
+        WHERE NOT EXISTS (
+            SELECT 1 FROM public."{wide_table_name(table)}" w WHERE w."idSymbol" = l."idSymbol"
+        )
+        ORDER BY l."idSymbol"
+        """)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def verify(cursor, table, indices):
+    """Compare non-NULL value counts and sums per index between the layouts; True if equal."""
+    ok = True
+    for idx, col in zip(indices, wide_columns(indices)):
+        cursor.execute(f"""
+            SELECT COUNT("IndicatorValue"), COALESCE(SUM("IndicatorValue"), 0)
+            FROM public."{table}" WHERE "IndicatorIndex" = %s
+            """, (idx,))
+        long_count, long_sum = cursor.fetchone()
+        cursor.execute(f'SELECT COUNT("{col}"), COALESCE(SUM("{col}"), 0) FROM public."{wide_table_name(table)}"')
+        wide_count, wide_sum = cursor.fetchone()
+        same = long_count == wide_count and abs(long_sum - wide_sum) <= 1e-6 * max(1.0, abs(long_sum))
+        ok = ok and same
+        logger.info(f"{col}: long {long_count} / {long_sum:.2f}, wide {wide_count} / {wide_sum:.2f}"
+                    f"{'' if same else '  RÓŻNICA'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', required=True, help='long table, e.g. tStock_IndicatorValues_Pifagor_Long')
+    parser.add_argument('--indices', default='stock',
+                        help="'stock', 'crypto' or a comma separated list of IndicatorIndex")
+    parser.add_argument('--batch', type=int, default=200, help='symbols per transaction')
+    parser.add_argument('--create-view', action='store_true')
+    parser.add_argument('--verify', action='store_true')
+    args = parser.parse_args()
+    indices = VALID_INDICES.get(args.indices) or [int(idx) for idx in args.indices.split(',')]
+
+    conn = psycopg2.connect(**db_params)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(create_wide_table_sql(args.table, indices))
+        conn.commit()
+        ids = pending_symbols(cursor, args.table)
+        logger.info(f"{len(ids)} symboli do przepisania z {args.table} do {wide_table_name(args.table)}")
+        insert_sql = copy_from_long_sql(args.table, indices, id_symbols=True)
+        started = time.perf_counter()
+        rows = 0
+        for start in range(0, len(ids), args.batch):
+            batch = ids[start:start + args.batch]
+            cursor.execute(insert_sql, (batch,))
+            rows += cursor.rowcount
+            conn.commit()
+            logger.info(f"{start + len(batch)}/{len(ids)} symboli, {rows} wierszy "
+                        f"({rows / (time.perf_counter() - started):,.0f} wierszy/s)")
+        if args.create_view:
+            cursor.execute(long_view_sql(args.table, indices))
+            conn.commit()
+            logger.info(f"Utworzono widok {wide_table_name(args.table)}_AsLong")
+        cursor.execute(f'ANALYZE public."{wide_table_name(args.table)}"')
+        conn.commit()
+        if args.verify and not verify(cursor, args.table, indices):
+            logger.error("Dane w układzie szerokim różnią się od tabeli źródłowej")
+            raise SystemExit(1)
+    except psycopg2.Error as error:
+        conn.rollback()
+        logger.error(f"Błąd migracji {args.table}: {error}")
+        raise SystemExit(1)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
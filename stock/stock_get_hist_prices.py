@@ -1,8 +1,16 @@
 import psycopg2
 import logging
+import os
+import sys
 from tvDatafeed import TvDatafeed, Interval
 import pandas as pd
 
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.price_fetcher import PriceFetcher, split_symbol
+from common.dated_tables import PRICE_STORAGE, latest_bar_dates, missing_bars
+from common.price_writer import PriceWriter
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,8 +30,30 @@ db_params = {
     'port': '5432'
 }
 
-# Initialize TvDatafeed (no credentials for basic usage)
-tv = TvDatafeed()
+# Pobieranie równoległe: FETCH_WORKERS wątków (każdy z własnym TvDatafeed, bez logowania),
+# łącznie najwyżej FETCH_RATE wywołań get_hist na sekundę, ponowienia z backoffem
+FETCH_WORKERS = 8
+FETCH_RATE = 4.0
+FETCH_RETRIES = 3
+FETCH_TIMEOUT = 10
+
+# 'relative' - DELETE + INSERT wszystkich barów i przeliczenie TickerRelative w tStock_Prices
+# 'dated' - upsert barów do tStock_Prices_Dated (klucz: data baru), TickerRelative liczy widok tStock_Prices_Dated_Relative
+# Ustawiane w common.dated_tables, żeby czytelnicy (backtest) czytali to samo miejsce
+price_storage = PRICE_STORAGE
+
+# Zapis cen: pula połączeń otwierana przy pierwszym zapisie, jedna transakcja na symbol
+price_writer = PriceWriter(db_params, 'tStock_Prices')
+# 'full' - zawsze FULL_BARS barów; 'incremental' - tylko bary od ostatniej daty w tStock_Prices_Dated
+# (+ OVERLAP_BARS zapisanych barów do weryfikacji/korekty). Zapis zgodnie z price_storage: 'dated' - upsert
+# do tStock_Prices_Dated, 'relative' - dopisanie do tStock_Prices (przesunięcie TickerRelative, najwyżej
+# FULL_BARS barów) razem z upsertem dat do tStock_Prices_Dated (wymaga create_dated_tables.py)
+sync_mode = 'full'
+FULL_BARS = 2500
+OVERLAP_BARS = 5
+
+fetcher = PriceFetcher(Interval.in_daily, FULL_BARS, workers=FETCH_WORKERS, rate=FETCH_RATE, retries=FETCH_RETRIES,
+                       timeout=FETCH_TIMEOUT, tv_factory=TvDatafeed)
 
 def fetch_enabled_symbols():
     """Fetch enabled symbols and their IDs from tStockSymbols."""
@@ -52,119 +82,74 @@ def fetch_enabled_symbols():
             conn.close()
             logger.info("Database connection closed")
 
-def fetch_historical_data(exchange, symbol):
-    """Fetch historical data for a given exchange and symbol."""
+def fetch_latest_bar_dates():
+    """Newest stored bar date per idSymbol in tStock_Prices_Dated ({} if the table is empty or missing)."""
+    conn = None
+    cursor = None
+    try:
+        conn = psycopg2.connect(**db_params)
+        cursor = conn.cursor()
+        latest = latest_bar_dates(cursor, 'tStock_Prices')
+        logger.info(f"Fetched latest bar dates for {len(latest)} symbols")
+        return latest
+
+    except (Exception, psycopg2.Error) as error:
+        logger.error(f"Error fetching latest bar dates: {error}")
+        return {}
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+def fetch_historical_data(exchange, symbol, n_bars=FULL_BARS):
+    """Fetch the newest n_bars daily bars for a given exchange and symbol."""
     try:
-        data = tv.get_hist(
-            symbol=symbol,
-            exchange=exchange,
-            interval=Interval.in_daily,
-            n_bars=2500
-        )
-        logger.info(f"Fetched historical data for {exchange}:{symbol}")
+        data = fetcher.fetch(exchange, symbol, n_bars)
+        logger.info(f"Fetched {n_bars} bars of historical data for {exchange}:{symbol}")
         return data
     except Exception as error:
         logger.error(f"Error fetching historical data for {exchange}:{symbol}: {error}")
         return None
 
 def insert_historical_data(id_symbol, data):
-    """Insert historical data into tStock_Prices with TickerRelative after deleting existing records."""
+    """Replace the bars of idSymbol in tStock_Prices: DELETE + one COPY with TickerRelative, one transaction."""
     if data is None or data.empty:
         logger.warning(f"No data to insert for idSymbol {id_symbol}")
         return
 
-    try:
-        conn = psycopg2.connect(**db_params)
-        cursor = conn.cursor()
+    inserted = price_writer.replace_symbol(id_symbol, data)
+    if inserted is not None:
+        logger.info(f"Inserted {inserted} records for idSymbol {id_symbol}")
 
-        # Check if records exist for idSymbol
-        cursor.execute('SELECT COUNT(*) FROM public."tStock_Prices" WHERE "idSymbol" = %s', (id_symbol,))
-        count = cursor.fetchone()[0]
-        if count > 0:
-            logger.info(f"Found {count} existing records for idSymbol {id_symbol}, deleting them")
-            cursor.execute('DELETE FROM public."tStock_Prices" WHERE "idSymbol" = %s', (id_symbol,))
-            conn.commit()
-            logger.info(f"Deleted {count} records for idSymbol {id_symbol}")
-
-        # Sort data by datetime descending (newest first)
-        data = data.sort_index(ascending=False)
-        # Calculate TickerRelative: 0 for newest, -1 for each day back
-        data['TickerRelative'] = -data.index.to_series().diff(-1).dt.days.fillna(0).cumsum().astype(int)
-        # Ensure newest date gets TickerRelative = 0
-        data['TickerRelative'] = data['TickerRelative'] - data['TickerRelative'].iloc[0]
 
-        query = """
-        INSERT INTO public."tStock_Prices" ("idSymbol", "TickerRelative", "open", "high", "low", "close", "volume")
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        for index, row in data.iterrows():
-            cursor.execute(query, (
-                id_symbol,
-                row['TickerRelative'],
-                row['open'],
-                row['high'],
-                row['low'],
-                row['close'],
-                row['volume']
-            ))
-        conn.commit()
-        logger.info(f"Inserted {len(data)} records for idSymbol {id_symbol}")
+def append_historical_data(id_symbol, data, latest=None):
+    """Add the bars newer than latest to tStock_Prices, shifting the stored ones; refresh the overlap."""
+    if data is None or data.empty:
+        logger.warning(f"No data to append for idSymbol {id_symbol}")
+        return
 
-    except (Exception, psycopg2.Error) as error:
-        logger.error(f"Error inserting data for idSymbol {id_symbol}: {error}")
-        conn.rollback()
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-            logger.info("Database connection closed")
+    new = len(data) if latest is None else int((data.index.date > latest).sum())
+    written = price_writer.append_relative(id_symbol, data, new, keep=FULL_BARS)
+    if written is not None:
+        logger.info(f"Appended {new} new bars for idSymbol {id_symbol} ({written - new} overlapping rewritten)")
 
 
-def update_ticker_relative(id_symbol):
-    """Update TickerRelative values for a given idSymbol based on id ascending order."""
-    try:
-        conn = psycopg2.connect(**db_params)
-        cursor = conn.cursor()
-        logger.info(f"Connected to the database for updating TickerRelative for idSymbol {id_symbol}")
+def upsert_historical_data(id_symbol, data, latest=None):
+    """Upsert bars into tStock_Prices_Dated keyed by bar date; unchanged bars are left alone.
 
-        # Fetch records ordered by id ascending
-        query = """
-        SELECT "id"
-        FROM public."tStock_Prices"
-        WHERE "idSymbol" = %s
-        ORDER BY "id" ASC
-        """
-        cursor.execute(query, (id_symbol,))
-        records = cursor.fetchall()
-
-        if not records:
-            logger.warning(f"No records found for idSymbol {id_symbol}")
-            return
-
-        # Calculate TickerRelative: +1 for first, 0 for second, -1 for third, and so on
-        for index, (record_id,) in enumerate(records):
-            ticker_relative = 1 - index  # +1 for first, 0 for second, -1 for third, etc.
-            update_query = """
-            UPDATE public."tStock_Prices"
-            SET "TickerRelative" = %s
-            WHERE "id" = %s
-            """
-            cursor.execute(update_query, (ticker_relative, record_id))
-            #logger.info(f"Updated TickerRelative to {ticker_relative} for id {record_id}")
-
-        conn.commit()
-        logger.info(f"Successfully updated TickerRelative for {len(records)} records for idSymbol {id_symbol}")
+    latest is the newest bar date stored before the fetch; bars up to it that
+    still get written are logged as corrections.
+    """
+    if data is None or data.empty:
+        logger.warning(f"No data to upsert for idSymbol {id_symbol}")
+        return
 
-    except (Exception, psycopg2.Error) as error:
-        logger.error(f"Error updating TickerRelative for idSymbol {id_symbol}: {error}")
-        conn.rollback()
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-            logger.info("Database connection closed")
+    changed = price_writer.upsert_dated(id_symbol, data)
+    if changed is None:
+        return
+    new = len(data) if latest is None else int((data.index.date > latest).sum())
+    logger.info(f"Upserted {len(data)} bars for idSymbol {id_symbol}: {new} new, {max(0, changed - new)} corrected")
 
 
 def main():
@@ -174,25 +159,39 @@ def main():
         logger.error("No enabled symbols found or database error")
         return
 
-    # Process each symbol
-    for id_symbol, full_symbol in symbols:
+    incremental = sync_mode == 'incremental'
+    latest_dates = fetch_latest_bar_dates() if incremental else {}
+    today = pd.Timestamp.now().date()
+
+    def bars_for(id_symbol):
+        if not incremental:
+            return FULL_BARS
+        return missing_bars(latest_dates.get(id_symbol), today, FULL_BARS, OVERLAP_BARS)
+
+    # Pobieranie równoległe, zapis do bazy po kolei w kolejności ukończenia pobrań
+    for id_symbol, full_symbol, data in fetcher.fetch_many(symbols, bars_for):
         try:
-            # Split symbol into exchange and symbol
-            if ':' not in full_symbol:
-                logger.error(f"Invalid symbol format: {full_symbol}")
-                continue
-            exchange, symbol = full_symbol.split(':')
+            exchange, symbol = split_symbol(full_symbol)
             logger.info(f"Processing {exchange}:{symbol} (idSymbol: {id_symbol})")
 
-            # Fetch historical data
-            data = fetch_historical_data(exchange, symbol)
+            latest = latest_dates.get(id_symbol)
+            if incremental and latest is not None and data is not None and not data.empty \
+                    and data.index.date.min() > latest:
+                # Zakładka nie sięgnęła ostatniego zapisanego baru - luka, pobieramy pełną historię
+                logger.warning(f"Gap after {latest} for {exchange}:{symbol}, fetching {FULL_BARS} bars")
+                data = fetch_historical_data(exchange, symbol, FULL_BARS)
             if data is not None:
                 print(f"\nHistorical data for {exchange}:{symbol}:")
                 print(data)
-                # Insert data into tStock_Prices
-                insert_historical_data(id_symbol, data)
-                # Update TickerRelative values
-                update_ticker_relative(id_symbol)
+                if price_storage == 'dated':
+                    # Upsert barów po dacie - TickerRelative nie jest przeliczany
+                    upsert_historical_data(id_symbol, data, latest)
+                elif incremental:
+                    # Nowe bary dopisane do tStock_Prices, daty zapisane w tStock_Prices_Dated
+                    append_historical_data(id_symbol, data, latest)
+                else:
+                    # DELETE + COPY do tStock_Prices, TickerRelative liczony przy zapisie
+                    insert_historical_data(id_symbol, data)
             else:
                 logger.warning(f"No data returned for {exchange}:{symbol}")
 
@@ -201,6 +200,8 @@ def main():
             logger.error(f"Error processing symbol {full_symbol}: {ve}")
             continue
 
+    price_writer.close()
+
 
 
 if __name__ == "__main__":
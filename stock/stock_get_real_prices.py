@@ -1,8 +1,15 @@
 import psycopg2
 import logging
+import os
+import sys
 from tvDatafeed import TvDatafeed, Interval
 from datetime import datetime
 
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.price_fetcher import PriceFetcher, split_symbol
+from common.quote_service import upsert_real_prices
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,8 +29,15 @@ db_params = {
     'port': '5432'
 }
 
-# Initialize TvDatafeed (no credentials for basic usage)
-tv = TvDatafeed()
+# Pobieranie równoległe: FETCH_WORKERS wątków (każdy z własnym TvDatafeed, bez logowania),
+# łącznie najwyżej FETCH_RATE wywołań get_hist na sekundę, ponowienia z backoffem
+FETCH_WORKERS = 8
+FETCH_RATE = 4.0
+FETCH_RETRIES = 2
+FETCH_TIMEOUT = 5
+
+fetcher = PriceFetcher(Interval.in_1_minute, 1, workers=FETCH_WORKERS, rate=FETCH_RATE, retries=FETCH_RETRIES,
+                       timeout=FETCH_TIMEOUT, tv_factory=TvDatafeed)
 
 def fetch_enabled_symbols():
     """Fetch enabled symbols and their IDs from tStockSymbols."""
@@ -54,22 +68,6 @@ WHERE (s."enabled" = TRUE AND s."UpdatedShortTerm" = '2025-10-11') OR st.status
             conn.close()
             logger.info("Database connection closed")
 
-def fetch_data(exchange, symbol):
-    """Fetch historical data for a given exchange and symbol."""
-    try:
-        data = tv.get_hist(
-            symbol=symbol,
-            exchange=exchange,
-            interval=Interval.in_1_minute,
-            n_bars=1
-        )
-        logger.info(f"Fetched historical data for {exchange}:{symbol}")
-        return data
-    except Exception as error:
-        logger.error(f"Error fetching historical data for {exchange}:{symbol}: {error}")
-        return None
-
-
 def main():
     # Fetch enabled symbols
     symbols = fetch_enabled_symbols()
@@ -82,18 +80,13 @@ def main():
     cursor = conn.cursor()
     logger.info("Connected to the database for data insertion/update")
 
-    # Process each symbol
-    for id_symbol, full_symbol in symbols:
+    # Pobieranie równoległe, zapis jednym INSERT ... ON CONFLICT po pobraniu wszystkich symboli
+    rows = []
+    for id_symbol, full_symbol, data in fetcher.fetch_many(symbols):
         try:
-            # Split symbol into exchange and symbol
-            if ':' not in full_symbol:
-                logger.error(f"Invalid symbol format: {full_symbol}")
-                continue
-            exchange, symbol = full_symbol.split(':')
+            exchange, symbol = split_symbol(full_symbol)
             logger.info(f"Processing {exchange}:{symbol} (idSymbol: {id_symbol})")
 
-            # Fetch historical data
-            data = fetch_data(exchange, symbol)
             print(data)
             if data is not None and not data.empty:
                 # Get the latest data point (assuming 1 bar is fetched)
@@ -107,33 +100,7 @@ def main():
                     tzinfo=None)  # Convert to timestamp without timezone
                 updated = datetime.now().replace(tzinfo=None)
 
-                # Check if row exists for idSymbol
-                cursor.execute("""
-                    SELECT COUNT(*) FROM public."tStock_PricesReal" WHERE "idSymbol" = %s
-                """, (id_symbol,))
-
-                exists = cursor.fetchone()[0] > 0
-
-                if exists:
-                    # Update existing row
-                    cursor.execute("""
-                        UPDATE public."tStock_PricesReal"
-                        SET "open" = %s, "high" = %s, "low" = %s, "close" = %s, 
-                            "volume" = %s, "timestamp" = %s, "updated" = %s
-                        WHERE "idSymbol" = %s
-                    """, (open_price, high_price, low_price, close_price, volume, timestamp, updated, id_symbol))
-                    logger.info(f"Updated data for idSymbol: {id_symbol}")
-                else:
-                    # Insert new row (assuming id is auto-incremented)
-                    cursor.execute("""
-                        INSERT INTO public."tStock_PricesReal" ("idSymbol", "open", "high", "low", "close", "volume", 
-                            "timestamp", "updated")
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """, (id_symbol, open_price, high_price, low_price, close_price, volume, timestamp, updated))
-                    logger.info(f"Inserted new data for idSymbol: {id_symbol}")
-
-                # Commit the transaction
-                conn.commit()
+                rows.append((id_symbol, open_price, high_price, low_price, close_price, volume, timestamp, updated))
             else:
                 logger.warning(f"No data fetched for {exchange}:{symbol}")
 
@@ -142,7 +109,15 @@ def main():
             continue
         except Exception as e:
             logger.error(f"Error processing data for idSymbol {id_symbol}: {e}")
-            conn.rollback()
+            continue
+
+    try:
+        written = upsert_real_prices(cursor, 'tStock_PricesReal', rows)
+        conn.commit()
+        logger.info(f"Updated/Inserted {written} rows in tStock_PricesReal")
+    except Exception as e:
+        logger.error(f"Error writing tStock_PricesReal: {e}")
+        conn.rollback()
 
     # Close database connection
     if cursor:
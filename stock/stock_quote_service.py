@@ -0,0 +1,109 @@
+"""Real-time prices of open positions and today's candidates from one TradingView quote session.
+
+Zamiast tv.get_hist(n_bars=1) dla każdego symbolu po kolei: jedna sesja notowań
+na wszystkie symbole, bieżący bar 1-minutowy trzymany w pamięci i zmienione
+wiersze zapisywane do tStock_PricesReal co --flush-interval sekund jednym
+INSERT ... ON CONFLICT (unikalny indeks idSymbol zakłada raz
+create_real_prices_index.py). Lista symboli odświeżana co --refresh-interval sekund.
+
+Uruchomienie:
+    python3 stock_quote_service.py
+    python3 stock_quote_service.py --url ws://127.0.0.1:8765/socket.io/websocket --flush-interval 2
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import sys
+import psycopg2
+
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.quote_service import run_quote_service, upsert_real_prices
+from common.tv_client import TradingViewClient, TV_WS_URL
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Parametry połączenia z bazą danych PostgreSQL
+db_params = {
+    'dbname': 'TradingView',
+    'user': 'postgres',
+    'password': 'postgres',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+TV_AUTH_TOKEN = os.environ.get('TV_AUTH_TOKEN', 'unauthorized_user_token')
+PRICES_TABLE = 'tStock_PricesReal'
+
+
+class PriceStore:
+    """One DB connection shared by the symbol reloads and the flushes (called from one thread at a time)."""
+
+    def __init__(self):
+        self.conn = None
+
+    def _cursor(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = psycopg2.connect(**db_params)
+        return self.conn.cursor()
+
+    def load_symbols(self):
+        """{Symbol: idSymbol} of enabled symbols refreshed today and of open positions."""
+        cursor = self._cursor()
+        try:
+            cursor.execute("""
+            SELECT s.id, s."Symbol"
+            FROM public."tStockSymbols" s
+            LEFT JOIN public."tStockState" st ON s.id = st."idSymbol"
+            WHERE (s."enabled" = TRUE AND s."UpdatedShortTerm" = CURRENT_DATE) OR st.status = 'open'
+            """)
+            symbols = {symbol: id_symbol for id_symbol, symbol in cursor.fetchall()}
+            self.conn.commit()
+            return symbols
+        finally:
+            cursor.close()
+
+    def write_rows(self, rows):
+        cursor = self._cursor()
+        try:
+            written = upsert_real_prices(cursor, PRICES_TABLE, rows)
+            self.conn.commit()
+            logger.info(f"Zapisano {written} notowań do {PRICES_TABLE}")
+        except (Exception, psycopg2.Error) as error:
+            self.conn.rollback()
+            logger.error(f"Błąd zapisu notowań do {PRICES_TABLE}: {error}")
+        finally:
+            cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=TV_WS_URL)
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--refresh-interval', type=float, default=60.0)
+    args = parser.parse_args()
+
+    store = PriceStore()
+    client_factory = functools.partial(TradingViewClient, url=args.url, auth_token=TV_AUTH_TOKEN)
+    try:
+        asyncio.run(run_quote_service(client_factory, store.load_symbols, store.write_rows,
+                                      flush_interval=args.flush_interval, refresh_interval=args.refresh_interval))
+    except KeyboardInterrupt:
+        logger.info("Zatrzymano")
+    finally:
+        if store.conn is not None:
+            store.conn.close()
+
+
+if __name__ == "__main__":
+    main()
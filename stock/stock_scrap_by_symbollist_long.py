@@ -1,5 +1,4 @@
 import time
-import json
 import os
 import sys
 from seleniumwire import webdriver  # pip install selenium-wire
@@ -8,7 +7,15 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import psycopg2
-from psycopg2.extras import execute_values
+
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.dedup import MessageDedup
+from common.ws_capture import limit_capture_to_tv_socket, reset_captured_requests, load_symbol_rows, \
+    tv_socket_requests, iter_ws_payloads, ScrapeTimer
+from common.capture import open_capture
+from common.indicator_tables import INDICATOR_LAYOUT
+from common.indicator_writer import make_indicator_writer
 
 # Dostosuj te ścieżki do swoich lokalizacji
 OPERA_BINARY_PATH = r'/snap/opera/401/usr/lib/x86_64-linux-gnu/opera/opera'  # Przykład ścieżki do Opera.exe
@@ -71,6 +78,7 @@ try:
     # Uruchom przeglądarkę z selenium-wire
     driver = webdriver.Chrome(service=service, options=options)
     driver.set_window_size(15000, 360)  # Ustawia rozmiar okna na 800x600 pikseli
+    limit_capture_to_tv_socket(driver)
     print("Przeglądarka Opera uruchomiona pomyślnie!")
 except Exception as e:
     print(f"Błąd uruchamiania: {e}")
@@ -78,17 +86,34 @@ except Exception as e:
 
 
 # Monitorowanie WebSocket z filtrem na prodata.tradingview.com/socket.io
-seen_messages = set()
+# Skróty blake2b zamiast pełnych payloadów, ograniczone LRU
+seen_messages_cap = 256
+seen_messages = MessageDedup(max_entries=seen_messages_cap)
 iteration = 0
 previous_request_count = 0
 # Valid indices without 'NO' from the provided table
 valid_indices = [5, 7, 22, 24]
 #valid_indices = [i for i in range(0,100)]
 restart_after_iterations = 35
+# True - jedna przeglądarka i jedno połączenie z bazą przez cały przebieg, requesty selenium-wire
+# czyszczone po każdym symbolu; False - stary tryb z restartem przez os.execv co restart_after_iterations
+long_lived_mode = True
+# Czekanie na ramkę du ze study dla bieżącego symbolu (sekundy) i liczba przeładowań wykresu, gdy nie przyszła
+study_wait_timeout = 20
+study_wait_retries = 1
+timer = ScrapeTimer()
+# Zapis wierszy wskaźnika: jeden symbol = jedna transakcja (COPY + podmiana)
+# 'long' - wiersz na (bar, indeks); 'wide' - wiersz na bar w tabeli *_Wide (migrate_indicators_wide.py);
+# 'dated' - upsert wiersza na datę baru do *_Dated (create_dated_tables.py), bez DELETE
+# Ustawiane w common.indicator_tables, żeby czytelnicy (live, backtest) czytali ten sam układ
+indicator_layout = INDICATOR_LAYOUT
+writer = make_indicator_writer(conn, 'tStock_IndicatorValues_Pifagor_Long', 'tStockSymbols', 'UpdatedLongTerm', valid_indices, indicator_layout)
+# Zapis surowych payloadów WS każdego symbolu do .jsonl.gz (common.capture) do odtwarzania offline; brak zmiennej - wyłączone
+capture = open_capture(os.environ.get('TV_CAPTURE_PATH'))
 
 while True:
     # Check for restart condition
-    if iteration > 0 and iteration % restart_after_iterations == 0:
+    if not long_lived_mode and iteration > 0 and iteration % restart_after_iterations == 0:
         print(f"Reached {iteration} iterations, restarting script...")
         # Close browser and database
         try:
@@ -108,15 +133,18 @@ while True:
         except Exception as e:
             print(f"Error closing database: {e}")
         # Restart the script
+        if capture is not None:
+            capture.close()
+        timer.persist()
         os.execv(sys.executable, ['python3'] + sys.argv)
 
-    # Flaga do ograniczenia przetwarzania tylko jednego study_loading na iterację
-    found_study_loading = False
     # Get the current symbol (cycle through the list using modulo)
     current_symbol = symbols[iteration % len(symbols)]
     url = f'https://www.tradingview.com/chart/?symbol={current_symbol}'
 
     #Obsługa bazy danych
+    if conn.closed:
+        conn = psycopg2.connect(**db_params)
     cursor = conn.cursor()
     current_symbol_id = None  # Zmienna do przechowywania id bieżącego symbolu
     try:
@@ -143,10 +171,23 @@ while True:
     #print(f"Bieżące id dla symbolu {current_symbol}: {current_symbol_id}")
 
 
+    if long_lived_mode:
+        # Zamiast restartu: usuń requesty poprzedniego symbolu, żeby driver.requests nie rósł
+        reset_captured_requests(driver)
+        previous_request_count = 0
+    timer.start_symbol()
+
+    rows = None
     try:
-        # Open the chart page with the current symbol
-        driver.get(url)
-        wait = WebDriverWait(driver, 20)  # Wait time
+        # Open the chart page with the current symbol, wait for the study du frame (37 wartości) and flatten
+        # its rows - ten sam krok co w common.scraper_pool i common.replay
+        rows = load_symbol_rows(driver, current_symbol_id, current_symbol, valid_indices, 37, 'long',
+                                indicator_layout, timeout=study_wait_timeout, retries=study_wait_retries,
+                                start_index=previous_request_count, seen_messages=seen_messages)
+        if rows is None:
+            print(f"Brak ramki du ze study dla {current_symbol} po {study_wait_retries + 1} próbach")
+            if not tv_socket_requests(driver.requests[previous_request_count:]):
+                print("Brak WS requestów z prodata.tradingview.com/socket.io – upewnij się, że chart/study jest załadowany.")
     except TimeoutException as e:
         print(f"Login error (Timeout) for {url}: {e}")
     except Exception as e:
@@ -156,169 +197,27 @@ while True:
 
     iteration += 1
     print(f"\n--- Iteration {iteration} (Symbol: {current_symbol}) ---")
-    total_requests = len(driver.requests)
-    #print(f"Total requests: {total_requests}")
-
-    # Process only new requests since the previous iteration
-    new_requests = driver.requests[previous_request_count:]
-    #print(f"Number of new requests: {len(new_requests)}")
-
-
-    ws_requests = [r for r in new_requests if r.url.lower().startswith('wss://prodata.tradingview.com/socket.io')]
-    #print(f"Liczba WS requestów z prodata.tradingview.com/socket.io: {len(ws_requests)}")
-
-    for request in ws_requests:
-        if request.url.lower().startswith('wss://prodata.tradingview.com/socket.io'):
-            #print(f"WS Request URL: {request.url}")
-            if hasattr(request, 'ws_messages'):
-                #print(f"Liczba WS messages: {len(request.ws_messages)}")
-                for msg in request.ws_messages:
-                    # Przetwarzaj tylko, jeśli nie znaleziono jeszcze study_loading w tej iteracji
-                    if found_study_loading:
-                        continue
-                    payload = msg.data if hasattr(msg, 'data') else str(msg)  # Poprawiony dostęp
-                    #print(f"Surowy payload WS: {payload[:500]}...")  # Zwiększ do 500 znaków
-                    if payload and '"m":"du","p":["cs' in str(payload) and payload not in seen_messages:  # Szukaj w stringu
-                        seen_messages.add(payload)
-                        #print(f"\nZnaleziono study_loading w payload!")
-                        parts = payload.split('~m~')
-                        #print(payload)
-                        i = 0
-                        while i < len(parts):
-                            if parts[i].isdigit():
-                                msg_len = int(parts[i])
-                                json_str = parts[i + 1]
-                                if len(json_str) >= msg_len:
-                                    json_part = json_str[:msg_len]
-                                    try:
-                                        data = json.loads(json_part)
-                                        if data.get('m') == 'du':
-                                            try:
-                                                st_data = data['p'][1].get(list(data['p'][1].keys())[0], {}).get('st', [])
-                                                has_valid_v = any(len(item.get('v', [])) == 37 for item in st_data)
-                                                if has_valid_v:
-                                                    # Usuwanie istniejących wierszy z tStock_IndicatorValues_Pifagor_Long dla current_symbol_id
-                                                    cursor = conn.cursor()
-                                                    try:
-                                                        delete_query = """
-                                                        DELETE FROM public."tStock_IndicatorValues_Pifagor_Long"
-                                                        WHERE "idSymbol" = %s
-                                                        """
-                                                        cursor.execute(delete_query, (current_symbol_id,))
-                                                        deleted_rows = cursor.rowcount
-                                                        print(f"Usunięto {deleted_rows} wierszy z tStock_IndicatorValues_Pifagor_Long dla idSymbol={current_symbol_id}")
-                                                        conn.commit()
-                                                    except (Exception, psycopg2.Error) as error:
-                                                        print(f"Błąd usuwania wierszy z tStock_IndicatorValues_Pifagor_Long: {error}")
-                                                        conn.rollback()
-                                                    finally:
-                                                        cursor.close()
-
-                                                        # Filtrowanie st_data do elementów spełniających warunki
-                                                        filtered_st_data = [
-                                                            item for item in st_data
-                                                            if len(item.get('v', [])) == 37
-                                                               and isinstance(item.get('i'), (int, float))
-                                                               and -3000 <= item.get('i') <= 299
-                                                        ]
-                                                        inserted_data = 0
-
-                                                        # Przetwarzanie wyfiltrowanych elementów
-                                                        for item in reversed(filtered_st_data):
-                                                            v_list = item.get('v', [])
-                                                            i_value = item.get('i')
-
-                                                            # Przygotowanie danych do wstawienia do tStock_IndicatorValues_Pifagor_Long
-                                                            insert_data = []
-                                                            for idx, value in enumerate(v_list):
-                                                                if idx in valid_indices:  # Only include valid indices
-                                                                    try:
-                                                                        # Konwersja na float i sprawdzenie zakresu dla double precision
-                                                                        value_float = float(value)
-                                                                        value_float = round(value_float, 2)
-                                                                        if abs(value_float) > 1e10:
-                                                                            value_float = 1234.5678  # Zastąp wartości spoza zakresu na NULL
-                                                                        insert_data.append((
-                                                                            current_symbol_id,  # idSymbol
-                                                                            (i_value - len(filtered_st_data) + 1) if len(filtered_st_data) < 300 else (i_value - 299),
-                                                                            # TickerRelative
-                                                                            idx,  # IndicatorIndex
-                                                                            value_float  # IndicatorValue
-                                                                        ))
-                                                                    except (ValueError, OverflowError):
-                                                                        print(
-                                                                            f"Błąd konwersji wartości {value} dla i={i_value}, idx={idx}, zapisano jako NULL")
-                                                                        insert_data.append((
-                                                                            current_symbol_id,
-                                                                            (i_value - len(filtered_st_data) + 1) if len(filtered_st_data) < 300 else (i_value - 299),
-                                                                            idx,
-                                                                            None
-                                                                        ))
-
-                                                            # Wstawianie wszystkich wierszy dla danego item
-                                                            cursor = conn.cursor()
-                                                            try:
-                                                                insert_query = """
-                                                                INSERT INTO public."tStock_IndicatorValues_Pifagor_Long" 
-                                                                ("idSymbol", "TickerRelative", "IndicatorIndex", "IndicatorValue")
-                                                                VALUES %s
-                                                                """
-                                                                execute_values(cursor, insert_query, insert_data)
-                                                                inserted_data = inserted_data + len(insert_data)
-                                                                conn.commit()
-                                                            except (Exception, psycopg2.Error) as error:
-                                                                print(
-                                                                    f"Błąd wstawiania wierszy dla i={i_value}: {error}")
-                                                                conn.rollback()
-                                                            finally:
-                                                                cursor.close()
 
-                                                        print(f'Wstawiono {inserted_data} wierszy do tabeli PifagorLong')
-
-
-                                                        # Aktualizacja UpdatedLongTerm dla bieżącego symbolu
-                                                        if current_symbol_id is not None:
-                                                            cursor = conn.cursor()
-                                                            try:
-                                                                update_query = """
-                                                                UPDATE public."tStockSymbols"
-                                                                SET "UpdatedLongTerm" = CURRENT_DATE
-                                                                WHERE id = %s
-                                                                """
-                                                                cursor.execute(update_query, (current_symbol_id,))
-                                                                print(
-                                                                    f"Zaktualizowano UpdatedLongTerm dla symbolu: {current_symbol}, id: {current_symbol_id}")
-                                                                conn.commit()
-                                                            except (Exception, psycopg2.Error) as error:
-                                                                print(
-                                                                    f"Błąd aktualizacji UpdatedLongTerm dla symbolu {current_symbol}: {error}")
-                                                                conn.rollback()
-                                                            finally:
-                                                                cursor.close()
-
-
-                                                    found_study_loading = True  # Znaleziono pasujące study_loading, pomiń kolejne wiadomości
-                                                    break  # Przerwij pętlę while, bo mamy już pasujące dane
-                                            except (KeyError, IndexError):
-                                                print("Nieprawidłowa struktura danych w 'p' lub 'st'.")
-                                    except json.JSONDecodeError:
-                                        print(f"Błąd parsowania: {json_str}")
-                                i += 2
-                            else:
-                                i += 1
-                    else:
-                        #print("Brak study_loading w tej wiadomości.")
-                        pass
-            else:
-                #print("Brak atrybutu ws_messages w tym request.")
-                pass
-
-    if len(ws_requests) == 0:
-        print("Brak WS requestów z prodata.tradingview.com/socket.io – upewnij się, że chart/study jest załadowany.")
-
-
-
-
-    # Update previous_request_count for the next iteration
-    previous_request_count = len(driver.requests)
+    if rows is not None:
+        # Wszystkie wiersze symbolu w jednej transakcji: COPY do tabeli tymczasowej,
+        # DELETE starych + INSERT nowych i aktualizacja UpdatedLongTerm, jeden commit
+        writer.conn = conn  # po ewentualnym ponownym połączeniu (conn.closed)
+        inserted_data = writer.replace_symbol(current_symbol_id, rows)
+        if inserted_data is None:
+            print(f"Błąd zapisu wierszy do {writer.table} dla symbolu {current_symbol}, dane bez zmian")
+        else:
+            print(f'Wstawiono {inserted_data} wierszy do tabeli PifagorLong '
+                  f'({writer.last_rows_per_second:,.0f} wierszy/s, średnio {writer.rows_per_second():,.0f})')
+            print(f"Zaktualizowano UpdatedLongTerm dla symbolu: {current_symbol}, id: {current_symbol_id}")
+    print(f"Cache wiadomości WS: {seen_messages.stats()}")
+
+    # Każdy odczyt driver.requests przeładowuje magazyn selenium-wire - tylko dla capture i trybu z restartem
+    if capture is not None or not long_lived_mode:
+        captured = driver.requests
+        if capture is not None:
+            capture.write(current_symbol, iter_ws_payloads(captured[previous_request_count:]))
+        # Update previous_request_count for the next iteration
+        previous_request_count = len(captured)
+    timer.finish_symbol()
+    print(f"Czas: {timer.summary()}")
 
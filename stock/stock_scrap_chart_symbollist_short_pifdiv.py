@@ -1,5 +1,4 @@
 import time
-import json
 import os
 import sys
 from seleniumwire import webdriver  # pip install selenium-wire
@@ -8,12 +7,21 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import psycopg2
-from psycopg2.extras import execute_values
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from datetime import datetime
 import keyboard
 
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.dedup import MessageDedup
+from common.ws_capture import limit_capture_to_tv_socket, reset_captured_requests, load_symbol_rows, \
+    wait_for_study_rows, tv_socket_requests, iter_ws_payloads, ScrapeTimer
+from common.capture import open_capture
+from common.indicators import indicator_rows, DIV_WIDTH
+from common.indicator_tables import INDICATOR_LAYOUT
+from common.indicator_writer import make_indicator_writer
+
 # Dostosuj te ścieżki do swoich lokalizacji
 OPERA_BINARY_PATH = r'/snap/opera/401/usr/lib/x86_64-linux-gnu/opera/opera'  # Przykład ścieżki do Opera.exe
 OPERADRIVER_PATH = r'/home/czarli/Documents/operadriver_linux64/operadriver'  # Pobierz z https://github.com/operasoftware/operachromiumdriver/releases i rozpakuj
@@ -74,6 +82,7 @@ try:
     # Uruchom przeglądarkę z selenium-wire
     driver = webdriver.Chrome(service=service, options=options)
     driver.set_window_size(100, 100)  # Ustawia rozmiar okna na 800x600 pikseli
+    limit_capture_to_tv_socket(driver)
     print("Przeglądarka Opera uruchomiona pomyślnie!")
 except Exception as e:
     print(f"Błąd uruchamiania: {e}")
@@ -81,7 +90,9 @@ except Exception as e:
 
 
 # Monitorowanie WebSocket z filtrem na prodata.tradingview.com/socket.io
-seen_messages = set()
+# Skróty blake2b zamiast pełnych payloadów, ograniczone LRU
+seen_messages_cap = 256
+seen_messages = MessageDedup(max_entries=seen_messages_cap)
 iteration = 0
 previous_request_count = 0
 # Valid indices without 'NO' from the provided table
@@ -89,10 +100,26 @@ valid_indices_pifagor = [5, 6, 7, 8, 9, 11, 13, 15, 17, 19, 22, 24, 26, 27, 28,
 #valid_indices = [i for i in range(0,100)]
 valid_indices_div = [1, 2, 3, 4, 5, 6, 7, 8]
 restart_after_iterations = 35
+# True - jedna przeglądarka i jedno połączenie z bazą przez cały przebieg, requesty selenium-wire
+# czyszczone po każdym symbolu; False - stary tryb z restartem przez os.execv co restart_after_iterations
+long_lived_mode = True
+# Czekanie na ramkę du ze study dla bieżącego symbolu (sekundy) i liczba przeładowań wykresu, gdy nie przyszła
+study_wait_timeout = 20
+study_wait_retries = 1
+timer = ScrapeTimer()
+# Zapis wierszy wskaźników: jeden symbol = jedna transakcja (COPY + podmiana) na tabelę, jak w
+# stock_scrap_by_symbollist_short.py. Pifagor w układzie z common.indicator_tables, div tylko w 'long'
+# (bez tabel *_Wide/*_Dated). UpdatedShortTerm ustawiany niżej dopiero, gdy zapisały się obie tabele
+indicator_layout = INDICATOR_LAYOUT
+pifagor_writer = make_indicator_writer(conn, 'tStock_IndicatorValues_Pifagor_Short', 'tStockSymbols', None,
+                                       valid_indices_pifagor, indicator_layout)
+div_writer = make_indicator_writer(conn, 'tStock_IndicatorValues_div_Short', 'tStockSymbols', None, valid_indices_div)
+# Zapis surowych payloadów WS każdego symbolu do .jsonl.gz (common.capture) do odtwarzania offline; brak zmiennej - wyłączone
+capture = open_capture(os.environ.get('TV_CAPTURE_PATH'))
 
 while True:
     # Check for restart condition
-    if iteration > 0 and iteration % restart_after_iterations == 0:
+    if not long_lived_mode and iteration > 0 and iteration % restart_after_iterations == 0:
         print(f"Reached {iteration} iterations, restarting script...")
         # Close browser and database
         try:
@@ -112,9 +139,12 @@ while True:
         except Exception as e:
             print(f"Error closing database: {e}")
         # Restart the script
+        if capture is not None:
+            capture.close()
+        timer.persist()
         os.execv(sys.executable, ['python3'] + sys.argv)
 
-    # Flaga do ograniczenia przetwarzania tylko jednego study_loading na iterację
+    # Czy w tej iteracji zapisały się tabele Pifagor (37 wartości) i div (9 wartości)
     processed9 = False
     processed37 = False
     # Get the current symbol (cycle through the list using modulo)
@@ -122,6 +152,8 @@ while True:
     url = f'https://www.tradingview.com/chart/?symbol={current_symbol}'
 
     #Obsługa bazy danych
+    if conn.closed:
+        conn = psycopg2.connect(**db_params)
     cursor = conn.cursor()
     current_symbol_id = None  # Zmienna do przechowywania id bieżącego symbolu
     try:
@@ -148,10 +180,33 @@ while True:
     #print(f"Bieżące id dla symbolu {current_symbol}: {current_symbol_id}")
 
 
+    if long_lived_mode:
+        # Zamiast restartu: usuń requesty poprzedniego symbolu, żeby driver.requests nie rósł
+        reset_captured_requests(driver)
+        previous_request_count = 0
+    timer.start_symbol()
+
+    rows_37 = None
+    rows_9 = None
     try:
-        # Open the chart page with the current symbol
-        driver.get(url)
-        wait = WebDriverWait(driver, 20)  # Wait time
+        # Open the chart page with the current symbol, wait for the study du frame (37 wartości) and flatten
+        # its rows - ten sam krok co w stock_scrap_by_symbollist_short.py i common.replay
+        rows_37 = load_symbol_rows(driver, current_symbol_id, current_symbol, valid_indices_pifagor, 37, 'short',
+                                   indicator_layout, timeout=study_wait_timeout, retries=study_wait_retries,
+                                   start_index=previous_request_count, seen_messages=seen_messages)
+        if rows_37 is None:
+            print(f"Brak ramki du ze study dla {current_symbol} po {study_wait_retries + 1} próbach")
+        # Ramka timescale_update z dywergencją (9 wartości) zwykle jest już przechwycona;
+        # bez seen_messages, bo te same payloady przejrzało już czekanie na ramkę du
+        st_data_9 = wait_for_study_rows(driver, width=DIV_WIDTH, method='timescale_update', symbol=current_symbol,
+                                        timeout=study_wait_timeout, min_rows=100,
+                                        start_index=previous_request_count)
+        if st_data_9 is None:
+            print(f"Brak ramki timescale_update z dywergencją dla {current_symbol}")
+            if not tv_socket_requests(driver.requests[previous_request_count:]):
+                print("Brak WS requestów z prodata.tradingview.com/socket.io – upewnij się, że chart/study jest załadowany.")
+        else:
+            rows_9 = indicator_rows(current_symbol_id, st_data_9, valid_indices_div, DIV_WIDTH, 'short')
     except TimeoutException as e:
         print(f"Login error (Timeout) for {url}: {e}")
     except Exception as e:
@@ -161,244 +216,38 @@ while True:
 
     iteration += 1
     print(f"\n--- Iteration {iteration} (Symbol: {current_symbol}) ---")
-    total_requests = len(driver.requests)
-    #print(f"Total requests: {total_requests}")
-
-
-    # Process only new requests since the previous iteration
-    new_requests = driver.requests[previous_request_count:]
-    #print(f"Number of new requests: {len(new_requests)}")
-
-
-    ws_requests = [r for r in new_requests if r.url.lower().startswith('wss://prodata.tradingview.com/socket.io')]
-    #print(f"Liczba WS requestów z prodata.tradingview.com/socket.io: {len(ws_requests)}")
-
-    for request in ws_requests:
-        if request.url.lower().startswith('wss://prodata.tradingview.com/socket.io'):
-            #print(f"WS Request URL: {request.url}")
-            if hasattr(request, 'ws_messages'):
-                print(f"Liczba WS messages: {len(request.ws_messages)}")
-                for msg in request.ws_messages:
-                    # Przetwarzaj tylko, jeśli nie znaleziono jeszcze study_loading w tej iteracji
-                    payload = msg.data if hasattr(msg, 'data') else str(msg)  # Poprawiony dostęp
-                    #print(f"Surowy payload WS: {payload[:500]}...")  # Zwiększ do 500 znaków
-                    if payload and '"m":"du","p":["cs' in str(
-                            payload) and payload not in seen_messages and not processed37:
-                        seen_messages.add(payload)
-                        #print(f"\nZnaleziono du study_loading w payload dla v=37!")
-                        parts = payload.split('~m~')
-                        i = 0
-                        while i < len(parts):
-                            if parts[i].isdigit():
-                                msg_len = int(parts[i])
-                                json_str = parts[i + 1]
-                                if len(json_str) >= msg_len:
-                                    json_part = json_str[:msg_len]
-                                    try:
-                                        data = json.loads(json_part)
-                                        if data.get('m') == 'du':
-                                            try:
-                                                st_data = data['p'][1].get(list(data['p'][1].keys())[0], {}).get('st',
-                                                                                                                 [])
-                                                has_valid_v_37 = any(len(item.get('v', [])) == 37 for item in st_data)
-
-                                                if has_valid_v_37:
-                                                    cursor = conn.cursor()
-                                                    try:
-                                                        delete_query = """
-                                                                                DELETE FROM public."tStock_IndicatorValues_Pifagor_Short"
-                                                                                WHERE "idSymbol" = %s
-                                                                                """
-                                                        cursor.execute(delete_query, (current_symbol_id,))
-                                                        deleted_rows = cursor.rowcount
-                                                        print(
-                                                            f"Usunięto {deleted_rows} wierszy z tStock_IndicatorValues_Pifagor_Short dla idSymbol={current_symbol_id}")
-                                                        conn.commit()
-                                                    except (Exception, psycopg2.Error) as error:
-                                                        print(
-                                                            f"Błąd usuwania wierszy z tStock_IndicatorValues_Pifagor_Short: {error}")
-                                                        conn.rollback()
-                                                    finally:
-                                                        cursor.close()
-
-                                                    filtered_st_data_37 = [
-                                                        item for item in st_data
-                                                        if len(item.get('v', [])) == 37
-                                                           and isinstance(item.get('i'), (int, float))
-                                                           and 0 <= item.get('i') <= 299
-                                                    ]
-
-                                                    inserted_data = 0
-                                                    for item in reversed(filtered_st_data_37):
-                                                        v_list = item.get('v', [])
-                                                        i_value = item.get('i')
-                                                        insert_data = []
-                                                        for idx, value in enumerate(v_list):
-                                                            if idx in valid_indices_pifagor:
-                                                                try:
-                                                                    value_float = float(value)
-                                                                    value_float = round(value_float, 2)
-                                                                    if abs(value_float) > 1e10:
-                                                                        value_float = 1234.5678
-                                                                    insert_data.append((
-                                                                        current_symbol_id,
-                                                                        i_value - len(filtered_st_data_37) + 1,
-                                                                        idx,
-                                                                        value_float
-                                                                    ))
-                                                                except (ValueError, OverflowError):
-                                                                    print(
-                                                                        f"Błąd konwersji wartości {value} dla i={i_value}, idx={idx}, zapisano jako NULL")
-                                                                    insert_data.append((
-                                                                        current_symbol_id,
-                                                                        i_value - len(filtered_st_data_37) + 1,
-                                                                        idx,
-                                                                        None
-                                                                    ))
 
-                                                        cursor = conn.cursor()
-                                                        try:
-                                                            insert_query = """
-                                                                                    INSERT INTO public."tStock_IndicatorValues_Pifagor_Short" 
-                                                                                    ("idSymbol", "TickerRelative", "IndicatorIndex", "IndicatorValue")
-                                                                                    VALUES %s
-                                                                                    """
-                                                            execute_values(cursor, insert_query, insert_data)
-                                                            inserted_data = inserted_data + len(insert_data)
-                                                            conn.commit()
-                                                        except (Exception, psycopg2.Error) as error:
-                                                            print(f"Błąd wstawiania wierszy dla i={i_value}: {error}")
-                                                            conn.rollback()
-                                                        finally:
-                                                            cursor.close()
-                                                    processed37 = True
-                                                    print(f'Wstawiono {inserted_data} wierszy do tabeli Pifagor')
-                                            except (KeyError, IndexError):
-                                                pass
-                                                #print("Nieprawidłowa struktura danych w 'p' lub 'st' dla v=37.")
-                                    except json.JSONDecodeError:
-                                        print(f"Błąd parsowania dla v=37: {json_str}")
-                                i += 2
-                            else:
-                                i += 1
-
-                        # Process v=9 data for "m":"timescale_update","p":["cs
-                    if payload and ('"m":"timescale_update","p":["cs' in str(
-                            payload) or '"m":"du","p":["cs' in str(
-                            payload)) and '~m~' in str(payload) and payload and not processed9:
-                        seen_messages.add(payload)
-                        #print(f"\nZnaleziono timescale_update w payload dla v=9!")
-                        parts = payload.split('~m~')
-                        i = 0
-                        while i < len(parts):
-                            if parts[i].isdigit():
-                                msg_len = int(parts[i])
-                                json_str = parts[i + 1]
-                                if len(json_str) >= msg_len:
-                                    json_part = json_str[:msg_len]
-                                    try:
-                                        data = json.loads(json_part)
-                                        if data.get('m') == 'timescale_update':
-                                            try:
-                                                st_data = data['p'][1].get(list(data['p'][1].keys())[0], {}).get('st',
-                                                                                                                 [])
-                                                if len(st_data) < 100:
-                                                    raise KeyError
-                                                has_valid_v_9 = any(len(item.get('v', [])) == 9 for item in st_data)
-
-                                                if has_valid_v_9:
-                                                    cursor = conn.cursor()
-                                                    try:
-                                                        delete_query = """
-                                                                                DELETE FROM public."tStock_IndicatorValues_div_Short"
-                                                                                WHERE "idSymbol" = %s
-                                                                                """
-                                                        cursor.execute(delete_query, (current_symbol_id,))
-                                                        deleted_rows = cursor.rowcount
-                                                        print(
-                                                            f"Usunięto {deleted_rows} wierszy z tStock_IndicatorValues_div_Short dla idSymbol={current_symbol_id}")
-                                                        conn.commit()
-                                                    except (Exception, psycopg2.Error) as error:
-                                                        print(
-                                                            f"Błąd usuwania wierszy z tStock_IndicatorValues_div_Short: {error}")
-                                                        conn.rollback()
-                                                    finally:
-                                                        cursor.close()
-
-                                                    filtered_st_data_9 = [
-                                                        item for item in st_data
-                                                        if len(item.get('v', [])) == 9
-                                                           and isinstance(item.get('i'), (int, float))
-                                                           and 0 <= item.get('i') <= 299
-                                                    ]
-                                                    inserted_data = 0
-                                                    for item in reversed(filtered_st_data_9):
-                                                        v_list = item.get('v', [])
-                                                        i_value = item.get('i')
-                                                        insert_data = []
-                                                        for idx, value in enumerate(v_list):
-                                                            if idx in valid_indices_div:
-                                                                try:
-                                                                    value_float = float(value)
-                                                                    value_float = round(value_float, 2)
-                                                                    if abs(value_float) > 1e10:
-                                                                        value_float = 1234.5678
-                                                                    insert_data.append((
-                                                                        current_symbol_id,
-                                                                        i_value - len(filtered_st_data_9) + 1,
-                                                                        idx,
-                                                                        value_float
-                                                                    ))
-                                                                except (ValueError, OverflowError):
-                                                                    print(
-                                                                        f"Błąd konwersji wartości {value} dla i={i_value}, idx={idx}, zapisano jako NULL")
-                                                                    insert_data.append((
-                                                                        current_symbol_id,
-                                                                        i_value - len(filtered_st_data_9) + 1,
-                                                                        idx,
-                                                                        None
-                                                                    ))
-
-                                                        cursor = conn.cursor()
-                                                        try:
-                                                            insert_query = """
-                                                                                    INSERT INTO public."tStock_IndicatorValues_div_Short" 
-                                                                                    ("idSymbol", "TickerRelative", "IndicatorIndex", "IndicatorValue")
-                                                                                    VALUES %s
-                                                                                    """
-                                                            execute_values(cursor, insert_query, insert_data)
-                                                            inserted_data = inserted_data + len(insert_data)
-                                                            conn.commit()
-                                                        except (Exception, psycopg2.Error) as error:
-                                                            print(f"Błąd wstawiania wierszy dla i={i_value}: {error}")
-                                                            conn.rollback()
-                                                        finally:
-                                                            cursor.close()
-                                                    processed9 = True
-                                                    print(f'Wstawiono {inserted_data} do tabeli div')
-                                            except (KeyError, IndexError):
-                                                pass
-                                                #print("Nieprawidłowa struktura danych w 'p' lub 'sds_1' dla v=9.")
-                                    except json.JSONDecodeError:
-                                        print(f"Błąd parsowania dla v=9: {json_str}")
-                                i += 2
-                            else:
-                                i += 1
-                    else:
-                        #print("Brak study_loading w tej wiadomości.")
-                        pass
-            else:
-                #print("Brak atrybutu ws_messages w tym request.")
-                pass
-
-    if len(ws_requests) == 0:
-        print("Brak WS requestów z prodata.tradingview.com/socket.io – upewnij się, że chart/study jest załadowany.")
-
-
-
-
-    # Update previous_request_count for the next iteration
-    previous_request_count = len(driver.requests)
+    # Każda tabela: DELETE starych + COPY nowych wierszy symbolu w jednej transakcji, jeden commit
+    if rows_37 is not None:
+        pifagor_writer.conn = conn  # po ewentualnym ponownym połączeniu (conn.closed)
+        inserted_data = pifagor_writer.replace_symbol(current_symbol_id, rows_37)
+        processed37 = inserted_data is not None
+        if processed37:
+            print(f'Wstawiono {inserted_data} wierszy do tabeli Pifagor '
+                  f'({pifagor_writer.last_rows_per_second:,.0f} wierszy/s)')
+        else:
+            print(f"Błąd zapisu wierszy do {pifagor_writer.table} dla symbolu {current_symbol}, dane bez zmian")
+
+    if rows_9 is not None:
+        div_writer.conn = conn
+        inserted_data = div_writer.replace_symbol(current_symbol_id, rows_9)
+        processed9 = inserted_data is not None
+        if processed9:
+            print(f'Wstawiono {inserted_data} do tabeli div ({div_writer.last_rows_per_second:,.0f} wierszy/s)')
+        else:
+            print(f"Błąd zapisu wierszy do {div_writer.table} dla symbolu {current_symbol}, dane bez zmian")
+
+    print(f"Cache wiadomości WS: {seen_messages.stats()}")
+
+    # Każdy odczyt driver.requests przeładowuje magazyn selenium-wire - tylko dla capture i trybu z restartem
+    if capture is not None or not long_lived_mode:
+        captured = driver.requests
+        if capture is not None:
+            capture.write(current_symbol, iter_ws_payloads(captured[previous_request_count:]))
+        # Update previous_request_count for the next iteration
+        previous_request_count = len(captured)
+    timer.finish_symbol()
+    print(f"Czas: {timer.summary()}")
 
     # Check if both conditions are met or if retry limit is reached
     if processed37 and processed9:
@@ -0,0 +1,117 @@
+"""Parallel long/short-term Pifagor scrape with a pool of headless Opera instances.
+
+Uruchomienie:
+    python3 stock_scrap_pool.py --term long --workers 6
+    python3 stock_scrap_pool.py --term short --workers 6
+"""
+import argparse
+import logging
+import os
+import sys
+import psycopg2
+
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.indicator_tables import INDICATOR_LAYOUT
+from common.indicator_writer import make_indicator_writer
+from common.scraper_pool import run_pool
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Dostosuj te ścieżki do swoich lokalizacji
+OPERA_BINARY_PATH = r'/snap/opera/401/usr/lib/x86_64-linux-gnu/opera/opera'
+OPERADRIVER_PATH = r'/home/czarli/Documents/operadriver_linux64/operadriver'
+OPERA_PROFILE_PATH = r'/home/czarli/snap/opera/399/.config/opera/Default'
+
+# Parametry połączenia z bazą danych PostgreSQL
+db_params = {
+    'dbname': 'TradingView',
+    'user': 'postgres',
+    'password': 'postgres',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+TERMS = {
+    'long': {
+        'table': 'tStock_IndicatorValues_Pifagor_Long',
+        'updated_column': 'UpdatedLongTerm',
+        'window_size': (15000, 360),
+    },
+    'short': {
+        'table': 'tStock_IndicatorValues_Pifagor_Short',
+        'updated_column': 'UpdatedShortTerm',
+        'window_size': (100, 100),
+    },
+}
+valid_indices = [5, 7, 22, 24]
+# Układ tabel wskaźników jak w pozostałych scraperach (common.indicator_tables): 'long', 'wide' albo 'dated'
+indicator_layout = INDICATOR_LAYOUT
+# Czekanie na ramkę du ze study dla bieżącego symbolu (sekundy) i liczba przeładowań wykresu, gdy nie przyszła
+study_wait_timeout = 20
+study_wait_retries = 1
+
+
+def fetch_symbols(conn, updated_column):
+    """Symbols not refreshed today, least recently updated first."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+        SELECT id, "Symbol"
+        FROM public."tStockSymbols"
+        WHERE "enabled" = TRUE
+        AND "{updated_column}" != CURRENT_DATE
+        ORDER BY "{updated_column}" ASC
+        """)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--term', choices=sorted(TERMS), default='long')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--no-headless', action='store_true')
+    args = parser.parse_args()
+    term = TERMS[args.term]
+
+    conn = psycopg2.connect(**db_params)
+    try:
+        symbols = fetch_symbols(conn, term['updated_column'])
+        logger.info(f"Pobrano {len(symbols)} symboli, posortowane rosnąco po {term['updated_column']}")
+        if not symbols:
+            return
+        config = {
+            'opera_binary_path': OPERA_BINARY_PATH,
+            'operadriver_path': OPERADRIVER_PATH,
+            'opera_profile_path': OPERA_PROFILE_PATH,
+            'headless': not args.no_headless,
+            'window_size': term['window_size'],
+            'valid_indices': valid_indices,
+            'term': args.term,
+            'layout': indicator_layout,
+            'study_wait_timeout': study_wait_timeout,
+            'study_wait_retries': study_wait_retries,
+        }
+        writer = make_indicator_writer(conn, term['table'], 'tStockSymbols', term['updated_column'], valid_indices,
+                                       indicator_layout, batch_size=args.batch_size)
+        stats = run_pool(symbols, config, writer, workers=args.workers)
+        logger.info(f"Zakończono: {stats['ok']} OK, {stats['missing']} bez danych, {stats['errors']} błędów, "
+                    f"{stats['rows']} wierszy w {stats['wall_time']:.0f}s "
+                    f"({stats['symbols_per_minute']:.1f} symboli/min, {args.workers} workerów)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Long/short-term Pifagor scrape over direct websocket chart sessions, without a browser.
+
+Uruchomienie:
+    python3 stock_scrap_ws_client.py --term long --connections 4 --sessions 8
+    python3 stock_scrap_ws_client.py --term short --url ws://127.0.0.1:8765/socket.io/websocket --no-study-inputs
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import sys
+import time
+import psycopg2
+
+# Wspólne moduły z katalogu głównego repozytorium
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.dated_tables import dated_indicator_rows
+from common.indicator_tables import INDICATOR_LAYOUT
+from common.indicator_writer import make_indicator_writer
+from common.indicators import indicator_rows, series_study_rows, PIFAGOR_WIDTH
+from common.tv_client import TradingViewClient, fetch_study_inputs, fetch_symbols_concurrently, TV_WS_URL
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Parametry połączenia z bazą danych PostgreSQL
+db_params = {
+    'dbname': 'TradingView',
+    'user': 'postgres',
+    'password': 'postgres',
+    'host': 'localhost',
+    'port': '5432'
+}
+
+# Dostęp do prywatnego wskaźnika - token z set_auth_token strony wykresu i cookie sessionid konta
+TV_AUTH_TOKEN = os.environ.get('TV_AUTH_TOKEN', 'unauthorized_user_token')
+TV_SESSION_COOKIE = os.environ.get('TV_SESSION_COOKIE')
+PIFAGOR_PINE_ID = os.environ.get('TV_PIFAGOR_PINE_ID', 'PUB;')
+PIFAGOR_PINE_VERSION = 'last'
+
+TERMS = {
+    'long': {
+        'table': 'tStock_IndicatorValues_Pifagor_Long',
+        'updated_column': 'UpdatedLongTerm',
+        'bars': 3300,
+    },
+    'short': {
+        'table': 'tStock_IndicatorValues_Pifagor_Short',
+        'updated_column': 'UpdatedShortTerm',
+        'bars': 300,
+    },
+}
+valid_indices = [5, 7, 22, 24]
+# Układ tabel wskaźników jak w pozostałych scraperach (common.indicator_tables): 'long', 'wide' albo 'dated'
+indicator_layout = INDICATOR_LAYOUT
+study_wait_timeout = 20
+
+
+def fetch_symbols(conn, updated_column):
+    """Symbols not refreshed today, least recently updated first."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+        SELECT id, "Symbol"
+        FROM public."tStockSymbols"
+        WHERE "enabled" = TRUE
+        AND "{updated_column}" != CURRENT_DATE
+        ORDER BY "{updated_column}" ASC
+        """)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def build_rows(id_symbol, st_data, term):
+    """Rows in the shape the writer of `indicator_layout` stores."""
+    # Sesja create_series numeruje bary od początku serii - przenumerowanie jak na stronie wykresu (najnowszy i=299)
+    st_data = series_study_rows(st_data, PIFAGOR_WIDTH)
+    if indicator_layout == 'dated':
+        return dated_indicator_rows(id_symbol, st_data, valid_indices, PIFAGOR_WIDTH, term)
+    return indicator_rows(id_symbol, st_data, valid_indices, PIFAGOR_WIDTH, term)
+
+
+async def scrape(symbols, study_inputs, writer, args, term):
+    client_factory = functools.partial(TradingViewClient, url=args.url, auth_token=TV_AUTH_TOKEN)
+    stats = {'ok': 0, 'missing': 0, 'errors': 0, 'rows': 0}
+    started = time.perf_counter()
+    async for id_symbol, symbol, st_data, error in fetch_symbols_concurrently(
+            symbols, study_inputs, connections=args.connections, sessions_per_connection=args.sessions,
+            client_factory=client_factory, width=PIFAGOR_WIDTH, bars=term['bars'], timeout=study_wait_timeout):
+        if error:
+            stats['errors'] += 1
+            logger.error(f"{symbol}: {error}")
+            continue
+        rows = build_rows(id_symbol, st_data, args.term) if st_data else None
+        if not rows:
+            stats['missing'] += 1
+            logger.warning(f"{symbol}: brak ramki du z danymi study")
+            continue
+        writer.add(id_symbol, rows)
+        stats['ok'] += 1
+        stats['rows'] += len(rows)
+    writer.flush()
+    stats['wall_time'] = time.perf_counter() - started
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--term', choices=sorted(TERMS), default='long')
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--sessions', type=int, default=8, help='chart sessions per connection')
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--url', default=TV_WS_URL)
+    parser.add_argument('--no-study-inputs', action='store_true',
+                        help='do not query pine-facade (common.tv_stub_server ignores the inputs)')
+    args = parser.parse_args()
+    term = TERMS[args.term]
+
+    if args.no_study_inputs:
+        study_inputs = {}
+    else:
+        study_inputs = fetch_study_inputs(PIFAGOR_PINE_ID, PIFAGOR_PINE_VERSION, TV_SESSION_COOKIE)
+    conn = psycopg2.connect(**db_params)
+    try:
+        symbols = fetch_symbols(conn, term['updated_column'])
+        logger.info(f"Pobrano {len(symbols)} symboli, posortowane rosnąco po {term['updated_column']}")
+        if not symbols:
+            return
+        writer = make_indicator_writer(conn, term['table'], 'tStockSymbols', term['updated_column'], valid_indices,
+                                       indicator_layout, batch_size=args.batch_size)
+        stats = asyncio.run(scrape(symbols, study_inputs, writer, args, term))
+        done = stats['ok'] + stats['missing']
+        logger.info(f"Zakończono: {stats['ok']} OK, {stats['missing']} bez danych, {stats['errors']} błędów, "
+                    f"{stats['rows']} wierszy w {stats['wall_time']:.0f}s "
+                    f"({60 * done / max(stats['wall_time'], 1e-9):.1f} symboli/min)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()